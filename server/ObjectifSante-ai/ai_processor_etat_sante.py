@@ -1,51 +1,105 @@
-import spacy
-from typing import Dict
+import os
+import re
+import sys
+from typing import Dict, List, Optional
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ai_common.analysis_cache import AnalysisCache
+from ai_common.analysis_tiers import TierCounter, rules_enabled
+from ai_common.ids import new_id
+from ai_common.keyword_matcher import KeywordMatcher
+from ai_common.metrics import stage
+from ai_common.nlp_registry import models
+from ai_common.schema_index import get_schema
+from ai_common.sparql_targets import HEADER, Target
+
+ENTITY_TYPES = ["allergie", "condition", "traitement"]
+ETAT_SANTE = Target("EtatSante", "etatSante", "aDate")
+# Type cité -> sous-classe de sh:EtatSante dans l'ontologie (condition -> ConditionMedicale)
+TYPE_CLASSES = {word: get_schema().subclass_for("EtatSante", word) for word in ENTITY_TYPES}
 
 class EtatSanteAIProcessor:
+    # Seul token.text est lu : pas besoin des composants statistiques
+    required_pipes = ()
+
     def __init__(self):
-        self.nlp = spacy.load("fr_core_news_sm")
         self.keywords = {
             "create": ["ajoute", "crée", "nouvel", "ajouter", "insère"],
             "read": ["affiche", "montre", "liste", "cherche", "voir"],
             "update": ["modifie", "corrige", "change"],
             "delete": ["supprime", "enlève", "retire"]
         }
+        self.matcher = KeywordMatcher(action=self.keywords)
+        self.cache = AnalysisCache()
+        self.tiers = TierCounter("etat_sante")
+
+    @property
+    def nlp(self):
+        return models.get(pipes=self.required_pipes)
 
     def process(self, command: str) -> Dict:
-        doc = self.nlp(command.lower())
-        action = self.detect_action(command)
-        entities = self.extract_entities(doc)
-        return {"action": action, "entities": entities, "original": command}
+        cached = self.cache.get(command)
+        if cached is not None:
+            self.tiers.hit("cache")
+            cached["original"] = command
+            return cached
+
+        if self.rules_conclusive(command):
+            self.tiers.hit("rules")
+            with stage("detect"):
+                action = self.detect_action(command)
+                entities = self.extract_entities_with_rules(command.lower())
+        else:
+            self.tiers.hit("spacy")
+            with stage("parse"):
+                doc = self.nlp(command.lower())
+            with stage("detect"):
+                action = self.detect_action(command)
+                entities = self.extract_entities(doc)
+        result = {"action": action, "entities": entities, "original": command}
+        self.cache.put(command, result)
+        return result
 
     def detect_action(self, text: str):
-        text = text.lower()
-        for action, keys in self.keywords.items():
-            if any(k in text for k in keys):
-                return action
-        return "read"
+        return self.matcher.scan(text.lower()).first("action", "read")
+
+    def rules_conclusive(self, command: str) -> bool:
+        """Sans chiffre ni trait d'union, les mots de la commande sont les tokens spaCy"""
+        return rules_enabled() and not re.search(r"[\d-]", command)
 
     def extract_entities(self, doc):
         entities = {}
         for token in doc:
             if token.text.replace(",", ".").isdigit():
                 entities["valeur"] = float(token.text)
-            if token.text in ["allergie", "condition", "traitement"]:
+            if token.text in ENTITY_TYPES:
                 entities["type"] = token.text.capitalize()
         return entities
 
-    def to_sparql(self, analysis: Dict) -> str:
-        """Convertit l'analyse en requête SPARQL"""
-        base = "PREFIX sh: <http://www.smarthealth-tracker.com/ontologie#>\nPREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n"
+    def extract_entities_with_rules(self, text: str):
+        entities = {}
+        for word in re.findall(r"\w+", text):
+            if word in ENTITY_TYPES:
+                entities["type"] = word.capitalize()
+        return entities
+
+    def to_sparql(self, analysis: Dict, subjects: Optional[List[str]] = None) -> str:
+        """Convertit l'analyse en requête SPARQL.
+
+        Modification et suppression portent sur `subjects` (IRI résolues avant,
+        par ex. avec ETAT_SANTE.select_subjects) ; sans sujet, rien n'est généré.
+        """
+        base = HEADER
         act = analysis["action"]
         ent = analysis["entities"]
 
         if act == "create":
-            type_class = ent.get("type", "ConditionMedicale")
-            value = ent.get("valeur", 0)
+            type_class = TYPE_CLASSES.get(ent.get("type", "").lower(), TYPE_CLASSES["condition"])
+            triples = get_schema().triples("EtatSante", new_id("etatSante"), {"aValeur": ent.get("valeur", 0)},
+                                           types=[type_class])
             return base + f"""
 INSERT DATA {{
-  sh:etatSante_{id(self)} a sh:EtatSante , sh:{type_class} ;
-      sh:aValeur "{value}"^^xsd:decimal .
+  {triples}
 }}"""
 
         elif act == "read":
@@ -57,10 +111,13 @@ SELECT ?etat ?type ?valeur WHERE {
 }"""
 
         elif act == "delete":
-            return base + """
-DELETE WHERE { ?etat a sh:EtatSante . ?etat ?p ?o . }"""
+            if not subjects:
+                return base + "# ❌ Aucun sujet ciblé"
+            return ETAT_SANTE.delete(subjects)
 
         elif act == "update":
-            return base + "# UPDATE logic à implémenter selon ton besoin"
+            if not subjects or "valeur" not in ent:
+                return base + "# ❌ Aucun sujet ou valeur à mettre à jour"
+            return ETAT_SANTE.update(subjects, "aValeur", ent["valeur"])
 
         return base
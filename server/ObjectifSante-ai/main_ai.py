@@ -3,13 +3,41 @@
 # ==============================================
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-import requests, re, time, datetime
+from contextlib import asynccontextmanager, aclosing
+from typing import List, Optional
+import re, datetime, os, sys, json, base64
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ai_common import fuseki_client, metrics, profiling
+from ai_common.config import SPARQL_PAGE_SIZE, SPARQL_MAX_PAGE_SIZE, WRITE_BEHIND_ENABLED
+from ai_common.ids import new_id
+from ai_common.keyword_matcher import KeywordMatcher
+from ai_common.metrics import label, stage
+from ai_common.schema_index import get_schema
+from ai_common.sparql_targets import HEADER, Target, subjects_from
+from ai_common.write_buffer import WriteBehindBuffer
+from sparql_client import result_cache, run_select, run_update, stream_select
 
-FUSEKI_ENDPOINT = "http://localhost:3030/SmartHealth"
 PREFIX = "http://www.smarthealth-tracker.com/ontologie#"
+# Classes et propriétés de l'ontologie, lues une fois au démarrage
+SCHEMA = get_schema()
+
+# Regroupement optionnel des INSERT DATA issus des créations
+write_buffer = WriteBehindBuffer(run_update) if WRITE_BEHIND_ENABLED else None
 
-app = FastAPI(title="SmartHealth AI Assistant")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await fuseki_client.startup()
+    if write_buffer:
+        await write_buffer.start()
+    yield
+    if write_buffer:
+        await write_buffer.stop()
+    await fuseki_client.shutdown()
+
+app = FastAPI(title="SmartHealth AI Assistant", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +46,8 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+metrics.install(app)
+profiling.install(app)
 
 # ----------------------------------------------
 # 🔹 Modèle Pydantic
@@ -25,48 +55,143 @@ app.add_middleware(
 class AICommand(BaseModel):
     entity: str  # etat_sante / objectif
     command: str
+    page_size: Optional[int] = None  # lecture : nombre de lignes par page
+    cursor: Optional[str] = None     # lecture : curseur renvoyé par la page précédente
+    stream: bool = False             # lecture : réponse NDJSON en flux
 
 # ----------------------------------------------
 # 🔹 Fonctions utilitaires
 # ----------------------------------------------
-def send_sparql_update(query: str):
-    r = requests.post(
-        f"{FUSEKI_ENDPOINT}/update",
-        data=query.encode("utf-8"),
-        headers={"Content-Type": "application/sparql-update"},
-    )
-    r.raise_for_status()
-    return {"success": True}
-
-def send_sparql_select(query: str):
-    r = requests.post(
-        f"{FUSEKI_ENDPOINT}/query",
-        data={"query": query},
-        headers={"Accept": "application/sparql-results+json"},
-    )
-    r.raise_for_status()
-    return r.json()
+# L'ordre des actions fixe la priorité quand plusieurs mots-clés sont présents
+ACTION_KEYWORDS = {
+    "create": ["ajoute", "crée", "ajouter", "créer", "insère"],
+    "update": ["modifie", "mets à jour", "éditer", "change", "corrige", "remplace", "actualise"],
+    "delete": ["supprime", "efface", "enlève", "retire", "delete"],
+    "read": ["affiche", "liste", "montre", "cherche", "montrez", "vois", "montre-moi"],
+}
+ACTION_MATCHER = KeywordMatcher(action=ACTION_KEYWORDS)
 
 def detect_action(text: str):
-    text = text.lower()
-    if any(k in text for k in ["ajoute", "crée", "ajouter", "créer", "insère"]):
-        return "create"
-    if any(k in text for k in ["modifie", "mets à jour", "éditer", "change", "corrige", "remplace", "actualise"]):
-        return "update"
-    if any(k in text for k in ["supprime", "efface", "enlève", "retire", "delete"]):
-        return "delete"
-    if any(k in text for k in ["affiche", "liste", "montre", "cherche", "montrez", "vois", "montre-moi"]):
-        return "read"
-    return "read"
+    return ACTION_MATCHER.scan(text.lower()).first("action", "read")
 
 def extract_numbers(text):
     return [float(n) for n in re.findall(r"\d+\.?\d*", text)]
 
+# ----------------------------------------------
+# 🔹 Sujets visés par une modification / suppression
+# ----------------------------------------------
+TARGETS = {
+    "etat_sante": Target("EtatSante", "etatSante", "aDate"),
+    "objectif": Target("Objectif", "objectif", "aDateDebut"),
+}
+NO_SUBJECT = "# ❌ Aucun sujet ciblé"
+
+# Propriétés d'état de santé par mot-clé (l'ordre fixe la priorité), vérifiées dans l'ontologie
+FIELD_KEYWORDS = {
+    "aPoids": ["poids"],
+    "aTaille": ["taille"],
+    "aPression": ["pression"],
+    "aTemperature": ["temp", "degré", "temperature"],
+}
+SCHEMA.require_properties("EtatSante", FIELD_KEYWORDS)
+FIELD_MATCHER = KeywordMatcher(field=FIELD_KEYWORDS)
+
+def etat_sante_field(text: str) -> Optional[str]:
+    """Propriété d'état de santé citée dans la commande"""
+    return FIELD_MATCHER.scan(text).first("field")
+
+def objectif_type(text: str) -> Optional[str]:
+    """Type d'objectif cité dans la commande"""
+    if "poids" in text.lower():
+        return "Perte de poids"
+    elif "sport" in text.lower():
+        return "Activité physique"
+    return None
+
+def subjects_query(entity: str, action: str, text: str) -> str:
+    """SELECT des sujets visés quand la commande ne cite pas d'identifiant"""
+    where = ""
+    if entity == "etat_sante":
+        field = etat_sante_field(text) if action == "update" else None
+        if field:
+            where = f"?s sh:{field} ?current ."
+    else:
+        type_obj = objectif_type(text)
+        if type_obj:
+            where = f"?s sh:aType {SCHEMA.literal('aType', type_obj)} ."
+    return TARGETS[entity].select_subjects(text, where)
+
+async def resolve_subjects(entity: str, action: str, text: str) -> List[str]:
+    """IRI citées dans la commande, sinon le plus récent (ou tous) des sujets correspondants"""
+    subjects = TARGETS[entity].explicit_subjects(text)
+    if subjects:
+        return subjects
+    # Lecture hors cache : on doit viser l'état actuel du store
+    return subjects_from(await run_select(subjects_query(entity, action, text), cached=False))
+
+# ----------------------------------------------
+# 🔹 Pagination par curseur (keyset) sur la date
+# ----------------------------------------------
+# Variables (date, sujet) qui ordonnent chaque lecture
+PAGE_KEYS = {"etat_sante": ("date", "etat"), "objectif": ("dateDebut", "objectif")}
+CURSOR_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})?$")
+TIMEZONE = re.compile(r"(Z|[+-]\d{2}:\d{2})$")
+CURSOR_IRI = re.compile(r'^[^\s<>"{}|\\^`]+$')
+
+def encode_cursor(entity: str, row: dict) -> str:
+    date_var, subject_var = PAGE_KEYS[entity]
+    payload = json.dumps({"d": row[date_var]["value"], "s": row[subject_var]["value"]})
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        date, subject = payload["d"], payload["s"]
+    except Exception:
+        raise ValueError("Curseur de pagination invalide")
+    if not (isinstance(date, str) and isinstance(subject, str)
+            and CURSOR_DATE.match(date) and CURSOR_IRI.match(subject)):
+        raise ValueError("Curseur de pagination invalide")
+    return {"d": date, "s": subject}
+
+def utc_date(date: str) -> str:
+    """Date sans fuseau (anciennes écritures de l'AI) lue comme UTC"""
+    return date if TIMEZONE.search(date) else date + "Z"
+
+def page_clauses(date_var: str, subject_var: str, page_size: Optional[int], cursor: Optional[dict]):
+    """Clé de tri, FILTER, ORDER BY et LIMIT d'une page ; on lit une ligne de plus pour savoir s'il y a une suite.
+
+    Les dates sans fuseau ne sont pas comparables aux dates UTC des routes Node
+    ("...Z") : la clé de tri les lit comme UTC, pour que l'ordre et le curseur
+    soient totaux sur des données mélangées.
+    """
+    key = f"?{date_var}Key"
+    keyset = (f'BIND(IF(TZ(?{date_var}) = "", STRDT(CONCAT(STR(?{date_var}), "Z"), xsd:dateTime), '
+              f'?{date_var}) AS {key})')
+    if cursor:
+        date = f'"{utc_date(cursor["d"])}"^^xsd:dateTime'
+        keyset += (f'\n          FILTER({key} < {date} || '
+                   f'({key} = {date} && STR(?{subject_var}) < "{cursor["s"]}"))')
+    order = f"ORDER BY DESC({key}) DESC(STR(?{subject_var}))"
+    limit = f"LIMIT {page_size + 1}" if page_size else ""
+    return keyset, order, limit
+
+def paginate_result(entity: str, result: dict, page_size: int):
+    """Tronque le résultat à la page demandée et calcule le curseur suivant.
+    Le résultat reçu n'est pas modifié : il peut être partagé par le cache."""
+    bindings = result["results"]["bindings"]
+    next_cursor = None
+    if len(bindings) > page_size:
+        bindings = bindings[:page_size]
+        result = {**result, "results": {**result["results"], "bindings": bindings}}
+        next_cursor = encode_cursor(entity, bindings[-1])
+    return result, {"size": len(bindings), "next_cursor": next_cursor}
+
 # ----------------------------------------------
 # 🔹 Génération SPARQL : Etat de Santé
 # ----------------------------------------------
-def sparql_etat_sante(action: str, text: str):
-    id_entity = f"etatSante_{int(time.time())}"
+def sparql_etat_sante(action: str, text: str, page_size: Optional[int] = None, cursor: Optional[dict] = None,
+                      subjects: Optional[List[str]] = None):
     poids, taille, temperature = None, None, None
     pression = "120/80"
     nums = extract_numbers(text)
@@ -75,27 +200,25 @@ def sparql_etat_sante(action: str, text: str):
     elif len(nums) >= 2:
         poids, taille = nums[:2]
 
-    now = datetime.datetime.utcnow().isoformat()
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
 
     # 🟢 CREATE
     if action == "create":
-        return f"""
-        PREFIX sh: <{PREFIX}>
-        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-        INSERT DATA {{
-          sh:{id_entity} a sh:EtatSante ;
-              sh:aPoids "{poids or 70}"^^xsd:decimal ;
-              sh:aTaille "{taille or 1.75}"^^xsd:decimal ;
-              sh:aPression "{pression}"^^xsd:string ;
-              sh:aTemperature "{temperature or 37}"^^xsd:decimal ;
-              sh:aDate "{now}"^^xsd:dateTime .
-        }}
-        """
+        triples = SCHEMA.triples("EtatSante", new_id("etatSante"), {
+            "aPoids": poids or 70,
+            "aTaille": taille or 1.75,
+            "aPression": pression,
+            "aTemperature": temperature or 37,
+            "aDate": now,
+        })
+        return HEADER + f"INSERT DATA {{\n  {triples}\n}}\n"
 
     # 🔵 READ
     if action == "read":
+        keyset, order, limit = page_clauses("date", "etat", page_size, cursor)
         return f"""
         PREFIX sh: <{PREFIX}>
+        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
         SELECT ?etat ?poids ?taille ?pression ?temperature ?date
         WHERE {{
           ?etat a sh:EtatSante ;
@@ -104,75 +227,57 @@ def sparql_etat_sante(action: str, text: str):
                 sh:aPression ?pression ;
                 sh:aTemperature ?temperature ;
                 sh:aDate ?date .
+          {keyset}
         }}
-        ORDER BY DESC(?date)
+        {order}
+        {limit}
         """
 
-    # 🔴 DELETE
+    # 🔴 DELETE (sujets résolus par resolve_subjects)
     if action == "delete":
-        return f"PREFIX sh: <{PREFIX}> DELETE WHERE {{ ?s a sh:EtatSante ; ?p ?o . }}"
+        if not subjects:
+            return NO_SUBJECT
+        return TARGETS["etat_sante"].delete(subjects)
 
     # 🟡 UPDATE dynamique
     if action == "update":
-        field = None
-        if "poids" in text:
-            field = "aPoids"
-        elif "taille" in text:
-            field = "aTaille"
-        elif "pression" in text:
-            field = "aPression"
-        elif "temp" in text or "degré" in text or "temperature" in text:
-            field = "aTemperature"
+        field = etat_sante_field(text)
 
         nums = extract_numbers(text)
         new_value = nums[-1] if nums else None
 
         if not field or new_value is None:
             return "# ❌ Impossible de détecter le champ ou la valeur à mettre à jour"
+        if not subjects:
+            return NO_SUBJECT
 
-        datatype = "xsd:decimal" if field != "aPression" else "xsd:string"
-
-        return f"""
-        PREFIX sh: <{PREFIX}>
-        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-        DELETE {{ ?s sh:{field} ?old }}
-        INSERT {{ ?s sh:{field} "{new_value}"^^{datatype} }}
-        WHERE  {{ ?s a sh:EtatSante ; sh:{field} ?old }}
-        """
+        return TARGETS["etat_sante"].update(subjects, field, new_value)
 
 # ----------------------------------------------
 # 🔹 Génération SPARQL : Objectif
 # ----------------------------------------------
-def sparql_objectif(action: str, text: str):
-    id_entity = f"objectif_{int(time.time())}"
-    now = datetime.datetime.utcnow().isoformat()
-
-    if "poids" in text.lower():
-        type_obj = "Perte de poids"
-    elif "sport" in text.lower():
-        type_obj = "Activité physique"
-    else:
-        type_obj = "Objectif général"
+def sparql_objectif(action: str, text: str, page_size: Optional[int] = None, cursor: Optional[dict] = None,
+                    subjects: Optional[List[str]] = None):
+    now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    type_obj = objectif_type(text) or "Objectif général"
 
     # 🟢 CREATE
     if action == "create":
-        return f"""
-        PREFIX sh: <{PREFIX}>
-        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-        INSERT DATA {{
-          sh:{id_entity} a sh:Objectif ;
-              sh:aType "{type_obj}"^^xsd:string ;
-              sh:aDescription "Créé automatiquement via AI"^^xsd:string ;
-              sh:aEtat "En cours"^^xsd:string ;
-              sh:aDateDebut "{now}"^^xsd:dateTime ;
-              sh:aDateFin "{now}"^^xsd:dateTime .
-        }}
-        """
+        triples = SCHEMA.triples("Objectif", new_id("objectif"), {
+            "aType": type_obj,
+            "aDescription": "Créé automatiquement via AI",
+            "aEtat": "En cours",
+            "aDateDebut": now,
+            "aDateFin": now,
+        })
+        return HEADER + f"INSERT DATA {{\n  {triples}\n}}\n"
 
     # 🔵 READ
     if action == "read":
+        keyset, order, limit = page_clauses("dateDebut", "objectif", page_size, cursor)
         return f"""
         PREFIX sh: <{PREFIX}>
+        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
         SELECT ?objectif ?type ?description ?etat ?dateDebut ?dateFin
         WHERE {{
           ?objectif a sh:Objectif ;
@@ -181,58 +286,168 @@ def sparql_objectif(action: str, text: str):
                     sh:aEtat ?etat ;
                     sh:aDateDebut ?dateDebut ;
                     sh:aDateFin ?dateFin .
+          {keyset}
         }}
-        ORDER BY DESC(?dateDebut)
+        {order}
+        {limit}
         """
 
-    # 🔴 DELETE
+    # 🔴 DELETE (sujets résolus par resolve_subjects)
     if action == "delete":
-        return f"PREFIX sh: <{PREFIX}> DELETE WHERE {{ ?s a sh:Objectif ; ?p ?o . }}"
+        if not subjects:
+            return NO_SUBJECT
+        return TARGETS["objectif"].delete(subjects)
 
     # 🟡 UPDATE
     if action == "update":
-        return f"""
-        PREFIX sh: <{PREFIX}>
-        PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-        DELETE {{ ?s sh:aEtat ?oldEtat }}
-        INSERT {{ ?s sh:aEtat "Terminé"^^xsd:string }}
-        WHERE {{ ?s a sh:Objectif ; sh:aEtat ?oldEtat }}
-        """
+        if not subjects:
+            return NO_SUBJECT
+        return TARGETS["objectif"].update(subjects, "aEtat", "Terminé")
 
 # ----------------------------------------------
 # 🔹 Endpoint principal
 # ----------------------------------------------
+async def stream_page(entity: str, sparql: str, page_size: Optional[int]):
+    """Réponse NDJSON : un binding par ligne, puis une ligne {"page": ...}"""
+    count, last, next_cursor = 0, None, None
+    try:
+        async with aclosing(stream_select(sparql)) as rows:
+            async for row in rows:
+                if page_size and count == page_size:
+                    # Ligne en plus : il existe une page suivante
+                    next_cursor = encode_cursor(entity, last)
+                    break
+                yield json.dumps(row, ensure_ascii=False) + "\n"
+                count, last = count + 1, row
+    except Exception as e:
+        yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+        return
+    yield json.dumps({"page": {"size": count, "next_cursor": next_cursor}}) + "\n"
+
 @app.post("/ai/execute")
-def execute_ai(cmd: AICommand):
+async def execute_ai(cmd: AICommand):
     try:
         entity = cmd.entity.lower()
         command = cmd.command.strip()
-        action = detect_action(command)
+        with stage("detect"):
+            action = detect_action(command)
 
         if entity not in ["etat_sante", "objectif"]:
             raise HTTPException(status_code=400, detail="Entité non reconnue")
+        label(action=action, entity=entity)
 
-        sparql = (
-            sparql_etat_sante(action, command)
-            if entity == "etat_sante"
-            else sparql_objectif(action, command)
-        )
+        # Pagination seulement si elle est demandée (page_size ou curseur) : sans ces
+        # champs, la lecture renvoie toutes les lignes, comme avant (AIBOX.jsx)
+        if cmd.page_size is not None and cmd.page_size < 1:
+            raise HTTPException(status_code=400, detail="page_size doit être positif")
+        page_size = cmd.page_size or (SPARQL_PAGE_SIZE if cmd.cursor else None)
+        if page_size:
+            page_size = min(page_size, SPARQL_MAX_PAGE_SIZE)
+        try:
+            cursor = decode_cursor(cmd.cursor) if cmd.cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        result = (
-            send_sparql_select(sparql)
-            if action == "read"
-            else send_sparql_update(sparql)
-        )
+        # Lectures et modifications voient les créations encore en file
+        if write_buffer and action != "create":
+            with stage("write_buffer_flush"):
+                await write_buffer.flush()
 
-        return {
+        subjects = None
+        if action in ("update", "delete"):
+            with stage("resolve"):
+                subjects = await resolve_subjects(entity, action, command)
+
+        with stage("generate"):
+            sparql = (
+                sparql_etat_sante(action, command, page_size, cursor, subjects)
+                if entity == "etat_sante"
+                else sparql_objectif(action, command, page_size, cursor, subjects)
+            )
+            unknown = SCHEMA.validate(sparql)
+        if unknown:
+            raise HTTPException(status_code=500, detail=f"Termes absents de l'ontologie : {', '.join(unknown)}")
+
+        if write_buffer and action == "create":
+            with stage("fuseki"):
+                result = await write_buffer.submit(sparql)
+        elif sparql.startswith("#"):
+            # Rien à modifier (aucun sujet ou champ non reconnu) : pas d'aller-retour
+            result = {"success": False, "detail": sparql.lstrip("# ")}
+        else:
+            if action == "read" and cmd.stream:
+                return StreamingResponse(stream_page(entity, sparql, page_size), media_type="application/x-ndjson")
+            with stage("fuseki"):
+                result = (
+                    await run_select(sparql)
+                    if action == "read"
+                    else await run_update(sparql)
+                )
+
+        page = None
+        if action == "read" and page_size:
+            result, page = paginate_result(entity, result, page_size)
+        response = {
             "analysis": {"entity": entity, "action": action, "command": command},
             "sparql": sparql.strip(),
             "result": result,
         }
+        if page is not None:
+            response["page"] = page
+        if subjects is not None:
+            response["subjects"] = subjects
+        # Sérialisé ici plutôt que dans FastAPI, pour mesurer l'étape
+        with stage("serialize"):
+            return JSONResponse(response)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ai/write-buffer")
+def write_buffer_status():
+    if not write_buffer:
+        return {"enabled": False}
+    return {"enabled": True, **write_buffer.status()}
+
+@app.post("/ai/write-buffer/flush")
+async def write_buffer_flush():
+    if not write_buffer:
+        return {"enabled": False}
+    try:
+        await write_buffer.flush()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=str(e))
+    return {"enabled": True, **write_buffer.status()}
+
+@app.post("/ai/write-buffer/dead-letters/retry")
+def write_buffer_retry():
+    """Remet en file les créations abandonnées après trop d'échecs"""
+    if not write_buffer:
+        return {"enabled": False}
+    return {"enabled": True, "retried": write_buffer.retry_dead_letters(), **write_buffer.status()}
+
+@app.delete("/ai/write-buffer/dead-letters")
+def write_buffer_clear():
+    """Abandonne définitivement les créations gardées"""
+    if not write_buffer:
+        return {"enabled": False}
+    return {"enabled": True, "cleared": write_buffer.clear_dead_letters(), **write_buffer.status()}
+
+@app.get("/ai/cache")
+def cache_status():
+    if not result_cache:
+        return {"enabled": False, "single_flight": fuseki_client.stats()}
+    return {"enabled": True, **result_cache.stats(), "single_flight": fuseki_client.stats()}
+
+@app.post("/ai/cache/flush")
+def cache_flush():
+    if not result_cache:
+        return {"enabled": False}
+    result_cache.clear()
+    return {"enabled": True, **result_cache.stats()}
+
 @app.get("/")
 def root():
     return {"status": "running"}
@@ -1,13 +1,30 @@
-import aiohttp
+import os
+import sys
 
-FUSEKI_URL = "http://localhost:3030/SmartHealth"
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ai_common.config import SPARQL_CACHE_ENABLED
+from ai_common.fuseki_client import get_async_client
+from ai_common.result_cache import ResultCache
 
-async def run_select(query: str):
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f"{FUSEKI_URL}/query", params={"query": query}, headers={"Accept": "application/sparql-results+json"}) as resp:
-            return await resp.json()
+# Cache read-through des SELECT, invalidé par classe à chaque mise à jour
+result_cache = ResultCache() if SPARQL_CACHE_ENABLED else None
+
+async def _select(query: str):
+    return await get_async_client().select(query)
+
+async def run_select(query: str, cached: bool = True):
+    """SELECT via le cache ; cached=False pour une lecture qui doit voir l'état courant"""
+    if result_cache and cached:
+        return await result_cache.select(query, _select)
+    return await _select(query)
+
+async def stream_select(query: str):
+    async for row in get_async_client().select_stream(query):
+        yield row
 
 async def run_update(query: str):
-    async with aiohttp.ClientSession() as session:
-        async with session.post(f"{FUSEKI_URL}/update", data=query, headers={"Content-Type": "application/sparql-update"}) as resp:
-            return await resp.text()
+    try:
+        return await get_async_client().update(query)
+    finally:
+        if result_cache:
+            result_cache.invalidate(query)
@@ -0,0 +1 @@
+# ai_common - Briques partagées par les services AI Python (backend-ai, ObjectifSante-ai)
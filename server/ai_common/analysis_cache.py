@@ -0,0 +1,81 @@
+# analysis_cache.py - Cache LRU/TTL des analyses de questions
+#
+# Les utilisateurs envoient souvent les mêmes formulations : l'analyse complète
+# (parse spaCy + détections) est mémorisée pour éviter de la recalculer, sous
+# la question en minuscules : exactement le texte que voient les analyseurs.
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from ai_common.config import ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL
+
+
+def normalize_question(text: str) -> str:
+    """Clé de cache : la question en minuscules, seule transformation faite avant
+    l'analyse (accents et espaces changent les mots-clés détectés, ils sont gardés)"""
+    return text.lower()
+
+
+class AnalysisCache:
+    """Cache borné à éviction LRU, avec durée de vie optionnelle (ttl en secondes)"""
+
+    def __init__(self, maxsize: int = ANALYSIS_CACHE_SIZE, ttl: float = ANALYSIS_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, question: str) -> Optional[Dict]:
+        """Renvoie une copie de l'analyse mémorisée, ou None"""
+        if self.maxsize <= 0:
+            return None
+        key = normalize_question(question)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] is not None and entry[0] < time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            value = entry[1]
+        return copy.deepcopy(value)
+
+    def put(self, question: str, analysis: Dict):
+        if self.maxsize <= 0:
+            return
+        key = normalize_question(question)
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        value = copy.deepcopy(analysis)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
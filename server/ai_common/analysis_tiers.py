@@ -0,0 +1,47 @@
+# analysis_tiers.py - Analyse à étages : cache, règles, puis spaCy
+#
+# Beaucoup de questions sont entièrement résolues par les mots-clés et les
+# regex des processeurs ; le parse spaCy n'est lancé que lorsque les règles ne
+# peuvent pas conclure. Chaque processeur compte l'étage qui a produit chaque
+# analyse. Avec NLP_ANALYSIS_MODE=spacy, le parse est toujours fait (référence
+# pour benchmarks/compare_tiers.py).
+import threading
+from typing import Dict
+
+from ai_common.config import NLP_ANALYSIS_MODE
+from ai_common.metrics import registry
+
+TIERS = ("cache", "rules", "spacy")
+
+ANALYSES = registry.counter(
+    "ai_analysis_tier_total", "Analyses de questions par étage (cache, règles, spaCy)", ("processor", "tier"))
+
+
+def rules_enabled() -> bool:
+    return NLP_ANALYSIS_MODE == "tiered"
+
+
+class TierCounter:
+    """Nombre d'analyses servies par chaque étage d'un processeur"""
+
+    def __init__(self, processor: str):
+        self.processor = processor
+        self._counts = dict.fromkeys(TIERS, 0)
+        self._lock = threading.Lock()
+
+    def hit(self, tier: str, count: int = 1):
+        if count <= 0:
+            return
+        with self._lock:
+            self._counts[tier] += count
+        ANALYSES.inc(self.processor, tier, amount=count)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts = dict(self._counts)
+        total = sum(counts.values())
+        return {
+            "mode": NLP_ANALYSIS_MODE,
+            **counts,
+            "spacy_ratio": round(counts["spacy"] / total, 4) if total else 0.0,
+        }
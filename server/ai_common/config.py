@@ -0,0 +1,95 @@
+# config.py - Configuration partagée des services AI (variables d'environnement)
+import os
+import tempfile
+
+# Cache des analyses de questions (0 = désactivé, TTL 0 = pas d'expiration)
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "1024"))
+ANALYSIS_CACHE_TTL = float(os.getenv("ANALYSIS_CACHE_TTL", "0"))
+
+# Exécution du travail NLP hors de la boucle asyncio
+# mode : "thread" (défaut), "process" (un modèle chargé par worker) ou "inline" (dans la boucle)
+NLP_EXECUTOR_MODE = os.getenv("NLP_EXECUTOR_MODE", "thread")
+NLP_WORKERS = int(os.getenv("NLP_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Analyse : "tiered" (règles d'abord, spaCy seulement si elles ne concluent pas) ou "spacy" (toujours)
+NLP_ANALYSIS_MODE = os.getenv("NLP_ANALYSIS_MODE", "tiered")
+# Nombre maximal de requêtes NLP en cours ou en attente avant de répondre 503
+NLP_MAX_PENDING = int(os.getenv("NLP_MAX_PENDING", "64"))
+
+# Triple store Fuseki (client HTTP partagé, connexions persistantes)
+FUSEKI_URL = os.getenv("FUSEKI_URL", "http://localhost:3030/SmartHealth").rstrip("/")
+FUSEKI_POOL_SIZE = int(os.getenv("FUSEKI_POOL_SIZE", "20"))
+FUSEKI_CONNECT_TIMEOUT = float(os.getenv("FUSEKI_CONNECT_TIMEOUT", "3"))
+FUSEKI_TIMEOUT = float(os.getenv("FUSEKI_TIMEOUT", "30"))
+FUSEKI_KEEPALIVE = float(os.getenv("FUSEKI_KEEPALIVE", "30"))
+# Backend du triple store : "http" (Fuseki) ou "embedded" (en mémoire, amorcé par STORE_BOOTSTRAP)
+# moteur embarqué : "oxigraph" (pyoxigraph) ou "rdflib"
+STORE_BACKEND = os.getenv("STORE_BACKEND", "http").lower()
+STORE_ENGINE = os.getenv("STORE_ENGINE", "oxigraph").lower()
+STORE_BOOTSTRAP = [
+    path.strip()
+    for path in os.getenv(
+        "STORE_BOOTSTRAP",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "ontology.ttl"),
+    ).split(",")
+    if path.strip()
+]
+# Index du schéma (classes, propriétés, domaines, types) : fichiers Turtle lus au
+# démarrage, et instantané binaire réutilisé tant que ces fichiers ne changent pas (vide = désactivé).
+# L'instantané va dans le dossier de cache de l'utilisateur : il n'est lu que s'il lui appartient.
+SCHEMA_SOURCES = [
+    path.strip()
+    for path in os.getenv(
+        "SCHEMA_SOURCES",
+        ",".join(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", name)
+                 for name in ("ontology.ttl", "ontology-extensions.ttl")),
+    ).split(",")
+    if path.strip()
+]
+SCHEMA_SNAPSHOT = os.getenv("SCHEMA_SNAPSHOT", os.path.join(
+    os.getenv("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"), "smarthealth-ai", "schema-index.bin"))
+# Regroupement des SELECT identiques en vol (single-flight)
+FUSEKI_SINGLE_FLIGHT = os.getenv("FUSEKI_SINGLE_FLIGHT", "true").lower() in ("1", "true", "yes")
+
+# Pagination des lectures SPARQL, sur demande : taille de page quand seul un curseur est
+# envoyé, et taille maximale (sans page_size ni curseur, la lecture n'est pas bornée)
+SPARQL_PAGE_SIZE = int(os.getenv("SPARQL_PAGE_SIZE", "50"))
+SPARQL_MAX_PAGE_SIZE = int(os.getenv("SPARQL_MAX_PAGE_SIZE", "1000"))
+
+# Write-behind des INSERT DATA générés par l'AI (désactivé par défaut)
+# durabilité : "flush" = réponse après écriture dans Fuseki, "immediate" = réponse dès la mise en file
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+WRITE_BEHIND_MAX_BATCH = int(os.getenv("WRITE_BEHIND_MAX_BATCH", "100"))
+WRITE_BEHIND_INTERVAL = float(os.getenv("WRITE_BEHIND_INTERVAL", "0.5"))
+WRITE_BEHIND_DURABILITY = os.getenv("WRITE_BEHIND_DURABILITY", "flush")
+# durabilité "immediate" : tentatives d'écriture par instruction avant de la garder pour un opérateur
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.getenv("WRITE_BEHIND_MAX_ATTEMPTS", "5"))
+
+# Cache des résultats SELECT (clé = texte normalisé de la requête), désactivé par défaut :
+# il est invalidé par classe lors des mises à jour faites par ce service, mais les écritures
+# des routes Node n'en passent pas par là. Activé, une lecture peut donc rester périmée
+# jusqu'à SPARQL_CACHE_TTL secondes après une écriture faite dans l'application.
+SPARQL_CACHE_ENABLED = os.getenv("SPARQL_CACHE_ENABLED", "false").lower() in ("1", "true", "yes")
+SPARQL_CACHE_MAX_BYTES = int(os.getenv("SPARQL_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+SPARQL_CACHE_TTL = float(os.getenv("SPARQL_CACHE_TTL", "30"))
+
+# Métriques Prometheus (/metrics) : histogrammes par étape et compteurs de requêtes
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Journalisation : niveau, format ("text" ou "json"), part des messages DEBUG gardés, taille de la file
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_DEBUG_SAMPLE = float(os.getenv("LOG_DEBUG_SAMPLE", "1.0"))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Profilage à la demande : en-tête X-AI-Profile égal à PROFILE_TOKEN (vide = désactivé)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "ai-profiles"))
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.001"))
+
+# Passerelle ASGI (gateway.py) : backend-ai et ObjectifSante-ai dans un même processus
+# ports écoutés (les anciens ports des deux services par défaut) et nombre de workers uvicorn
+GATEWAY_HOST = os.getenv("GATEWAY_HOST", "0.0.0.0")
+GATEWAY_PORTS = [int(port) for port in os.getenv("GATEWAY_PORTS", "8002,8001").split(",") if port.strip()]
+GATEWAY_WORKERS = int(os.getenv("GATEWAY_WORKERS", "1"))
+# Chargement des modèles spaCy au démarrage plutôt qu'à la première requête
+GATEWAY_PRELOAD_MODELS = os.getenv("GATEWAY_PRELOAD_MODELS", "true").lower() in ("1", "true", "yes")
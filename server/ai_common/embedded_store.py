@@ -0,0 +1,161 @@
+# embedded_store.py - Triple store en mémoire, alternative à Fuseki
+#
+# Pour les déploiements edge et la CI : le graphe est chargé depuis
+# server/ontology.ttl au démarrage et exécute les mêmes chaînes SELECT / UPDATE
+# que Fuseki, sans aller-retour HTTP. Les résultats sont renvoyés au format
+# application/sparql-results+json, comme le client HTTP.
+#
+# Sélection : STORE_BACKEND=embedded, moteur STORE_ENGINE=oxigraph (défaut,
+# pyoxigraph) ou rdflib. Le moteur n'est importé que si ce backend est choisi.
+import asyncio
+import json
+import os
+import threading
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+from ai_common.config import STORE_BOOTSTRAP, STORE_ENGINE
+from ai_common.logs import fields, get_logger
+
+log = get_logger("embedded_store")
+
+XSD_STRING = "http://www.w3.org/2001/XMLSchema#string"
+
+
+class _OxigraphEngine:
+    """pyoxigraph : moteur natif, sûr entre threads, sérialise lui-même le JSON"""
+
+    def __init__(self):
+        import pyoxigraph
+
+        self._ox = pyoxigraph
+        self.store = pyoxigraph.Store()
+
+    def load(self, path: str):
+        self.store.load(path=path, format=self._ox.RdfFormat.TURTLE)
+
+    def select(self, query: str) -> Dict:
+        results = self.store.query(query)
+        return json.loads(results.serialize(format=self._ox.QueryResultsFormat.JSON))
+
+    def update(self, query: str):
+        self.store.update(query)
+
+    def __len__(self) -> int:
+        return len(self.store)
+
+
+class _RdflibEngine:
+    """rdflib : pur Python, plus lent ; une opération à la fois"""
+
+    def __init__(self):
+        from rdflib import Graph
+
+        self.graph = Graph()
+        self._lock = threading.RLock()
+
+    def load(self, path: str):
+        with self._lock:
+            self.graph.parse(path, format="turtle")
+
+    @staticmethod
+    def _cell(term) -> Dict:
+        """Terme rdflib -> cellule SPARQL JSON"""
+        from rdflib import BNode, Literal
+
+        if isinstance(term, Literal):
+            cell = {"type": "literal", "value": str(term)}
+            if term.language:
+                cell["xml:lang"] = term.language
+            elif term.datatype is not None and str(term.datatype) != XSD_STRING:
+                # Comme Fuseki : xsd:string est rendu en littéral simple
+                cell["datatype"] = str(term.datatype)
+            return cell
+        if isinstance(term, BNode):
+            return {"type": "bnode", "value": str(term)}
+        return {"type": "uri", "value": str(term)}
+
+    def select(self, query: str) -> Dict:
+        with self._lock:
+            result = self.graph.query(query)
+            variables = [str(var) for var in result.vars]
+            bindings = [
+                {var: self._cell(value) for var, value in zip(variables, row) if value is not None}
+                for row in result
+            ]
+        return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+    def update(self, query: str):
+        with self._lock:
+            self.graph.update(query)
+
+    def __len__(self) -> int:
+        return len(self.graph)
+
+
+ENGINES = {"oxigraph": _OxigraphEngine, "rdflib": _RdflibEngine}
+
+
+class EmbeddedStore:
+    """Store en mémoire du processus ; interface du FusekiClient synchrone"""
+
+    flights = None  # pas de regroupement : pas d'appel réseau à économiser
+
+    def __init__(self, bootstrap: Optional[Iterable[str]] = None, engine: str = STORE_ENGINE):
+        if engine not in ENGINES:
+            raise ValueError(f"STORE_ENGINE inconnu : {engine} ({', '.join(ENGINES)})")
+        try:
+            self.engine = ENGINES[engine]()
+        except ImportError as e:
+            raise RuntimeError(f"STORE_BACKEND=embedded avec STORE_ENGINE={engine} nécessite {e.name}") from e
+        self.engine_name = engine
+        for path in bootstrap if bootstrap is not None else STORE_BOOTSTRAP:
+            if os.path.exists(path):
+                self.engine.load(path)
+            else:
+                log.warning("⚠️ Fichier d'amorçage introuvable", extra=fields(path=path))
+
+    def select(self, query: str) -> Dict:
+        return self.engine.select(query)
+
+    def select_columns(self, query: str):
+        from ai_common.sparql_columns import decode_bindings
+        return decode_bindings(self.select(query))
+
+    def update(self, query: str) -> Dict:
+        self.engine.update(query)
+        return {"success": True}
+
+    def __len__(self) -> int:
+        return len(self.engine)
+
+    def close(self):
+        pass
+
+
+class AsyncEmbeddedStore:
+    """Même store, interface de l'AsyncFusekiClient ; le travail du moteur tourne hors de la boucle"""
+
+    flights = None
+
+    def __init__(self, store: EmbeddedStore):
+        self.store = store
+
+    async def start(self):
+        return self.store
+
+    async def select(self, query: str) -> Dict:
+        return await asyncio.to_thread(self.store.select, query)
+
+    async def select_columns(self, query: str):
+        return await asyncio.to_thread(self.store.select_columns, query)
+
+    async def select_stream(self, query: str) -> AsyncIterator[Dict]:
+        result = await self.select(query)
+        for row in result["results"]["bindings"]:
+            yield row
+
+    async def update(self, query: str) -> Dict:
+        return await asyncio.to_thread(self.store.update, query)
+
+    async def close(self):
+        pass
@@ -0,0 +1,252 @@
+# fuseki_client.py - Client Fuseki partagé (sync et async) avec pool de connexions
+#
+# Un seul client par processus : les connexions TCP sont gardées ouvertes
+# (keep-alive) et réutilisées d'une requête SPARQL à l'autre, au lieu d'ouvrir
+# une connexion par appel.
+import asyncio
+import codecs
+import json
+import re
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+
+from ai_common.config import (
+    FUSEKI_CONNECT_TIMEOUT,
+    FUSEKI_KEEPALIVE,
+    FUSEKI_POOL_SIZE,
+    FUSEKI_SINGLE_FLIGHT,
+    FUSEKI_TIMEOUT,
+    FUSEKI_URL,
+    STORE_BACKEND,
+)
+from ai_common.result_cache import normalize_query
+from ai_common.single_flight import SingleFlight, ThreadSingleFlight
+
+if TYPE_CHECKING:
+    from ai_common.sparql_columns import ColumnarResult
+
+SELECT_HEADERS = {"Accept": "application/sparql-results+json"}
+UPDATE_HEADERS = {"Content-Type": "application/sparql-update"}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class BindingStreamParser:
+    """Extrait les bindings d'un flux application/sparql-results+json au fil de l'eau.
+
+    On alimente le parseur par morceaux d'octets ; chaque appel à feed() renvoie
+    les bindings complets reçus jusque-là, sans jamais garder tout le document.
+    """
+
+    _ARRAY_START = re.compile(r'"bindings"\s*:\s*\[')
+    _SEPARATOR = re.compile(r"[\s,]*")
+
+    def __init__(self):
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> List[Dict]:
+        self._buffer += self._text.decode(chunk)
+        rows = []
+        if not self._in_array:
+            match = self._ARRAY_START.search(self._buffer)
+            if match is None:
+                return rows
+            self._buffer = self._buffer[match.end():]
+            self._in_array = True
+
+        pos = 0
+        while not self.done:
+            pos = self._SEPARATOR.match(self._buffer, pos).end()
+            if pos >= len(self._buffer):
+                break
+            if self._buffer[pos] == "]":
+                self.done = True
+                break
+            try:
+                row, pos = self._decoder.raw_decode(self._buffer, pos)
+            except json.JSONDecodeError:
+                break  # binding incomplet : on attend le morceau suivant
+            rows.append(row)
+        self._buffer = self._buffer[pos:]
+        return rows
+
+
+class FusekiClient:
+    """Client synchrone basé sur une requests.Session"""
+
+    def __init__(self, endpoint: str = FUSEKI_URL, pool_size: int = FUSEKI_POOL_SIZE,
+                 connect_timeout: float = FUSEKI_CONNECT_TIMEOUT, timeout: float = FUSEKI_TIMEOUT):
+        self.endpoint = endpoint
+        self.timeout = (connect_timeout, timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        # SELECT identiques simultanés : un seul appel HTTP
+        self.flights = ThreadSingleFlight() if FUSEKI_SINGLE_FLIGHT else None
+
+    def select(self, query: str) -> Dict:
+        if self.flights is None:
+            return self._select(query)
+        return self.flights.do(normalize_query(query), lambda: self._select(query))
+
+    def _select(self, query: str) -> Dict:
+        r = self.session.post(f"{self.endpoint}/query", data={"query": query},
+                              headers=SELECT_HEADERS, timeout=self.timeout)
+        r.raise_for_status()
+        return r.json()
+
+    def select_columns(self, query: str) -> "ColumnarResult":
+        """SELECT décodé en colonnes typées (voir sparql_columns, NumPy requis)"""
+        from ai_common.sparql_columns import decode_bindings
+        return decode_bindings(self.select(query))
+
+    def update(self, query: str) -> Dict:
+        r = self.session.post(f"{self.endpoint}/update", data=query.encode("utf-8"),
+                              headers=UPDATE_HEADERS, timeout=self.timeout)
+        r.raise_for_status()
+        return {"success": True}
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncFusekiClient:
+    """Client asynchrone basé sur une aiohttp.ClientSession unique"""
+
+    def __init__(self, endpoint: str = FUSEKI_URL, pool_size: int = FUSEKI_POOL_SIZE,
+                 connect_timeout: float = FUSEKI_CONNECT_TIMEOUT, timeout: float = FUSEKI_TIMEOUT,
+                 keepalive: float = FUSEKI_KEEPALIVE):
+        self.endpoint = endpoint
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.flights = SingleFlight() if FUSEKI_SINGLE_FLIGHT else None
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Créée dans la boucle courante au premier usage (ou par start())
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def start(self):
+        """Ouvre la session et son pool dans la boucle courante"""
+        return self.session
+
+    async def select(self, query: str) -> Dict:
+        if self.flights is None:
+            return await self._select(query)
+        return await self.flights.do(normalize_query(query), lambda: self._select(query))
+
+    async def _select(self, query: str) -> Dict:
+        async with self.session.post(f"{self.endpoint}/query", data={"query": query},
+                                     headers=SELECT_HEADERS) as resp:
+            resp.raise_for_status()
+            return await resp.json(content_type=None)
+
+    async def select_columns(self, query: str) -> "ColumnarResult":
+        """SELECT décodé en colonnes typées, décodage hors de la boucle (NumPy requis)"""
+        from ai_common.sparql_columns import decode_bindings
+        return await asyncio.to_thread(decode_bindings, await self.select(query))
+
+    async def select_stream(self, query: str) -> AsyncIterator[Dict]:
+        """SELECT en flux : produit les bindings un par un à mesure qu'ils arrivent"""
+        async with self.session.post(f"{self.endpoint}/query", data={"query": query},
+                                     headers=SELECT_HEADERS) as resp:
+            resp.raise_for_status()
+            parser = BindingStreamParser()
+            async for chunk in resp.content.iter_chunked(STREAM_CHUNK_SIZE):
+                for row in parser.feed(chunk):
+                    yield row
+                if parser.done:
+                    break
+
+    async def update(self, query: str) -> Dict:
+        async with self.session.post(f"{self.endpoint}/update", data=query.encode("utf-8"),
+                                     headers=UPDATE_HEADERS) as resp:
+            resp.raise_for_status()
+            await resp.read()
+            return {"success": True}
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+_client: Optional[FusekiClient] = None
+_async_client: Optional[AsyncFusekiClient] = None
+_embedded = None
+# Applications du processus entre startup() et shutdown()
+_users = 0
+
+
+def _embedded_store():
+    """Graphe en mémoire partagé par les clients sync et async (STORE_BACKEND=embedded)"""
+    global _embedded
+    if _embedded is None:
+        from ai_common.embedded_store import EmbeddedStore
+        _embedded = EmbeddedStore()
+    return _embedded
+
+
+def get_client() -> FusekiClient:
+    """Client synchrone du processus"""
+    global _client
+    if _client is None:
+        _client = _embedded_store() if STORE_BACKEND == "embedded" else FusekiClient()
+    return _client
+
+
+def get_async_client() -> AsyncFusekiClient:
+    """Client asynchrone du processus"""
+    global _async_client
+    if _async_client is None:
+        if STORE_BACKEND == "embedded":
+            from ai_common.embedded_store import AsyncEmbeddedStore
+            _async_client = AsyncEmbeddedStore(_embedded_store())
+        else:
+            _async_client = AsyncFusekiClient()
+    return _async_client
+
+
+def stats() -> Dict:
+    """Compteurs de regroupement des SELECT (appels HTTP émis / appels regroupés)"""
+    return {
+        name: client.flights.stats()
+        for name, client in (("sync", _client), ("async", _async_client))
+        if client is not None and client.flights is not None
+    }
+
+
+async def startup():
+    """À appeler dans le lifespan FastAPI : ouvre le pool async.
+
+    Les appels sont comptés : quand plusieurs applications partagent le processus
+    (gateway.py), les pools restent ouverts jusqu'au dernier shutdown().
+    """
+    global _users
+    _users += 1
+    await get_async_client().start()
+
+
+async def shutdown():
+    """À appeler dans le lifespan FastAPI : ferme les pools sync et async"""
+    global _client, _users
+    _users = max(0, _users - 1)
+    if _users:
+        return
+    if _async_client is not None:
+        await _async_client.close()
+    if _client is not None:
+        _client.close()
+        _client = None
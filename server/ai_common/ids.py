@@ -0,0 +1,80 @@
+# ids.py - Identifiants uniques des sujets créés (format ULID)
+#
+# `int(time.time())` donne le même identifiant à deux créations dans la même
+# seconde : leurs triplets fusionnent sur un seul sujet. Un ULID fait 128 bits :
+#   - 48 bits d'horodatage en millisecondes (tri lexicographique = tri temporel),
+#   - 80 bits aléatoires tirés de os.urandom.
+# Dans la même milliseconde, la partie aléatoire est incrémentée au lieu d'être
+# retirée : les identifiants d'un processus sont strictement croissants, même si
+# l'horloge recule. Entre processus ou machines, l'unicité repose sur les 80 bits
+# aléatoires ; après un fork, l'enfant retire son propre état.
+#
+# Encodage Crockford base32 sur 26 caractères, valide dans un nom préfixé SPARQL
+# (sh:objectif_01HV...).
+import os
+import threading
+import time
+
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+RANDOM_BITS = 80
+RANDOM_MAX = (1 << RANDOM_BITS) - 1
+TIME_MAX = (1 << 48) - 1
+
+
+def encode(value: int) -> str:
+    """Entier 128 bits -> 26 caractères Crockford base32"""
+    chars = []
+    for _ in range(26):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def timestamp_ms(ulid: str) -> int:
+    """Horodatage (ms depuis l'epoch) contenu dans un ULID"""
+    value = 0
+    for char in ulid[:10]:
+        value = (value << 5) | ALPHABET.index(char)
+    return value
+
+
+class ULIDGenerator:
+    """Générateur monotone et thread-safe d'ULID"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._last_ms = -1
+        self._random = 0
+
+    def new(self) -> str:
+        now = time.time_ns() // 1_000_000
+        with self._lock:
+            if now > self._last_ms:
+                self._last_ms = now
+                self._random = int.from_bytes(os.urandom(10), "big")
+            elif self._random < RANDOM_MAX:
+                # Même milliseconde (ou horloge en retard) : on incrémente
+                self._random += 1
+            else:
+                # Partie aléatoire épuisée : on emprunte la milliseconde suivante
+                self._last_ms += 1
+                self._random = int.from_bytes(os.urandom(10), "big")
+            if self._last_ms > TIME_MAX:
+                raise OverflowError("Horodatage hors de la plage ULID")
+            value = (self._last_ms << RANDOM_BITS) | self._random
+        return encode(value)
+
+
+ulid = ULIDGenerator()
+
+if hasattr(os, "register_at_fork"):
+    # Un enfant forké ne doit pas continuer la séquence de son parent
+    os.register_at_fork(after_in_child=ulid._reset)
+
+
+def new_id(prefix: str) -> str:
+    """Nom local d'un nouveau sujet : new_id("objectif") -> "objectif_01HV..." """
+    return f"{prefix}_{ulid.new()}"
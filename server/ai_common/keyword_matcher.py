@@ -0,0 +1,99 @@
+# keyword_matcher.py - Détection de mots-clés en une seule passe
+#
+# Les vocabulaires (actions CRUD, champs, comparateurs...) sont compilés en une
+# seule expression régulière en forme de trie. Un scan du texte renvoie tous les
+# mots-clés présents, ce qui remplace les boucles `keyword in text` imbriquées
+# tout en gardant exactement la même sémantique de sous-chaîne.
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Construit une regex en trie : à une position donnée elle capture le mot-clé le plus long"""
+    trie: Dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Fin de mot-clé possible ici : le suffixe reste optionnel (gourmand = plus long d'abord)
+            return "(?:" + body + ")?"
+        return body
+
+    return build(trie)
+
+
+class KeywordHits:
+    """Résultat d'un scan : mots-clés trouvés, interrogeables par vocabulaire"""
+
+    __slots__ = ("_matcher", "keywords")
+
+    def __init__(self, matcher: "KeywordMatcher", keywords: FrozenSet[str]):
+        self._matcher = matcher
+        self.keywords = keywords
+
+    def has(self, vocabulary: str, label: str) -> bool:
+        """Vrai si au moins un mot-clé de `label` est présent"""
+        return not self.keywords.isdisjoint(self._matcher.vocabularies[vocabulary][label])
+
+    def labels(self, vocabulary: str) -> List[str]:
+        """Labels présents, dans l'ordre de déclaration du vocabulaire"""
+        return [label for label in self._matcher.vocabularies[vocabulary] if self.has(vocabulary, label)]
+
+    def first(self, vocabulary: str, default: Optional[str] = None) -> Optional[str]:
+        """Premier label présent dans l'ordre de déclaration (même priorité que les anciennes boucles)"""
+        for label in self._matcher.vocabularies[vocabulary]:
+            if self.has(vocabulary, label):
+                return label
+        return default
+
+    def keyword(self, vocabulary: str, label: str) -> Optional[str]:
+        """Premier mot-clé de `label` présent, dans l'ordre de sa liste"""
+        for keyword in self._matcher.vocabularies[vocabulary][label]:
+            if keyword in self.keywords:
+                return keyword
+        return None
+
+
+class KeywordMatcher:
+    """Regroupe plusieurs vocabulaires nommés et les détecte en une passe.
+
+    Exemple :
+        matcher = KeywordMatcher(action={'create': ['ajouter'], 'read': ['afficher']})
+        matcher.scan("afficher mes mesures").first('action', 'read')
+    """
+
+    def __init__(self, **vocabularies: Dict[str, Iterable[str]]):
+        self.vocabularies = {
+            name: {label: tuple(keywords) for label, keywords in groups.items()}
+            for name, groups in vocabularies.items()
+        }
+        keywords = {
+            keyword
+            for groups in self.vocabularies.values()
+            for group in groups.values()
+            for keyword in group
+            if keyword
+        }
+        # Lookahead : on teste chaque position, donc les occurrences qui se chevauchent sont vues
+        self._pattern = re.compile("(?=(" + _trie_pattern(keywords) + "))") if keywords else None
+        # À une position, la regex renvoie le plus long mot-clé ; ses préfixes y sont aussi présents
+        self._prefixes = {
+            keyword: frozenset(other for other in keywords if keyword.startswith(other))
+            for keyword in keywords
+        }
+
+    def scan(self, text: str) -> KeywordHits:
+        found = set()
+        if self._pattern is not None:
+            for match in self._pattern.finditer(text):
+                if match.group(1):
+                    found |= self._prefixes[match.group(1)]
+        return KeywordHits(self, frozenset(found))
@@ -0,0 +1,148 @@
+# logs.py - Journalisation structurée et non bloquante des services AI
+#
+# Les handlers n'écrivent jamais eux-mêmes sur stdout : chaque enregistrement
+# est déposé dans une file bornée (QueueHandler) et un thread QueueListener
+# fait les écritures. Si la file est pleine (pipe de logs engorgé), le message
+# est abandonné et compté au lieu de bloquer le worker.
+#
+# Les champs passés via `extra={"fields": {...}}` sont rendus en key=value
+# (LOG_FORMAT=text) ou en objet JSON (LOG_FORMAT=json). Les messages DEBUG
+# peuvent être échantillonnés (LOG_DEBUG_SAMPLE) ; le travail réservé au debug
+# doit être protégé par `if log.isEnabledFor(logging.DEBUG)`.
+import atexit
+import datetime
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+from typing import Optional
+
+from ai_common.config import LOG_DEBUG_SAMPLE, LOG_FORMAT, LOG_LEVEL, LOG_QUEUE_SIZE
+
+ROOT = "ai"
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_handler: Optional["DroppingQueueHandler"] = None
+_lock = threading.Lock()
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui abandonne (et compte) les messages quand la file est pleine"""
+
+    def __init__(self, q: queue.Queue):
+        super().__init__(q)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Le message est figé ici : les arguments ne sont pas gardés en vie dans la file
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self):
+        # File pleine à l'arrêt : on attend que le thread d'écriture la vide
+        self.queue.put(self._sentinel)
+
+
+class DebugSampler(logging.Filter):
+    """Ne garde qu'une fraction `rate` des messages DEBUG"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or self.rate >= 1 or random.random() < self.rate
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value!r}" for key, value in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging():
+    """Installe la file et son thread d'écriture (une fois par processus)"""
+    global _listener, _handler
+    with _lock:
+        if _listener is not None:
+            return
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+        _handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _handler.addFilter(DebugSampler(LOG_DEBUG_SAMPLE))
+        root = logging.getLogger(ROOT)
+        root.setLevel(LOG_LEVEL)
+        for previous in [h for h in root.handlers if isinstance(h, DroppingQueueHandler)]:
+            root.removeHandler(previous)
+        root.addHandler(_handler)
+        root.propagate = False
+
+        _listener = _Listener(_handler.queue, output, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Vide la file et arrête le thread d'écriture"""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def fields(**values) -> dict:
+    """Champs structurés : log.info("📥 Question reçue", extra=fields(question=q))"""
+    return {"fields": values}
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger `ai.<name>` branché sur la file non bloquante"""
+    setup_logging()
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def stats() -> dict:
+    return {
+        "level": logging.getLevelName(logging.getLogger(ROOT).level),
+        "queued": _handler.queue.qsize() if _handler else 0,
+        "dropped": _handler.dropped if _handler else 0,
+    }
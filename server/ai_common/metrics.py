@@ -0,0 +1,250 @@
+# metrics.py - Compteurs et histogrammes de latence par étape, format Prometheus
+#
+# Chaque requête HTTP porte une trace (contextvar) dans laquelle les étapes
+# (parse spaCy, détection, génération SPARQL, aller-retour Fuseki,
+# sérialisation...) ajoutent leur durée. À la fin de la requête, le middleware
+# enregistre ces durées avec les labels endpoint / action / entity, connus
+# seulement une fois l'analyse faite. Hors requête, stage() ne coûte presque rien.
+#
+# Pas de dépendance externe : le rendu texte suit le format d'exposition
+# Prometheus 0.0.4, servi sur /metrics par les deux applications.
+import bisect
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ai_common.config import METRICS_ENABLED
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_labels(self.label_names, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [compteurs par bucket (+Inf en dernier), somme, total]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(labels, list(series[0]), series[1], series[2]) for labels, series in self._series.items()]
+        for labels, counts, total, count in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound:g}"'
+                lines.append(f"{self.name}_bucket{_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.label_names, labels)} {total:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List = []
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        metric = Counter(name, help, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    "ai_requests_total", "Requêtes HTTP traitées", ("endpoint", "method", "status"))
+REQUEST_SECONDS = registry.histogram(
+    "ai_request_seconds", "Durée totale des requêtes HTTP", ("endpoint", "method"))
+STAGE_SECONDS = registry.histogram(
+    "ai_stage_seconds", "Durée de chaque étape d'une requête",
+    ("endpoint", "stage", "action", "entity"))
+
+
+class Trace:
+    """Étapes chronométrées d'une requête et labels connus en cours de route"""
+
+    __slots__ = ("action", "entity", "stages")
+
+    def __init__(self):
+        self.action = ""
+        self.entity = ""
+        self.stages: List[Tuple[str, float]] = []
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("ai_trace", default=None)
+
+
+class _Stage:
+    __slots__ = ("name", "trace", "start")
+
+    def __init__(self, name: str, trace: Optional[Trace]):
+        self.name = name
+        self.trace = trace
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.stages.append((self.name, time.perf_counter() - self.start))
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name: str):
+    """Chronomètre un bloc `with stage("parse"): ...` dans la trace de la requête courante"""
+    trace = _trace.get()
+    if trace is None:
+        return _NO_STAGE
+    return _Stage(name, trace)
+
+
+def label(action: Optional[str] = None, entity: Optional[str] = None):
+    """Renseigne les labels action / entity de la requête courante"""
+    trace = _trace.get()
+    if trace is not None:
+        if action is not None:
+            trace.action = action
+        if entity is not None:
+            trace.entity = entity
+
+
+def start_trace() -> Tuple[Trace, object]:
+    trace = Trace()
+    return trace, _trace.set(trace)
+
+
+def end_trace(token):
+    _trace.reset(token)
+
+
+def add_stages(stages: Iterable[Tuple[str, float]]):
+    """Ajoute des étapes mesurées ailleurs (worker d'un pool de processus)"""
+    trace = _trace.get()
+    if trace is not None:
+        trace.stages.extend(stages)
+
+
+def tracing() -> bool:
+    return _trace.get() is not None
+
+
+class MetricsMiddleware:
+    """Middleware ASGI : trace par requête, puis compteurs et histogrammes.
+
+    Le label endpoint est le chemin de la route FastAPI trouvée ; les chemins
+    inconnus (404) sont regroupés sous "other" pour borner la cardinalité.
+    """
+
+    def __init__(self, app, skip: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.skip = frozenset(skip)
+
+    async def __call__(self, scope, receive, send):
+        if not METRICS_ENABLED or scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        trace, token = start_trace()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_trace(token)
+            elapsed = time.perf_counter() - start
+            endpoint = getattr(scope.get("route"), "path", "other")
+            method = scope["method"]
+            REQUESTS.inc(endpoint, method, str(status))
+            REQUEST_SECONDS.observe(elapsed, endpoint, method)
+            for name, seconds in trace.stages:
+                STAGE_SECONDS.observe(seconds, endpoint, name, trace.action, trace.entity)
+
+
+def install(app):
+    """Ajoute le middleware et la route /metrics à une application FastAPI"""
+    from fastapi.responses import Response
+
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,186 @@
+# nlp_executor.py - Exécution du travail spaCy hors de la boucle asyncio
+#
+# Les handlers FastAPI sont `async` : un parse spaCy appelé directement bloque
+# toutes les autres requêtes du worker uvicorn. NLPExecutor envoie les appels
+# des processeurs vers un pool de threads (défaut) ou de processus, et refuse
+# les nouvelles requêtes quand la file d'attente est pleine.
+import asyncio
+import contextvars
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from ai_common import metrics
+from ai_common.analysis_tiers import TIERS
+from ai_common.config import NLP_EXECUTOR_MODE, NLP_MAX_PENDING, NLP_WORKERS
+from ai_common.nlp_registry import models
+
+# Compteurs additionnés entre workers (analysis_cache et analysis_tiers) ; les
+# autres valeurs (taille maximale, TTL, mode) sont des réglages communs
+SUMMED = frozenset({"size", "hits", "misses", "evictions", "expirations", *TIERS})
+
+
+class ExecutorSaturated(Exception):
+    """Trop de requêtes NLP en cours : l'appelant doit répondre 503"""
+
+
+# Instances des processeurs dans un worker du pool de processus
+_worker_targets: Dict[str, object] = {}
+
+
+def _init_worker(specs: Dict[str, str]):
+    """Initialise un worker : instancie chaque processeur et charge son modèle une fois"""
+    for name, spec in specs.items():
+        module_name, class_name = spec.split(":")
+        target = getattr(importlib.import_module(module_name), class_name)()
+        if hasattr(target, "nlp"):
+            target.nlp
+        _worker_targets[name] = target
+
+
+def _worker_snapshot() -> Dict:
+    """Compteurs du worker (modèles, caches, niveaux d'analyse), renvoyés avec chaque résultat"""
+    return {
+        "pid": os.getpid(),
+        "nlp": models.stats(),
+        "cache": {name: t.cache.stats() for name, t in _worker_targets.items() if hasattr(t, "cache")},
+        "tiers": {name: t.tiers.stats() for name, t in _worker_targets.items() if hasattr(t, "tiers")},
+    }
+
+
+def _call_in_worker(name: str, method: str, args: tuple, traced: bool = False):
+    """Appel dans le worker ; renvoie aussi les étapes mesurées (requête tracée) et les compteurs du worker"""
+    if not traced:
+        return getattr(_worker_targets[name], method)(*args), (), _worker_snapshot()
+    trace, token = metrics.start_trace()
+    try:
+        return getattr(_worker_targets[name], method)(*args), trace.stages, _worker_snapshot()
+    finally:
+        metrics.end_trace(token)
+
+
+def _merge(snapshots: List[Dict]) -> Dict:
+    """Additionne les compteurs de plusieurs workers et recalcule les ratios"""
+    merged = dict(snapshots[0])
+    for snapshot in snapshots[1:]:
+        for key, value in snapshot.items():
+            if key in SUMMED:
+                merged[key] += value
+    if "hits" in merged:
+        lookups = merged["hits"] + merged["misses"]
+        merged["hit_ratio"] = round(merged["hits"] / lookups, 4) if lookups else 0.0
+    if "spacy" in merged:
+        total = sum(merged[tier] for tier in TIERS)
+        merged["spacy_ratio"] = round(merged["spacy"] / total, 4) if total else 0.0
+    return merged
+
+
+class NLPExecutor:
+    """Pool d'exécution des processeurs AI.
+
+    `targets` associe un nom à une instance de processeur. En mode "process",
+    chaque worker crée sa propre instance de la même classe (les caches et
+    compteurs sont alors propres à chaque worker).
+    """
+
+    def __init__(self, targets: Dict[str, object], mode: str = NLP_EXECUTOR_MODE,
+                 max_workers: int = NLP_WORKERS, max_pending: int = NLP_MAX_PENDING):
+        if mode not in ("thread", "process", "inline"):
+            raise ValueError(f"Mode d'exécution NLP inconnu: {mode}")
+        self.targets = targets
+        self.mode = mode
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._pool: Optional[object] = None
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        # Mode "process" : derniers compteurs reçus de chaque worker (par pid)
+        self._workers: Dict[int, Dict] = {}
+
+    def start(self):
+        if self._pool is not None or self.mode == "inline":
+            return
+        if self.mode == "process":
+            specs = {name: f"{type(t).__module__}:{type(t).__qualname__}" for name, t in self.targets.items()}
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(specs,),
+            )
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="nlp")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+            self._workers.clear()
+
+    async def run(self, name: str, method: str, *args):
+        """Exécute `targets[name].method(*args)` dans le pool et attend le résultat"""
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorSaturated(f"{self._pending} requêtes NLP en attente (max {self.max_pending})")
+
+        self._pending += 1
+        try:
+            if self.mode == "inline":
+                result = getattr(self.targets[name], method)(*args)
+            else:
+                self.start()
+                loop = asyncio.get_running_loop()
+                if self.mode == "process":
+                    result, stages, snapshot = await loop.run_in_executor(
+                        self._pool, _call_in_worker, name, method, args, metrics.tracing())
+                    metrics.add_stages(stages)
+                    self._workers[snapshot["pid"]] = snapshot
+                else:
+                    # Le contexte (contextvars) de la requête suit l'appel dans le thread
+                    call = getattr(self.targets[name], method)
+                    result = await loop.run_in_executor(self._pool, contextvars.copy_context().run, call, *args)
+            self.completed += 1
+            return result
+        finally:
+            self._pending -= 1
+
+    @property
+    def counts_locally(self) -> bool:
+        """Faux en mode "process" : les processeurs du parent ne voient pas passer les appels"""
+        return self.mode != "process"
+
+    def worker_stats(self) -> Dict:
+        """Mode "process" : modèles par worker, caches et niveaux d'analyse additionnés.
+
+        Chaque worker renvoie ses compteurs avec ses résultats : un worker qui
+        n'a encore traité aucun appel n'y figure pas (ses compteurs sont nuls).
+        """
+        snapshots = list(self._workers.values())
+        return {
+            "nlp": {
+                "scope": "worker",
+                "workers": {str(s["pid"]): s["nlp"] for s in snapshots},
+                "resident_memory_bytes": sum(s["nlp"]["resident_memory_bytes"] or 0 for s in snapshots),
+            },
+            **{
+                block: {
+                    "scope": "worker",
+                    **{name: _merge([s[block][name] for s in snapshots])
+                       for name in (snapshots[0][block] if snapshots else ())},
+                }
+                for block in ("cache", "tiers")
+            },
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+        }
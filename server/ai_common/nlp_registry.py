@@ -0,0 +1,107 @@
+# nlp_registry.py - Registre partagé des modèles spaCy
+#
+# Chaque combinaison (modèle, composants) est chargée une seule fois par
+# processus, au premier usage, puis partagée entre tous les processeurs AI.
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import spacy
+
+from ai_common.logs import fields, get_logger
+
+log = get_logger("nlp_registry")
+
+DEFAULT_MODEL = "fr_core_news_sm"
+
+
+def resident_memory() -> Optional[int]:
+    """Mémoire résidente du processus en octets (None si indisponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def model_meta(name: str) -> Dict:
+    """meta.json du modèle, lu sans le charger ({} si introuvable)"""
+    try:
+        path = spacy.util.get_package_path(name)
+    except Exception:
+        path = name
+    try:
+        return spacy.util.get_model_meta(path)
+    except Exception:
+        return {}
+
+
+def model_pipeline(name: str) -> List[str]:
+    """Liste des composants déclarés par le modèle, lue dans son meta.json"""
+    return list(model_meta(name).get("pipeline", []))
+
+
+def model_labels(name: str, pipe: str) -> Optional[List[str]]:
+    """Labels d'un composant (ex. les types d'entités du NER) ; None si inconnus"""
+    labels = model_meta(name).get("labels", {}).get(pipe)
+    return list(labels) if labels is not None else None
+
+
+class ModelRegistry:
+    """Charge paresseusement les pipelines spaCy et les partage par processus.
+
+    Un processeur déclare les composants dont il a besoin (`pipes`) ; les autres
+    sont exclus au chargement. `pipes=None` charge le pipeline complet.
+    """
+
+    def __init__(self):
+        self._models: Dict[tuple, object] = {}
+        self._stats: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str = DEFAULT_MODEL, pipes: Optional[Iterable[str]] = None):
+        key = (name, frozenset(pipes) if pipes is not None else None)
+        nlp = self._models.get(key)
+        if nlp is None:
+            with self._lock:
+                nlp = self._models.get(key)
+                if nlp is None:
+                    nlp = self._load(name, key[1])
+                    self._models[key] = nlp
+        return nlp
+
+    def _load(self, name: str, pipes: Optional[frozenset]):
+        exclude = []
+        if pipes is not None:
+            exclude = [pipe for pipe in model_pipeline(name) if pipe not in pipes]
+
+        rss_before = resident_memory()
+        start = time.perf_counter()
+        nlp = spacy.load(name, exclude=exclude)
+        elapsed = time.perf_counter() - start
+        rss_after = resident_memory()
+
+        label = f"{name}[{','.join(nlp.pipe_names) or 'tokenizer'}]"
+        self._stats[label] = {
+            "pipes": list(nlp.pipe_names),
+            "excluded": exclude,
+            "load_seconds": round(elapsed, 3),
+            "rss_delta_bytes": (rss_after - rss_before) if rss_before and rss_after else None,
+        }
+        log.info("🧠 Modèle chargé", extra=fields(model=label, seconds=round(elapsed, 2)))
+        return nlp
+
+    def loaded(self) -> int:
+        return len(self._models)
+
+    def stats(self) -> Dict:
+        return {
+            "models": dict(self._stats),
+            "resident_memory_bytes": resident_memory(),
+        }
+
+
+# Registre unique du processus
+models = ModelRegistry()
@@ -0,0 +1,192 @@
+# profiling.py - Profilage à la demande d'une requête
+#
+# Une requête portant l'en-tête X-AI-Profile égal à PROFILE_TOKEN est exécutée
+# sous deux profileurs :
+#   - un seul cProfile (déterministe), activé sur le thread de la boucle ->
+#     arbre d'appels (pstats) ;
+#   - un échantillonneur qui relève les piles de tous les threads toutes les
+#     PROFILE_SAMPLE_INTERVAL secondes -> piles repliées (format flamegraph) et
+#     fonctions les plus vues : c'est lui qui couvre le pool NLP.
+# Les fichiers sont écrits dans PROFILE_DIR ; la réponse porte l'en-tête
+# X-AI-Profile-Id et GET /ai/profiles/{id} les renvoie. Le jeton n'est accepté
+# que dans l'en-tête : dans l'URL, il finirait dans les journaux d'accès.
+#
+# Sans PROFILE_TOKEN, le middleware laisse tout passer ; avec, une requête sans
+# l'en-tête ne coûte qu'une recherche dans ses en-têtes. Un seul profil à la
+# fois : un processus n'a qu'un cProfile actif (sys.monitoring depuis Python
+# 3.12), et les autres requêtes qui tournent pendant ce temps apparaissent aussi
+# dans les piles.
+import asyncio
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Optional
+
+from ai_common.config import PROFILE_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_TOKEN
+from ai_common.logs import fields, get_logger
+
+log = get_logger("profiling")
+
+HEADER = b"x-ai-profile"
+IDLE_FILES = frozenset({"threading.py", "queue.py", "selectors.py"})
+FORMATS = {"txt": "text/plain", "collapsed": "text/plain", "pstats": "application/octet-stream"}
+
+
+class StackSampler(threading.Thread):
+    """Relève périodiquement les piles de tous les threads (sauf le sien)"""
+
+    def __init__(self, interval: float):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._done = threading.Event()
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def run(self):
+        me = threading.get_ident()
+        threads = {}
+        while not self._done.wait(self.interval):
+            for thread in threading.enumerate():
+                threads[thread.ident] = thread.name
+            for ident, frame in sys._current_frames().items():
+                # Threads au repos (attente d'un verrou, d'une file, du selector) : ignorés
+                if ident != me and os.path.basename(frame.f_code.co_filename) not in IDLE_FILES:
+                    self.stacks[f"{threads.get(ident, ident)};{self._collapse(frame)}"] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class ProfileSession:
+    """Profileurs actifs pendant une requête profilée"""
+
+    def __init__(self, request: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.request = request
+        self.sampler = StackSampler(PROFILE_SAMPLE_INTERVAL)
+        self.main = cProfile.Profile()
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.sampler.start()
+        self.main.enable()
+
+    def stop(self):
+        self.main.disable()
+        self.sampler.stop()
+        self.elapsed = time.perf_counter() - self.started
+
+    def save(self, directory: str = PROFILE_DIR) -> str:
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.id)
+        stats = pstats.Stats(self.main)
+        stats.dump_stats(base + ".pstats")
+
+        tree = io.StringIO()
+        tree.write(f"# {self.request} - {self.elapsed * 1000:.1f} ms\n\n")
+        stats.stream = tree
+        stats.sort_stats("cumulative").print_stats(60)
+        stats.print_callees(25)
+        self._write_sampled(tree, 40)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(tree.getvalue())
+
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            for stack, count in self.sampler.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        return base
+
+    def _write_sampled(self, out, limit: int):
+        """Fonctions présentes dans le plus d'échantillons, tous threads confondus"""
+        total = sum(self.sampler.stacks.values())
+        inclusive: Counter = Counter()
+        for stack, count in self.sampler.stacks.items():
+            for frame in set(stack.split(";")[1:]):
+                inclusive[frame] += count
+        out.write(f"\n# Échantillons (tous threads) : {total}\n")
+        for frame, count in inclusive.most_common(limit):
+            out.write(f"{count:8d} {count / total:7.1%}  {frame}\n")
+
+
+_busy = threading.Lock()
+
+
+def _authorized(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == HEADER:
+            return _valid(value.decode("latin-1"))
+    return False
+
+
+def _valid(token: Optional[str]) -> bool:
+    return token is not None and hmac.compare_digest(token.encode(), PROFILE_TOKEN.encode())
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (not PROFILE_TOKEN or scope["type"] != "http" or not _authorized(scope)
+                or scope["path"].startswith("/ai/profiles/")):
+            await self.app(scope, receive, send)
+            return
+        if not _busy.acquire(blocking=False):
+            log.warning("⏱️ Profil déjà en cours, requête exécutée sans profil")
+            await self.app(scope, receive, send)
+            return
+
+        session = ProfileSession(f"{scope['method']} {scope['path']}")
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-ai-profile-id", session.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        session.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session.stop()
+            _busy.release()
+            path = await asyncio.to_thread(session.save)
+            log.info("⏱️ Profil enregistré", extra=fields(
+                id=session.id, request=session.request, ms=round(session.elapsed * 1000, 1), path=path))
+
+
+def install(app):
+    """Ajoute le middleware et la route de consultation des profils"""
+    from fastapi import Header, HTTPException, Query
+    from fastapi.responses import FileResponse
+
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/ai/profiles/{profile_id}", include_in_schema=False)
+    def get_profile(profile_id: str, format: str = Query("txt"),
+                    x_ai_profile: Optional[str] = Header(None)):
+        if not PROFILE_TOKEN or not _valid(x_ai_profile):
+            raise HTTPException(status_code=404, detail="Not Found")
+        if format not in FORMATS or not profile_id.isalnum():
+            raise HTTPException(status_code=400, detail=f"format parmi {', '.join(FORMATS)}")
+        path = os.path.join(PROFILE_DIR, f"{profile_id}.{format}")
+        if not os.path.exists(path):
+            raise HTTPException(status_code=404, detail="Profil introuvable")
+        return FileResponse(path, media_type=FORMATS[format])
@@ -0,0 +1,136 @@
+# result_cache.py - Cache read-through des résultats SELECT
+#
+# Les lectures générées par l'AI sont identiques d'un appel à l'autre : le
+# résultat est mémorisé sous le texte normalisé de la requête. Chaque classe
+# RDF (sh:EtatSante, sh:Objectif...) a un compteur de génération incrémenté par
+# les mises à jour qui la touchent ; une entrée lue sous une génération
+# antérieure est considérée périmée. La mémoire est bornée en octets (LRU).
+# Les écritures faites hors de ce processus (routes Node) ne sont vues qu'à
+# l'expiration du TTL : d'où SPARQL_CACHE_ENABLED=false par défaut.
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, FrozenSet
+
+from ai_common.config import SPARQL_CACHE_MAX_BYTES, SPARQL_CACHE_TTL
+
+# Littéraux entre guillemets conservés tels quels, blancs réduits ailleurs
+_TOKENS = re.compile(r'("(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\')|\s+')
+# Classes typées dans un motif : "?s a sh:X" ou "?s rdf:type sh:X"
+_CLASS = re.compile(r"(?:\ba|rdf:type)\s+sh:(\w+)")
+
+
+def normalize_query(query: str) -> str:
+    """Clé de cache : blancs réduits hors des littéraux"""
+    return _TOKENS.sub(lambda m: m.group(1) or " ", query).strip()
+
+
+def query_classes(query: str) -> FrozenSet[str]:
+    """Classes sh: mentionnées comme type dans la requête"""
+    return frozenset(_CLASS.findall(query))
+
+
+class ResultCache:
+    """Cache LRU borné en octets, invalidé par génération de classe"""
+
+    def __init__(self, max_bytes: int = SPARQL_CACHE_MAX_BYTES, ttl: float = SPARQL_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # clé -> (résultat, classes, générations lues, expiration, taille)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        # Génération globale : mises à jour dont la classe n'est pas reconnue
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _snapshot(self, classes: FrozenSet[str]) -> tuple:
+        return (self._epoch,) + tuple(self._generations.get(name, 0) for name in sorted(classes))
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key)
+        self.bytes -= entry[4]
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, classes, snapshot, expires_at, _ = entry
+                if snapshot != self._snapshot(classes) or (expires_at is not None and expires_at < time.monotonic()):
+                    self._drop(key)
+                    self.stale += 1
+                    entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: str, result, classes: FrozenSet[str], snapshot: tuple):
+        """Mémorise un résultat lu sous `snapshot` (pris avant l'appel à Fuseki)"""
+        size = len(json.dumps(result, ensure_ascii=False).encode("utf-8")) + len(key)
+        if size > self.max_bytes:
+            return
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else None
+        with self._lock:
+            if snapshot != self._snapshot(classes):
+                return  # une mise à jour est passée pendant la lecture
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (result, classes, snapshot, expires_at, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, update: str):
+        """Incrémente la génération des classes touchées par une mise à jour"""
+        classes = query_classes(update)
+        with self._lock:
+            self.invalidations += 1
+            if not classes:
+                self._epoch += 1
+            for name in classes:
+                self._generations[name] = self._generations.get(name, 0) + 1
+
+    async def select(self, query: str, fetch: Callable[[str], Awaitable[Dict]]):
+        """Lecture read-through : cache, sinon `fetch(query)` puis mémorisation"""
+        key = normalize_query(query)
+        result = self.get(key)
+        if result is not None:
+            return result
+        classes = query_classes(query)
+        with self._lock:
+            snapshot = self._snapshot(classes)
+        result = await fetch(query)
+        self.put(key, result, classes, snapshot)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "generations": dict(self._generations),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
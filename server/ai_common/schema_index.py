@@ -0,0 +1,351 @@
+# schema_index.py - Index du schéma de l'ontologie (classes, propriétés, types)
+#
+# Les générateurs SPARQL écrivaient les noms de classes et de propriétés en dur
+# (sh:aPoids, sh:EtatSante...) sans jamais les confronter à server/ontology.ttl.
+# L'index lit une fois les fichiers de SCHEMA_SOURCES (ontology.ttl puis
+# ontology-extensions.ttl) et en tire des tables de recherche :
+#   - classe -> classes parentes (rdfs:subClassOf, owl:equivalentClass dans les deux sens)
+#     et ancêtres transitifs ;
+#   - propriété -> nature (objet / littéral), domaines, portées ;
+#   - classe -> propriétés applicables (domaine = la classe ou un de ses ancêtres).
+# Plusieurs rdfs:domain sont lus comme « l'une de ces classes », à la manière
+# des routes, et non comme l'intersection de la sémantique RDFS.
+#
+# Les tables sont écrites dans un instantané binaire (marshal), clé = empreinte
+# SHA-256 des fichiers sources. Tant qu'ils ne changent pas, le démarrage relit
+# l'instantané au lieu de reparser le Turtle ; aucun aller-retour Fuseki n'est
+# nécessaire. marshal n'est pas sûr sur un fichier fourni par un tiers :
+# l'instantané n'est lu et écrit que si lui et son dossier appartiennent à
+# l'utilisateur du service et ne sont modifiables que par lui (dossier de cache
+# de l'utilisateur par défaut, jamais un répertoire partagé comme /tmp).
+import difflib
+import hashlib
+import marshal
+import os
+import re
+import stat
+import tempfile
+import threading
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from ai_common.config import SCHEMA_SNAPSHOT, SCHEMA_SOURCES
+from ai_common.ids import ALPHABET
+from ai_common.logs import fields, get_logger
+
+log = get_logger("schema_index")
+
+PREFIX = "http://www.smarthealth-tracker.com/ontologie#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+OWL = "http://www.w3.org/2002/07/owl#"
+RDFS = "http://www.w3.org/2000/01/rdf-schema#"
+PROPERTY_KINDS = {OWL + "ObjectProperty": "object", OWL + "DatatypeProperty": "datatype"}
+SNAPSHOT_VERSION = 1
+
+# Termes sh:... d'une requête ; les identifiants générés (ULID, horodatage
+# des routes Node) désignent des instances, pas des termes du schéma
+TERM = re.compile(r"\bsh:([\w\-]+)")
+INSTANCE_ID = re.compile(rf"_(?:[{ALPHABET}]{{26}}|\d{{12,14}})$")
+
+
+class SchemaError(ValueError):
+    """Classe ou propriété absente de l'ontologie, ou utilisée hors de son domaine"""
+
+
+class Property(NamedTuple):
+    name: str
+    kinds: Tuple[str, ...]    # "object" et/ou "datatype"
+    domains: Tuple[str, ...]  # noms locaux des classes
+    ranges: Tuple[str, ...]   # noms locaux des classes, ou xsd:...
+
+    @property
+    def datatype(self) -> Optional[str]:
+        """Premier type XSD de la portée (xsd:decimal...), None pour une propriété objet"""
+        return next((r for r in self.ranges if r.startswith("xsd:")), None)
+
+
+def _fold(name: str) -> str:
+    """Nom sans accents ni casse, pour les suggestions (EtatSanté ~ EtatSante)"""
+    return "".join(c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c)).lower()
+
+
+def _short(iri: str) -> str:
+    if iri.startswith(PREFIX):
+        return iri[len(PREFIX):]
+    if iri.startswith(XSD):
+        return "xsd:" + iri[len(XSD):]
+    return iri
+
+
+# ----------------------------------------------------------------------
+# Lecture des fichiers Turtle
+# ----------------------------------------------------------------------
+def _triples(path: str) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """(sujet, prédicat, objet IRI ou None pour un littéral), dans l'ordre du fichier"""
+    try:
+        import pyoxigraph
+    except ImportError:
+        pyoxigraph = None
+    if pyoxigraph is not None:
+        for triple in pyoxigraph.parse(path=path, format=pyoxigraph.RdfFormat.TURTLE):
+            obj = triple.object
+            yield triple.subject.value, triple.predicate.value, obj.value if isinstance(obj, pyoxigraph.NamedNode) else None
+        return
+    try:
+        from rdflib import Graph, URIRef
+    except ImportError as e:
+        raise RuntimeError("L'index du schéma nécessite pyoxigraph ou rdflib") from e
+    for s, p, o in Graph().parse(path, format="turtle"):
+        yield str(s), str(p), str(o) if isinstance(o, URIRef) else None
+
+
+def build(paths: Sequence[str]) -> Dict[str, Any]:
+    """Tables de l'index (types de base uniquement, sérialisables par marshal)"""
+    parents: Dict[str, List[str]] = {}
+    properties: Dict[str, Dict[str, List[str]]] = {}
+
+    def cls(name: str) -> List[str]:
+        return parents.setdefault(name, [])
+
+    def prop(name: str) -> Dict[str, List[str]]:
+        return properties.setdefault(name, {"kinds": [], "domains": [], "ranges": []})
+
+    def add(values: List[str], value: str):
+        if value not in values:
+            values.append(value)
+
+    for path in paths:
+        for s, p, o in _triples(path):
+            # Seuls les termes de l'ontologie sont indexés (owl:topDataProperty... ignorés)
+            if not s.startswith(PREFIX) or o is None:
+                continue
+            subject, obj = _short(s), _short(o)
+            if p == RDF_TYPE:
+                if o == OWL + "Class":
+                    cls(subject)
+                elif o in PROPERTY_KINDS:
+                    add(prop(subject)["kinds"], PROPERTY_KINDS[o])
+            elif p == RDFS + "subClassOf" and o.startswith(PREFIX):
+                add(cls(subject), obj)
+                cls(obj)
+            elif p == OWL + "equivalentClass" and o.startswith(PREFIX):
+                add(cls(subject), obj)
+                add(cls(obj), subject)
+            elif p == RDFS + "domain":
+                add(prop(subject)["domains"], obj)
+                if o.startswith(PREFIX):
+                    cls(obj)
+            elif p == RDFS + "range":
+                add(prop(subject)["ranges"], obj)
+                if o.startswith(PREFIX):
+                    cls(obj)
+
+    ancestors: Dict[str, Tuple[str, ...]] = {}
+    for name in parents:
+        seen: List[str] = []
+        stack = list(reversed(parents[name]))
+        while stack:
+            parent = stack.pop()
+            if parent != name and parent not in seen:
+                seen.append(parent)
+                stack.extend(reversed(parents.get(parent, [])))
+        ancestors[name] = tuple(seen)
+
+    class_properties = {
+        name: tuple(p for p, info in properties.items()
+                    if any(d == name or d in ancestors[name] for d in info["domains"]))
+        for name in parents
+    }
+    return {
+        "parents": {name: tuple(values) for name, values in parents.items()},
+        "ancestors": ancestors,
+        "properties": {name: (tuple(info["kinds"]), tuple(info["domains"]), tuple(info["ranges"]))
+                       for name, info in properties.items()},
+        "class_properties": class_properties,
+    }
+
+
+# ----------------------------------------------------------------------
+# Index
+# ----------------------------------------------------------------------
+class SchemaIndex:
+    """Tables de recherche du schéma ; construit par load(), ne change plus ensuite"""
+
+    def __init__(self, tables: Dict[str, Any], source: str = "parse", load_ms: float = 0.0):
+        self.parents: Dict[str, Tuple[str, ...]] = tables["parents"]
+        self.ancestors: Dict[str, Tuple[str, ...]] = tables["ancestors"]
+        self.properties: Dict[str, Property] = {
+            name: Property(name, *info) for name, info in tables["properties"].items()
+        }
+        self.class_properties = {name: frozenset(props) for name, props in tables["class_properties"].items()}
+        self.terms = frozenset(self.parents) | frozenset(self.properties)
+        self.source = source
+        self.load_ms = load_ms
+
+    # --- classes -------------------------------------------------------
+    def has_class(self, name: str) -> bool:
+        return name in self.parents
+
+    def require_class(self, name: str) -> str:
+        if name not in self.parents:
+            raise SchemaError(f"Classe inconnue de l'ontologie : sh:{name}{self._suggest(name, self.parents)}")
+        return name
+
+    def is_a(self, name: str, parent: str) -> bool:
+        """Vrai si `name` est `parent`, une sous-classe ou une classe équivalente"""
+        return name == parent or parent in self.ancestors.get(name, ())
+
+    def subclasses(self, name: str) -> List[str]:
+        """Sous-classes strictes (transitives) de `name`, classes équivalentes exclues"""
+        self.require_class(name)
+        return [c for c, ancestors in self.ancestors.items()
+                if name in ancestors and c not in self.ancestors[name]]
+
+    def subclass_for(self, name: str, word: str) -> str:
+        """Sous-classe de `name` dont le nom commence par `word` (allergie -> Allergie)"""
+        folded = _fold(word)
+        for candidate in self.subclasses(name):
+            if _fold(candidate).startswith(folded):
+                return candidate
+        raise SchemaError(f"Aucune sous-classe de sh:{name} pour « {word} »")
+
+    # --- propriétés ----------------------------------------------------
+    def properties_of(self, name: str) -> frozenset:
+        return self.class_properties[self.require_class(name)]
+
+    def require_property(self, cls: str, name: str) -> Property:
+        """Propriété `name` utilisable sur la classe `cls`"""
+        prop = self.properties.get(name)
+        if prop is None:
+            raise SchemaError(f"Propriété inconnue de l'ontologie : sh:{name}{self._suggest(name, self.properties)}")
+        if name not in self.properties_of(cls):
+            domains = ", ".join(f"sh:{d}" for d in prop.domains) or "aucun"
+            raise SchemaError(f"sh:{name} ne s'applique pas à sh:{cls} (domaine : {domains})")
+        return prop
+
+    def require_properties(self, cls: str, names: Iterable[str]) -> List[Property]:
+        return [self.require_property(cls, name) for name in names]
+
+    def literal(self, prop: str, value: Any) -> str:
+        """Littéral typé selon la portée de la propriété : "72.5"^^xsd:decimal"""
+        datatype = self.properties[prop].datatype if prop in self.properties else None
+        if datatype is None:
+            raise SchemaError(f"sh:{prop} n'a pas de type littéral dans l'ontologie")
+        text = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        return f'"{text}"^^{datatype}'
+
+    # --- génération et validation --------------------------------------
+    def triples(self, cls: str, subject: str, values: Dict[str, Any], types: Sequence[str] = ()) -> str:
+        """Bloc `sh:sujet a sh:Classe ; sh:prop "valeur"^^xsd:... .` validé contre le schéma"""
+        self.require_class(cls)
+        classes = [cls] + [self.require_class(t) for t in types if t != cls]
+        lines = [f"sh:{subject} a " + " , ".join(f"sh:{c}" for c in classes)]
+        for prop, value in values.items():
+            self.require_property(cls, prop)
+            lines.append(f"sh:{prop} {self.literal(prop, value)}")
+        return " ;\n    ".join(lines) + " ."
+
+    def validate(self, query: str) -> List[str]:
+        """Termes sh:... de la requête absents du schéma (identifiants d'instances ignorés)"""
+        unknown = []
+        for term in TERM.findall(query):
+            if term not in self.terms and not INSTANCE_ID.search(term) and term not in unknown:
+                unknown.append(term)
+        return unknown
+
+    def stats(self) -> Dict:
+        return {
+            "classes": len(self.parents),
+            "properties": len(self.properties),
+            "source": self.source,
+            "load_ms": round(self.load_ms, 3),
+        }
+
+    @staticmethod
+    def _suggest(name: str, known: Iterable[str]) -> str:
+        known = list(known)
+        folded = _fold(name)
+        matches = [k for k in known if _fold(k) == folded] or difflib.get_close_matches(name, known, n=1)
+        return f" (sh:{matches[0]} ?)" if matches else ""
+
+
+# ----------------------------------------------------------------------
+# Chargement : instantané si les sources n'ont pas changé, sinon parsing
+# ----------------------------------------------------------------------
+def digest(paths: Sequence[str]) -> str:
+    h = hashlib.sha256(f"v{SNAPSHOT_VERSION}".encode())
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(os.path.abspath(path).encode() + b"\0" + f.read() + b"\0")
+    return h.hexdigest()
+
+
+def _private(path: str) -> bool:
+    """Vrai si `path` (fichier ou dossier) appartient à l'utilisateur courant, n'est
+    pas un lien symbolique et n'est pas modifiable par le groupe ni les autres"""
+    if not hasattr(os, "getuid"):
+        return True
+    st = os.lstat(path)
+    return not stat.S_ISLNK(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o022
+
+
+def _read_snapshot(path: str, key: str) -> Optional[Dict[str, Any]]:
+    try:
+        if not (_private(os.path.dirname(os.path.abspath(path))) and _private(path)):
+            log.warning("⚠️ Instantané du schéma ignoré : fichier ou dossier modifiable par un autre utilisateur",
+                        extra=fields(path=path))
+            return None
+        with open(path, "rb") as f:
+            state = marshal.load(f)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if not isinstance(state, dict) or state.get("version") != SNAPSHOT_VERSION or state.get("digest") != key:
+        return None
+    return state.get("tables")
+
+
+def _write_snapshot(path: str, key: str, tables: Dict[str, Any]):
+    """Écriture atomique : un autre worker ne lit jamais un instantané à moitié écrit"""
+    directory = os.path.dirname(os.path.abspath(path))
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        if not _private(directory):
+            log.warning("⚠️ Instantané du schéma non écrit : dossier modifiable par un autre utilisateur",
+                        extra=fields(path=path))
+            return
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".schema-")
+        with os.fdopen(fd, "wb") as f:
+            marshal.dump({"version": SNAPSHOT_VERSION, "digest": key, "tables": tables}, f)
+        os.replace(tmp, path)
+    except OSError as e:
+        log.warning("⚠️ Instantané du schéma non écrit", extra=fields(path=path, error=str(e)))
+
+
+def load(sources: Sequence[str] = SCHEMA_SOURCES, snapshot: Optional[str] = SCHEMA_SNAPSHOT) -> SchemaIndex:
+    start = time.perf_counter()
+    key = digest(sources)
+    tables = _read_snapshot(snapshot, key) if snapshot else None
+    source = "snapshot"
+    if tables is None:
+        tables, source = build(sources), "parse"
+        if snapshot:
+            _write_snapshot(snapshot, key, tables)
+    index = SchemaIndex(tables, source, (time.perf_counter() - start) * 1000)
+    log.info("🗂️ Index du schéma chargé", extra=fields(**index.stats()))
+    return index
+
+
+_index: Optional[SchemaIndex] = None
+_lock = threading.Lock()
+
+
+def get_schema() -> SchemaIndex:
+    """Index partagé du processus, chargé au premier appel"""
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = load()
+    return _index
@@ -0,0 +1,78 @@
+# single_flight.py - Regroupement des requêtes identiques simultanées
+#
+# Tant qu'une requête est en vol, les appels identiques attendent son résultat
+# au lieu d'émettre leur propre appel HTTP : une rafale de N lectures
+# identiques ne coûte qu'un aller-retour vers Fuseki.
+import asyncio
+import threading
+from typing import Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """Version asyncio : un seul appel en vol par clé, partagé par les suivants"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            self.calls += 1
+            # Tâche à part : l'annulation d'un appelant n'interrompt pas les autres
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class ThreadSingleFlight:
+    """Version threads, pour le client synchrone"""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.coalesced = 0
+
+    def do(self, key: Hashable, fn: Callable):
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                self.calls += 1
+            else:
+                self.coalesced += 1
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def stats(self) -> Dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "inflight": len(self._inflight)}
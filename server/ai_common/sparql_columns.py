@@ -0,0 +1,252 @@
+# sparql_columns.py - Décodage en colonnes typées des résultats SELECT
+#
+# Le JSON application/sparql-results+json donne, par ligne, un dict par
+# variable ({"type", "value", "datatype"}) où tout est chaîne : 100k lignes
+# pèsent des centaines de Mo et chaque consommateur reparse les valeurs.
+# decode_bindings() produit une colonne par variable :
+#   - xsd:decimal / double / float -> tableau float64 (NaN = absent) ;
+#   - entiers XSD -> int64 + masque, lus par int() (exacts au-delà de 2**53) ;
+#   - xsd:boolean -> tableau bool + masque ;
+#   - xsd:dateTime / xsd:date -> datetime64[us] (NaT = absent, fuseau ramené en UTC) ;
+#   - IRI, chaînes et autres littéraux -> codes int32 vers un dictionnaire de
+#     valeurs internées (-1 = absent), chaque valeur distincte n'existant qu'une fois.
+# Un entier ou une date illisible est marqué absent dans le masque.
+# Une colonne dont les cellules mélangent les types, ou dont un entier dépasse
+# int64, est gardée en chaînes.
+# Row offre une vue ligne (__slots__) pour les appelants qui veulent des enregistrements.
+import datetime
+import sys
+import warnings
+from itertools import repeat
+from operator import itemgetter
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+INT64 = np.iinfo(np.int64)
+XSD = "http://www.w3.org/2001/XMLSchema#"
+INTEGER_TYPES = frozenset(XSD + t for t in (
+    "integer", "int", "long", "short", "byte", "nonNegativeInteger", "positiveInteger",
+    "nonPositiveInteger", "negativeInteger", "unsignedInt", "unsignedLong", "unsignedShort", "unsignedByte"))
+FLOAT_TYPES = frozenset(XSD + t for t in ("decimal", "double", "float"))
+DATETIME_TYPES = frozenset((XSD + "dateTime", XSD + "date"))
+BOOLEAN_TYPE = XSD + "boolean"
+
+
+def _kind(term: str, datatype: Optional[str]) -> str:
+    if term == "uri":
+        return "iri"
+    if datatype in INTEGER_TYPES:
+        return "integer"
+    if datatype in FLOAT_TYPES:
+        return "float"
+    if datatype in DATETIME_TYPES:
+        return "datetime"
+    if datatype == BOOLEAN_TYPE:
+        return "boolean"
+    return "string"
+
+
+def _parse_int(value: str) -> int:
+    """Entier XSD ; OverflowError hors de int64"""
+    parsed = int(value)
+    if not INT64.min <= parsed <= INT64.max:
+        raise OverflowError(value)
+    return parsed
+
+
+def _parse_each(parse, values: List[Optional[str]]) -> List[Any]:
+    """Valeurs lues une à une, None pour les absentes et les illisibles"""
+    parsed = []
+    for value in values:
+        try:
+            parsed.append(parse(value) if value is not None else None)
+        except ValueError:
+            parsed.append(None)
+    return parsed
+
+
+def _integers(values: List[Optional[str]], mask: np.ndarray):
+    """Tableau int64 + masque ; les entiers illisibles sont masqués (OverflowError hors de int64)"""
+    n = len(values)
+    if mask.all():
+        try:
+            return np.fromiter(map(_parse_int, values), dtype=np.int64, count=n), mask
+        except ValueError:
+            pass
+    parsed = _parse_each(_parse_int, values)
+    mask = np.fromiter((v is not None for v in parsed), dtype=bool, count=n)
+    return np.fromiter((v if v is not None else 0 for v in parsed), dtype=np.int64, count=n), mask
+
+
+def _parse_datetime(value: str) -> np.datetime64:
+    """Valeur xsd:dateTime avec fuseau -> instant UTC sans fuseau"""
+    parsed = datetime.datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return np.datetime64(parsed, "us")
+
+
+class Column:
+    """Valeurs typées d'une variable ; `mask` marque les cellules présentes"""
+
+    __slots__ = ("name", "kind", "data", "mask", "categories")
+
+    def __init__(self, name: str, kind: str, data: np.ndarray, mask: np.ndarray,
+                 categories: Optional[List[str]] = None):
+        self.name = name
+        self.kind = kind
+        self.data = data
+        self.mask = mask
+        self.categories = categories
+
+    @classmethod
+    def decode(cls, name: str, cells: List[Optional[Dict]]) -> "Column":
+        n = len(cells)
+        present = [cell for cell in cells if cell is not None]
+        complete = len(present) == n
+        mask = np.ones(n, dtype=bool) if complete else np.fromiter(
+            (cell is not None for cell in cells), dtype=bool, count=n)
+        terms = set(map(itemgetter("type"), present))
+        datatypes = set(map(dict.get, present, repeat("datatype")))
+        kinds = {_kind(term, datatype) for term in terms for datatype in datatypes}
+        if kinds == {"integer", "float"}:
+            kinds = {"float"}
+        kind = kinds.pop() if len(kinds) == 1 else "string"
+        values = list(map(itemgetter("value"), cells)) if complete else [
+            cell["value"] if cell is not None else None for cell in cells]
+
+        if kind == "integer":
+            try:
+                data, mask = _integers(values, mask)
+            except OverflowError:
+                kind = "string"  # au-delà de int64 : valeurs exactes en chaînes
+            else:
+                return cls(name, kind, data, mask)
+        if kind == "float":
+            if complete:
+                data = np.fromiter(map(float, values), dtype=np.float64, count=n)
+            else:
+                data = np.fromiter((float(v) if v is not None else np.nan for v in values), dtype=np.float64, count=n)
+            return cls(name, kind, data, mask)
+        if kind == "boolean":
+            data = np.fromiter((v in ("true", "1") for v in values), dtype=bool, count=n)
+            return cls(name, kind, data, mask)
+        if kind == "datetime":
+            text = values if complete else [v if v is not None else "NaT" for v in values]
+            try:
+                with warnings.catch_warnings():
+                    # NumPy n'accepte les fuseaux qu'avec un avertissement de dépréciation
+                    warnings.simplefilter("error")
+                    data = np.array(text, dtype="datetime64[us]")
+            except (ValueError, Warning):
+                # Fuseau horaire explicite ou valeur hors format : conversion valeur par valeur
+                parsed = _parse_each(_parse_datetime, values)
+                data = np.array([v if v is not None else np.datetime64("NaT") for v in parsed],
+                                dtype="datetime64[us]")
+            # Valeurs illisibles (ou littéral "NaT") : absentes
+            mask = mask & ~np.isnat(data)
+            return cls(name, kind, data, mask)
+
+        # IRI et chaînes : dictionnaire des valeurs distinctes (internées) + codes
+        index = dict.fromkeys(values)
+        index.pop(None, None)
+        categories = list(map(sys.intern, index))
+        index = dict(zip(categories, range(len(categories))))
+        index[None] = -1
+        codes = np.fromiter(map(index.__getitem__, values), dtype=np.int32, count=n)
+        return cls(name, kind, codes, mask, categories)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def value(self, i: int) -> Any:
+        """Valeur Python de la ligne i (None si absente)"""
+        if not self.mask[i]:
+            return None
+        if self.categories is not None:
+            return self.categories[self.data[i]]
+        if self.kind == "datetime":
+            return self.data[i].astype(datetime.datetime)
+        return self.data[i].item()
+
+    def values(self) -> List[Any]:
+        """Valeurs Python de toute la colonne (None si absente)"""
+        if self.categories is not None:
+            categories = self.categories
+            return [categories[code] if code >= 0 else None for code in self.data.tolist()]
+        data = self.data.astype(datetime.datetime) if self.kind == "datetime" else self.data
+        return [v if present else None for v, present in zip(data.tolist(), self.mask.tolist())]
+
+    @property
+    def nbytes(self) -> int:
+        size = self.data.nbytes + self.mask.nbytes
+        if self.categories is not None:
+            size += sum(sys.getsizeof(value) for value in self.categories) + sys.getsizeof(self.categories)
+        return size
+
+
+class Row:
+    """Vue sur une ligne d'un ColumnarResult : row.imc, row["imc"], row.as_dict()"""
+
+    __slots__ = ("_columns", "_i")
+
+    def __init__(self, columns: Dict[str, Column], i: int):
+        self._columns = columns
+        self._i = i
+
+    def __getitem__(self, name: str) -> Any:
+        return self._columns[name].value(self._i)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._columns[name].value(self._i)
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: column.value(self._i) for name, column in self._columns.items()}
+
+    def __repr__(self) -> str:
+        return f"Row({self.as_dict()!r})"
+
+
+class ColumnarResult:
+    """Résultat SELECT en colonnes typées, dans l'ordre des variables de l'en-tête"""
+
+    __slots__ = ("variables", "columns", "length")
+
+    def __init__(self, variables: List[str], columns: Dict[str, Column], length: int):
+        self.variables = variables
+        self.columns = columns
+        self.length = length
+
+    def __len__(self) -> int:
+        return self.length
+
+    def __getitem__(self, name: str) -> Column:
+        return self.columns[name]
+
+    def row(self, i: int) -> Row:
+        return Row(self.columns, i)
+
+    def rows(self) -> Iterator[Row]:
+        columns = self.columns
+        return (Row(columns, i) for i in range(self.length))
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Lignes en dicts {variable: valeur typée}, colonne par colonne"""
+        columns = [column.values() for column in self.columns.values()]
+        return [dict(zip(self.columns, values)) for values in zip(*columns)]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.nbytes for column in self.columns.values())
+
+
+def decode_bindings(result: Dict) -> ColumnarResult:
+    """application/sparql-results+json (déjà chargé) -> ColumnarResult"""
+    bindings = result["results"]["bindings"]
+    variables = list(result.get("head", {}).get("vars") or (bindings[0].keys() if bindings else []))
+    columns = {name: Column.decode(name, list(map(dict.get, bindings, repeat(name)))) for name in variables}
+    return ColumnarResult(variables, columns, len(bindings))
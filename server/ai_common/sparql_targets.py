@@ -0,0 +1,92 @@
+# sparql_targets.py - Modifications et suppressions ciblées sur des sujets précis
+#
+# Un `DELETE WHERE { ?s a sh:Classe ; ?p ?o }` parcourt et réécrit toutes les
+# instances de la classe : son coût croît avec le store et il efface les
+# données de tout le monde. Ici la commande est d'abord résolue en IRI :
+#   - identifiants cités dans la commande (sh:objectif_01HV..., objectif_01HV...) ;
+#   - sinon, les sujets qui correspondent au filtre : le plus récent seulement,
+#     ou tous si la commande dit "tous" / "toutes" ;
+# puis la mise à jour est liée à ces IRI par `VALUES ?s { ... }`.
+#
+# Le motif `?s a sh:Classe` reste dans le WHERE : il vérifie le type des sujets
+# (lié, il ne coûte qu'une recherche) et sert à l'invalidation du cache par classe.
+# Classe, propriété de date et champs modifiés sont vérifiés dans l'index du schéma.
+import re
+from typing import Any, List, Optional
+
+from ai_common.schema_index import get_schema
+
+PREFIX = "http://www.smarthealth-tracker.com/ontologie#"
+HEADER = f"PREFIX sh: <{PREFIX}>\nPREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n"
+
+ALL_WORDS = re.compile(r"\b(?:tous|toutes)\b")
+SAFE_IRI = re.compile(r'^[^\s<>"{}|\\^`]+$')
+
+
+class Target:
+    """Classe RDF ciblée, son nom local de sujet et sa propriété de date"""
+
+    def __init__(self, cls: str, local: str, date: str):
+        get_schema().require_property(cls, date)
+        self.cls = cls
+        self.local = local
+        self.date = date
+        # Nom local seul, préfixé (sh:...) ou dans l'IRI complète
+        self._explicit = re.compile(rf"\b({re.escape(local)}_[A-Za-z0-9]+)\b")
+
+    def explicit_subjects(self, text: str) -> List[str]:
+        """IRI des identifiants cités dans la commande, dans l'ordre, sans doublon"""
+        return list(dict.fromkeys(PREFIX + local for local in self._explicit.findall(text)))
+
+    def select_subjects(self, text: str, where: str = "") -> str:
+        """SELECT ?s des sujets visés : le plus récent, ou tous si la commande le dit"""
+        limit = "" if ALL_WORDS.search(text.lower()) else "LIMIT 1"
+        return HEADER + f"""
+        SELECT ?s WHERE {{
+          ?s a sh:{self.cls} ;
+             sh:{self.date} ?date .
+          {where}
+        }}
+        ORDER BY DESC(?date) DESC(STR(?s))
+        {limit}
+        """
+
+    def delete(self, subjects: List[str]) -> str:
+        return HEADER + f"""
+        DELETE {{ ?s ?p ?o }}
+        WHERE {{
+          {values(subjects)}
+          ?s a sh:{self.cls} ;
+             ?p ?o .
+        }}
+        """
+
+    def update(self, subjects: List[str], field: str, value: Any) -> str:
+        """Remplace la valeur de sh:`field` par `value`, typée selon l'ontologie, sur chaque sujet"""
+        schema = get_schema()
+        schema.require_property(self.cls, field)
+        literal = schema.literal(field, value)
+        return HEADER + f"""
+        DELETE {{ ?s sh:{field} ?old }}
+        INSERT {{ ?s sh:{field} {literal} }}
+        WHERE {{
+          {values(subjects)}
+          ?s a sh:{self.cls} ;
+             sh:{field} ?old .
+        }}
+        """
+
+
+def values(subjects: List[str]) -> str:
+    """`VALUES ?s { <iri> ... }` ; ValueError si une IRI n'est pas sûre à insérer"""
+    for subject in subjects:
+        if not SAFE_IRI.match(subject):
+            raise ValueError(f"IRI invalide : {subject!r}")
+    return "VALUES ?s { " + " ".join(f"<{subject}>" for subject in subjects) + " }"
+
+
+def subjects_from(result: Optional[dict]) -> List[str]:
+    """IRI de la colonne ?s d'un résultat SELECT"""
+    if not result:
+        return []
+    return [row["s"]["value"] for row in result["results"]["bindings"] if row.get("s", {}).get("type") == "uri"]
@@ -0,0 +1,259 @@
+# stats_engine.py - Statistiques incrémentales (NumPy) sur les mesures et scores
+#
+# Les valeurs de chaque sujet (IMC, calories, scores...) sont chargées dans des
+# tableaux float64 typés (NaN = valeur absente). Les agrégats sont entretenus au
+# fil des synchronisations plutôt que recalculés :
+#   - compte, somme et somme des carrés par champ -> moyenne, écart-type ;
+#   - tableau trié par champ (insertion / retrait par searchsorted) -> min, max,
+#     percentiles exacts sans tri complet ;
+#   - histogramme à bornes fixes (+ débordements bas / haut) ;
+#   - compte et somme par jour -> moyennes glissantes sur N jours.
+# Une synchronisation compare l'instantané reçu aux sujets connus : seuls les
+# sujets ajoutés, modifiés ou disparus font bouger les agrégats.
+#
+# La date d'une mesure est celle de son identifiant : ULID (ai_common.ids) ou
+# horodatage en millisecondes des routes Node (mesure_1718000000000).
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ai_common.ids import ALPHABET, timestamp_ms
+from ai_common.sparql_columns import decode_bindings
+
+DAY_MS = 86_400_000
+ULID_SUFFIX = re.compile(rf"_([{ALPHABET}]{{26}})$")
+MILLIS_SUFFIX = re.compile(r"_(\d{12,14})$")
+NO_DAY = np.iinfo(np.int64).min
+
+
+def subject_day(iri: str) -> int:
+    """Jour (depuis l'epoch) encodé dans l'identifiant du sujet, NO_DAY si aucun"""
+    match = ULID_SUFFIX.search(iri)
+    if match:
+        return timestamp_ms(match.group(1)) // DAY_MS
+    match = MILLIS_SUFFIX.search(iri)
+    if match:
+        return int(match.group(1)) // DAY_MS
+    return NO_DAY
+
+
+class StatsEngine:
+    """Agrégats incrémentaux sur une série de sujets à champs numériques.
+
+    `fields` associe chaque champ à ses bornes d'histogramme (bas, haut, nombre de classes).
+    """
+
+    def __init__(self, fields: Dict[str, Tuple[float, float, int]]):
+        self.fields = list(fields)
+        self.edges = [np.linspace(low, high, bins + 1) for low, high, bins in fields.values()]
+        width = len(self.fields)
+        # Lignes connues : sujet -> index dans la matrice des valeurs (lignes libérées réutilisées)
+        self._index: Dict[str, int] = {}
+        self._matrix = np.empty((0, width))
+        self._days = np.empty(0, dtype=np.int64)
+        self._free: List[int] = []
+        self.count = np.zeros(width, dtype=np.int64)
+        self.total = np.zeros(width)
+        self.squares = np.zeros(width)
+        self.sorted = [np.empty(0) for _ in self.fields]
+        # Classe 0 : sous la borne basse ; dernière classe : au-dessus de la borne haute
+        self.histograms = [np.zeros(len(edges) + 1, dtype=np.int64) for edges in self.edges]
+        self.daily: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self.updated_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def stale(self, max_age: float) -> bool:
+        return self.updated_at is None or time.monotonic() - self.updated_at > max_age
+
+    # ------------------------------------------------------------------
+    # Chargement
+    # ------------------------------------------------------------------
+    def sync_bindings(self, result: Dict, subject: str, variables: Sequence[str]) -> Dict:
+        """Synchronise avec un résultat SELECT complet (`variables` dans l'ordre des champs)"""
+        columns = decode_bindings(result)
+        values = np.empty((len(columns), len(variables)))
+        for f, var in enumerate(variables):
+            column = columns.columns.get(var)
+            if column is None or column.kind not in ("float", "integer"):
+                values[:, f] = np.nan
+            else:
+                values[:, f] = np.where(column.mask, column.data, np.nan)
+        subjects = columns[subject].values() if len(columns) else []
+        return self.sync(subjects, values)
+
+    def sync(self, subjects: List[str], values: np.ndarray, complete: bool = True) -> Dict:
+        """Applique un instantané (sujets, tableau n x champs).
+
+        Avec complete=True, les sujets connus absents de l'instantané sont retirés ;
+        sinon (arrivée de nouvelles mesures seulement) ils sont conservés.
+        """
+        values = np.asarray(values, dtype=np.float64).reshape(len(subjects), len(self.fields))
+        last = {subject: i for i, subject in enumerate(subjects)}
+        if len(last) != len(subjects):
+            # Sujet répété (plusieurs valeurs d'une propriété) : on garde sa dernière ligne
+            keep = sorted(last.values())
+            subjects, values = [subjects[i] for i in keep], values[keep]
+        with self._lock:
+            slots = np.fromiter((self._index.get(s, -1) for s in subjects), dtype=np.int64, count=len(subjects))
+            known = np.flatnonzero(slots >= 0)
+            added = np.flatnonzero(slots < 0)
+            # Comparaison vectorisée, NaN == NaN
+            before, after = self._matrix[slots[known]], values[known]
+            same = ((before == after) | (np.isnan(before) & np.isnan(after))).all(axis=1)
+            changed = known[~same]
+
+            removed: List[str] = []
+            if complete and len(self._index) > known.size:
+                seen = set(slots[known].tolist())
+                removed = [s for s, slot in self._index.items() if slot not in seen]
+
+            retracted = np.concatenate([slots[changed], [self._index[s] for s in removed]]).astype(np.int64)
+            if retracted.size:
+                self._apply(self._matrix[retracted], self._days[retracted], -1)
+            for subject in removed:
+                self._free.append(self._index.pop(subject))
+
+            if changed.size:
+                self._matrix[slots[changed]] = values[changed]
+                self._apply(values[changed], self._days[slots[changed]], 1)
+            if added.size:
+                days = np.fromiter((subject_day(subjects[i]) for i in added), dtype=np.int64, count=added.size)
+                self._store([subjects[i] for i in added], values[added], days)
+                self._apply(values[added], days, 1)
+            self.updated_at = time.monotonic()
+            return {"added": int(added.size), "changed": int(changed.size), "removed": len(removed)}
+
+    def _store(self, subjects: List[str], rows: np.ndarray, days: np.ndarray):
+        """Range de nouvelles lignes dans la matrice (lignes libres d'abord, puis agrandissement)"""
+        reused = min(len(self._free), len(subjects))
+        slots = [self._free.pop() for _ in range(reused)]
+        grow = len(subjects) - reused
+        if grow:
+            size = len(self._index) + len(self._free) + reused
+            if size + grow > self._matrix.shape[0]:
+                capacity = max(size + grow, 2 * self._matrix.shape[0], 64)
+                self._matrix = np.resize(self._matrix, (capacity, len(self.fields)))
+                self._days = np.resize(self._days, capacity)
+            slots.extend(range(size, size + grow))
+        for subject, slot in zip(subjects, slots):
+            self._index[subject] = slot
+        self._matrix[slots] = rows
+        self._days[slots] = days
+
+    def _apply(self, rows: np.ndarray, days: np.ndarray, sign: int):
+        """Ajoute (sign=1) ou retire (sign=-1) des lignes de tous les agrégats"""
+        present = ~np.isnan(rows)
+        filled = np.where(present, rows, 0.0)
+        self.count += sign * present.sum(axis=0)
+        self.total += sign * filled.sum(axis=0)
+        self.squares += sign * (filled * filled).sum(axis=0)
+
+        for f in range(len(self.fields)):
+            column = np.sort(rows[present[:, f], f])
+            if not column.size:
+                continue
+            if sign > 0:
+                self.sorted[f] = np.insert(self.sorted[f], np.searchsorted(self.sorted[f], column), column)
+            else:
+                # Valeurs répétées : chaque copie vise une position distincte du bloc égal
+                positions = np.searchsorted(self.sorted[f], column)
+                positions += np.arange(column.size) - np.searchsorted(column, column)
+                self.sorted[f] = np.delete(self.sorted[f], positions)
+            bins = np.searchsorted(self.edges[f], column, side="right")
+            bins[column == self.edges[f][-1]] -= 1  # borne haute incluse dans la dernière classe
+            self.histograms[f] += sign * np.bincount(bins, minlength=len(self.edges[f]) + 1)
+
+        dated = days != NO_DAY
+        if dated.any():
+            unique, inverse = np.unique(days[dated], return_inverse=True)
+            counts = np.zeros((unique.size, len(self.fields)), dtype=np.int64)
+            sums = np.zeros((unique.size, len(self.fields)))
+            np.add.at(counts, inverse, present[dated])
+            np.add.at(sums, inverse, filled[dated])
+            for day, day_counts, day_sums in zip(unique.tolist(), counts, sums):
+                current = self.daily.get(day)
+                if current is None:
+                    current = self.daily[day] = (np.zeros(len(self.fields), dtype=np.int64), np.zeros(len(self.fields)))
+                current[0][:] += sign * day_counts
+                current[1][:] += sign * day_sums
+                if not current[0].any():
+                    del self.daily[day]
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+    def summary(self, percentiles: Iterable[float] = (5, 25, 50, 75, 95),
+                window: int = 7, days: int = 30) -> Dict:
+        percentiles = np.asarray(list(percentiles), dtype=np.float64)
+        with self._lock:
+            fields = {}
+            for f, name in enumerate(self.fields):
+                fields[name] = self._field_summary(f, percentiles)
+            return {
+                "subjects": len(self._index),
+                "fields": fields,
+                "rolling": self._rolling(window, days),
+            }
+
+    def _field_summary(self, f: int, percentiles: np.ndarray) -> Dict:
+        n = int(self.count[f])
+        values = self.sorted[f]
+        histogram = {
+            "edges": self.edges[f].tolist(),
+            "counts": self.histograms[f][1:-1].tolist(),
+            "below": int(self.histograms[f][0]),
+            "above": int(self.histograms[f][-1]),
+        }
+        if not n:
+            return {"count": 0, "histogram": histogram}
+        mean = self.total[f] / n
+        variance = max(0.0, self.squares[f] / n - mean * mean)
+        # Interpolation linéaire, comme np.percentile, sur le tableau déjà trié
+        position = percentiles / 100 * (n - 1)
+        low = np.floor(position).astype(np.int64)
+        high = np.minimum(low + 1, n - 1)
+        quantiles = values[low] + (values[high] - values[low]) * (position - low)
+        return {
+            "count": n,
+            "mean": round(float(mean), 4),
+            "std": round(float(np.sqrt(variance)), 4),
+            "min": float(values[0]),
+            "max": float(values[-1]),
+            "percentiles": {f"p{p:g}": round(float(q), 4) for p, q in zip(percentiles, quantiles)},
+            "histogram": histogram,
+        }
+
+    def _rolling(self, window: int, days: int) -> Dict:
+        """Moyenne glissante sur `window` jours, pour les `days` derniers jours ayant des données"""
+        if not self.daily or window < 1:
+            return {"window_days": window, "dates": [], "fields": {}}
+        ordered = sorted(self.daily)
+        first, last = ordered[0], ordered[-1]
+        span = last - first + 1
+        counts = np.zeros((span, len(self.fields)), dtype=np.int64)
+        sums = np.zeros((span, len(self.fields)))
+        for day in ordered:
+            counts[day - first], sums[day - first] = self.daily[day]
+        # Sommes glissantes par différence de sommes cumulées
+        counts = np.cumsum(counts, axis=0)
+        sums = np.cumsum(sums, axis=0)
+        counts[window:] = counts[window:] - counts[:-window]
+        sums[window:] = sums[window:] - sums[:-window]
+        start = max(0, span - days)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            means = np.where(counts[start:] > 0, sums[start:] / counts[start:], np.nan)
+        dates = (np.arange(first + start, last + 1) * DAY_MS).astype("datetime64[ms]").astype("datetime64[D]")
+        return {
+            "window_days": window,
+            "dates": [str(d) for d in dates],
+            "fields": {
+                name: [None if np.isnan(v) else round(float(v), 4) for v in means[:, f]]
+                for f, name in enumerate(self.fields)
+            },
+        }
@@ -0,0 +1,238 @@
+# write_buffer.py - Write-behind des INSERT DATA vers Fuseki
+#
+# Chaque création via /ai/execute envoie son propre INSERT DATA, soit une
+# transaction d'écriture TDB par commande. Le buffer regroupe les insertions en
+# attente en un seul bloc INSERT DATA, envoyé quand le lot est plein ou à
+# intervalle régulier. Les échecs d'envoi sont conservés et exposés par status().
+#
+# En durabilité "immediate", la création est déjà acquittée quand le lot part :
+# un lot en échec est remis en tête de file et renvoyé aux intervalles suivants,
+# jusqu'à WRITE_BEHIND_MAX_ATTEMPTS tentatives par instruction ; au-delà, les
+# instructions sont gardées dans dead_letters jusqu'à ce qu'un opérateur les
+# renvoie (retry_dead_letters) ou les abandonne (clear_dead_letters).
+import asyncio
+import re
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from ai_common.config import (
+    WRITE_BEHIND_DURABILITY,
+    WRITE_BEHIND_INTERVAL,
+    WRITE_BEHIND_MAX_ATTEMPTS,
+    WRITE_BEHIND_MAX_BATCH,
+)
+from ai_common.logs import fields, get_logger
+
+log = get_logger("write_buffer")
+
+INSERT_DATA = re.compile(
+    r"^\s*(?P<prefixes>(?:PREFIX\s+[\w-]*:\s*<[^>]*>\s*)*)INSERT\s+DATA\s*\{(?P<body>.*)\}\s*$",
+    re.IGNORECASE | re.DOTALL,
+)
+PREFIX_DECL = re.compile(r"PREFIX\s+([\w-]*):\s*<([^>]*)>", re.IGNORECASE)
+
+
+def split_insert_data(query: str) -> Tuple[Dict[str, str], str]:
+    """Sépare un INSERT DATA en (préfixes, triplets) ; ValueError si ce n'en est pas un"""
+    match = INSERT_DATA.match(query)
+    if match is None:
+        raise ValueError("Seules les requêtes INSERT DATA peuvent être différées")
+    prefixes = dict(PREFIX_DECL.findall(match.group("prefixes")))
+    body = match.group("body").strip()
+    if body and not body.endswith("."):
+        body += " ."
+    return prefixes, body
+
+
+def merge_insert_data(prefixes: Dict[str, str], bodies: List[str]) -> str:
+    header = "\n".join(f"PREFIX {name}: <{iri}>" for name, iri in prefixes.items())
+    return f"{header}\nINSERT DATA {{\n" + "\n".join(bodies) + "\n}"
+
+
+class WriteBehindBuffer:
+    """Regroupe les INSERT DATA et les envoie par lots via `send(query)`.
+
+    durability="flush"     : submit() rend la main une fois le lot écrit (ou lève l'erreur)
+    durability="immediate" : submit() rend la main dès la mise en file ; les lots en
+                             échec sont renvoyés (max_attempts), puis gardés dans dead_letters
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable], max_batch: int = WRITE_BEHIND_MAX_BATCH,
+                 interval: float = WRITE_BEHIND_INTERVAL, durability: str = WRITE_BEHIND_DURABILITY,
+                 max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS):
+        if durability not in ("flush", "immediate"):
+            raise ValueError(f"Mode de durabilité inconnu: {durability}")
+        self.send = send
+        self.max_batch = max_batch
+        self.interval = interval
+        self.durability = durability
+        self.max_attempts = max_attempts
+        self._prefixes: Dict[str, str] = {}
+        self._bodies: List[str] = []
+        self._attempts: List[int] = []  # échecs déjà subis par chaque instruction en file
+        self._waiters: List[asyncio.Future] = []
+        self._flush_lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._tasks = set()
+        self.submitted = 0
+        self.flushes = 0
+        self.statements_written = 0
+        self.failed_flushes = 0
+        self.failures = deque(maxlen=20)
+        self.requeued = 0
+        self.dead_letters: List[Dict] = []
+
+    async def start(self):
+        if self._timer is None:
+            self._timer = asyncio.create_task(self._run_timer())
+
+    async def stop(self):
+        """Arrête le timer puis écrit ce qui reste en file ; ce qui n'a pas pu être
+        écrit est journalisé avec la requête, pour être rejoué à la main"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        try:
+            await self.flush()
+        except Exception:
+            pass  # déjà enregistré dans self.failures
+        if self._bodies:
+            self._bury(self._prefixes, self._bodies, "arrêt du service avant écriture")
+            self._prefixes, self._bodies, self._attempts = {}, [], []
+        for letter in self.dead_letters:
+            log.error("❌ INSERT DATA non écrit à l'arrêt", extra=fields(
+                statements=len(letter["bodies"]), error=letter["error"],
+                query=merge_insert_data(letter["prefixes"], letter["bodies"])))
+
+    async def _run_timer(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception:
+                pass  # déjà enregistré dans self.failures
+
+    async def submit(self, query: str) -> Dict:
+        prefixes, body = split_insert_data(query)
+        if any(self._prefixes.get(name, iri) != iri for name, iri in prefixes.items()):
+            # Préfixe redéfini autrement : on vide d'abord le lot courant
+            await self.flush()
+
+        self._prefixes.update(prefixes)
+        self._bodies.append(body)
+        self._attempts.append(0)
+        self.submitted += 1
+        waiter = None
+        if self.durability == "flush":
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+
+        if len(self._bodies) >= self.max_batch:
+            task = asyncio.create_task(self.flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._flush_done)
+
+        if waiter is not None:
+            return await waiter
+        return {"success": True, "queued": True}
+
+    def _flush_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled():
+            task.exception()  # déjà enregistrée dans self.failures
+
+    async def flush(self):
+        """Envoie le lot en attente en un seul INSERT DATA"""
+        async with self._flush_lock:
+            if not self._bodies:
+                return
+            prefixes, bodies, attempts, waiters = self._prefixes, self._bodies, self._attempts, self._waiters
+            self._prefixes, self._bodies, self._attempts, self._waiters = {}, [], [], []
+
+            query = merge_insert_data(prefixes, bodies)
+            try:
+                await self.send(query)
+            except Exception as e:
+                self.failed_flushes += 1
+                self.failures.append({
+                    "time": time.time(),
+                    "error": str(e),
+                    "statements": len(bodies),
+                    "query": query,
+                })
+                for waiter in waiters:
+                    if not waiter.done():
+                        waiter.set_exception(e)
+                if self.durability == "immediate":
+                    self._requeue(prefixes, bodies, attempts, str(e))
+                raise
+            self.flushes += 1
+            self.statements_written += len(bodies)
+            for waiter in waiters:
+                if not waiter.done():
+                    waiter.set_result({"success": True, "batched": len(bodies)})
+
+    def _requeue(self, prefixes: Dict[str, str], bodies: List[str], attempts: List[int], error: str):
+        """Remet un lot en échec en tête de file ; les instructions à bout de tentatives
+        (ou dont les préfixes ne sont plus compatibles avec la file) vont dans dead_letters"""
+        attempts = [n + 1 for n in attempts]
+        retry = [(body, n) for body, n in zip(bodies, attempts) if n < self.max_attempts]
+        dead = [body for body, n in zip(bodies, attempts) if n >= self.max_attempts]
+        if retry and any(self._prefixes.get(name, iri) != iri for name, iri in prefixes.items()):
+            dead += [body for body, _ in retry]
+            retry = []
+        if retry:
+            self._prefixes = {**prefixes, **self._prefixes}
+            self._bodies[:0] = [body for body, _ in retry]
+            self._attempts[:0] = [n for _, n in retry]
+            self.requeued += len(retry)
+        if dead:
+            self._bury(prefixes, dead, error)
+
+    def _bury(self, prefixes: Dict[str, str], bodies: List[str], error: str):
+        self.dead_letters.append({"time": time.time(), "error": error, "prefixes": dict(prefixes), "bodies": bodies})
+        log.error("❌ INSERT DATA abandonné après échecs, gardé pour un opérateur",
+                  extra=fields(statements=len(bodies), error=error))
+
+    def retry_dead_letters(self) -> int:
+        """Remet en file les instructions abandonnées (tentatives remises à zéro)"""
+        count = 0
+        letters, self.dead_letters = self.dead_letters, []
+        for letter in letters:
+            if any(self._prefixes.get(name, iri) != iri for name, iri in letter["prefixes"].items()):
+                self.dead_letters.append(letter)
+                continue
+            self._prefixes.update(letter["prefixes"])
+            self._bodies.extend(letter["bodies"])
+            self._attempts.extend([0] * len(letter["bodies"]))
+            count += len(letter["bodies"])
+        return count
+
+    def clear_dead_letters(self) -> int:
+        """Abandonne définitivement les instructions gardées ; renvoie leur nombre"""
+        count = sum(len(letter["bodies"]) for letter in self.dead_letters)
+        self.dead_letters = []
+        return count
+
+    def status(self) -> Dict:
+        return {
+            "durability": self.durability,
+            "max_batch": self.max_batch,
+            "interval": self.interval,
+            "pending": len(self._bodies),
+            "submitted": self.submitted,
+            "flushes": self.flushes,
+            "statements_written": self.statements_written,
+            "failed_flushes": self.failed_flushes,
+            "last_error": self.failures[-1]["error"] if self.failures else None,
+            "failures": list(self.failures),
+            "max_attempts": self.max_attempts,
+            "requeued": self.requeued,
+            "dead_letters": sum(len(letter["bodies"]) for letter in self.dead_letters),
+            "dead_letter_batches": [
+                {"time": letter["time"], "error": letter["error"], "statements": len(letter["bodies"]),
+                 "query": merge_insert_data(letter["prefixes"], letter["bodies"])}
+                for letter in self.dead_letters
+            ],
+        }
@@ -1,13 +1,61 @@
 # ai_processor.py - Version corrigée
-import spacy
+import logging
+import os
 import re
+import sys
 from typing import Dict, List
+from config import NLP_BATCH_SIZE
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ai_common.analysis_cache import AnalysisCache
+from ai_common.analysis_tiers import TierCounter, rules_enabled
+from ai_common.keyword_matcher import KeywordMatcher
+from ai_common.logs import fields, get_logger
+from ai_common.metrics import stage
+from ai_common.nlp_registry import DEFAULT_MODEL, model_labels, models
+from sparql_generator import MESURES_SCHEMA, SCORES_SCHEMA, check_lexicon
+
+log = get_logger("ai_processor")
+
+# Labels NER dont _extract_entities_with_spacy tire des valeurs
+NUMERIC_LABELS = ("CARDINAL", "QUANTITY")
+
+
+def iter_docs(nlp, texts: List[str], batch_size: int = NLP_BATCH_SIZE):
+    """Analyse les textes par lots avec nlp.pipe, dans l'ordre d'entrée.
+
+    Produit un Doc par texte, ou l'exception levée pour ce texte : si un lot
+    échoue dans nlp.pipe, ses textes sont repris un par un pour isoler l'erreur.
+    """
+    batch_size = max(1, batch_size)
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start:start + batch_size]
+        try:
+            docs = list(nlp.pipe(chunk, batch_size=batch_size))
+        except Exception:
+            docs = []
+            for text in chunk:
+                try:
+                    docs.append(nlp(text))
+                except Exception as e:
+                    docs.append(e)
+        yield from docs
+
 
 class MesuresAIProcessor:
+    # Seul le NER est lu (doc.ents) ; parser, lemmatizer, etc. sont exclus au chargement
+    required_pipes = ("ner",)
+
     def __init__(self):
-        # Charger le modèle français que vous venez d'installer
-        self.nlp = spacy.load("fr_core_news_sm")
+        self.cache = AnalysisCache()
+        self.tiers = TierCounter("mesures")
+        self._ner_numeric = None
         self.setup_patterns()
+
+    @property
+    def nlp(self):
+        """Modèle français partagé, chargé au premier usage"""
+        return models.get(pipes=self.required_pipes)
     
     def setup_patterns(self):
         """Configuration des motifs pour comprendre le domaine des mesures"""
@@ -23,19 +71,113 @@ class MesuresAIProcessor:
             'calories': ['calories', 'énergie', 'kcal'],
             'mesurevalue': ['mesure', 'pas', 'steps', 'activité', 'exercice']
         }
+        check_lexicon(MESURES_SCHEMA, self.mesure_fields)
+        
+        self.filter_keywords = {
+            'imc_eleve': ['élevé', 'haut', 'supérieur', 'grand', 'obésité', 'surpoids'],
+            'imc_normal': ['normal', 'idéal', 'santé'],
+            'imc_faible': ['faible', 'bas', 'inférieur', 'petit', 'maigreur'],
+            'calories': ['calories'],
+            'superieur': ['supérieur', 'plus de', '>'],
+            'inferieur': ['inférieur', 'moins de', '<'],
+            'eleve': ['élevé', 'haut']
+        }
+        
+        self.sort_keywords = {
+            'desc': ['plus haut', 'décroissant', 'du plus grand au plus petit'],
+            'asc': ['plus bas', 'croissant', 'du plus petit au plus grand'],
+            'trier': ['trier']
+        }
+        
+        # Tous les vocabulaires sont détectés en une seule passe sur la question
+        self.matcher = KeywordMatcher(
+            action=self.crud_keywords,
+            field=self.mesure_fields,
+            filter=self.filter_keywords,
+            sort=self.sort_keywords
+        )
 
     def process_question(self, question: str) -> Dict:
-        """Traite la question naturelle avec spaCy"""
-        print(f"🔍 Traitement de la question: {question}")
-        doc = self.nlp(question.lower())
+        """Traite la question naturelle : règles d'abord, spaCy si elles ne concluent pas"""
+        log.debug("🔍 Traitement de la question", extra=fields(question=question))
+        cached = self.cache.get(question)
+        if cached is not None:
+            self.tiers.hit("cache")
+            cached['original_question'] = question
+            return cached
+        
+        doc = None
+        if self._rules_conclusive(question):
+            self.tiers.hit("rules")
+        else:
+            self.tiers.hit("spacy")
+            with stage("parse"):
+                doc = self.nlp(question.lower())
+        with stage("detect"):
+            result = self._analyze(question, doc)
+        self.cache.put(question, result)
+        return result
+
+    def _rules_conclusive(self, question: str) -> bool:
+        """Vrai si l'analyse par règles donne le même résultat que le parse spaCy.
+
+        L'action, les filtres et le tri ne dépendent que des mots-clés ; seules
+        les valeurs numériques peuvent venir du NER. Si le modèle ne produit
+        aucune entité numérique (fr_core_news_sm : LOC, MISC, ORG, PER) ou si la
+        question ne contient aucun chiffre, spaCy n'apporte rien.
+        """
+        if not rules_enabled():
+            return False
+        if self._ner_numeric is None:
+            labels = model_labels(DEFAULT_MODEL, "ner")
+            # Labels inconnus : on suppose que le NER peut trouver des nombres
+            self._ner_numeric = labels is None or any(label in labels for label in NUMERIC_LABELS)
+        return not self._ner_numeric or not any(char.isdigit() for char in question)
+
+    def process_questions(self, questions: List[str], batch_size: int = NLP_BATCH_SIZE) -> List[Dict]:
+        """Traite une liste de questions en lot avec nlp.pipe.
+
+        Les résultats sont renvoyés dans l'ordre des questions ; une question en
+        erreur donne {'error': ..., 'original_question': ...} sans bloquer le lot.
+        """
+        results = [self.cache.get(q) for q in questions]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        self.tiers.hit("cache", len(questions) - len(pending))
+        
+        # Seules les questions que les règles ne tranchent pas passent par nlp.pipe
+        parsed = [i for i in pending if not self._rules_conclusive(questions[i])]
+        docs = dict(zip(parsed, iter_docs(self.nlp, [questions[i].lower() for i in parsed], batch_size)))
+        for i in pending:
+            question = questions[i]
+            doc = docs.get(i)
+            self.tiers.hit("spacy" if i in docs else "rules")
+            try:
+                if isinstance(doc, Exception):
+                    raise doc
+                results[i] = self._analyze(question, doc)
+                self.cache.put(question, results[i])
+            except Exception as e:
+                log.warning("❌ Erreur sur une question du lot", extra=fields(question=question, error=str(e)))
+                results[i] = {'error': str(e)}
         
-        # Debug: afficher les tokens
-        print(f"📝 Tokens: {[token.text for token in doc]}")
+        for question, result in zip(questions, results):
+            result['original_question'] = question
+        return results
+
+    def _analyze(self, question: str, doc=None) -> Dict:
+        """Analyse une question à partir de son Doc spaCy (None : règles seules)"""
+        # Debug: liste des tokens, construite seulement si le niveau DEBUG est actif
+        if doc is not None and log.isEnabledFor(logging.DEBUG):
+            log.debug("📝 Tokens", extra=fields(tokens=[token.text for token in doc]))
         
-        action = self._detect_crud_action(question)
-        entities = self._extract_entities_with_spacy(doc)
-        filters = self._detect_filters(question)
-        sort_config = self._detect_sort(question)
+        hits = self.matcher.scan(question.lower())
+        action = self._detect_crud_action(question, hits)
+        if doc is not None:
+            entities = self._extract_entities_with_spacy(doc, hits)
+        else:
+            entities = self._extract_entities_with_rules(question.lower(), hits)
+        filters = self._detect_filters(question, hits)
+        sort_config = self._detect_sort(question, hits)
         
         result = {
             'action': action,
@@ -45,114 +187,119 @@ class MesuresAIProcessor:
             'original_question': question
         }
         
-        print(f"🎯 Résultat analyse: {result}")
+        log.debug("🎯 Résultat analyse", extra=fields(**result))
         return result
     
-    def _detect_crud_action(self, question: str) -> str:
+    def _detect_crud_action(self, question: str, hits=None) -> str:
         """Détecte l'action CRUD - version améliorée"""
         question_lower = question.lower()
-        print(f"🔎 Détection action CRUD: {question_lower}")
+        log.debug("🔎 Détection action CRUD", extra=fields(question=question_lower))
+        hits = hits or self.matcher.scan(question_lower)
         
-        for action, keywords in self.crud_keywords.items():
-            for keyword in keywords:
-                if keyword in question_lower:
-                    print(f"✅ Action détectée: {action} (mot-clé: {keyword})")
-                    return action
+        action = hits.first('action')
+        if action:
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug("✅ Action détectée", extra=fields(action=action, keyword=hits.keyword('action', action)))
+            return action
         
-        print("ℹ️  Action par défaut: read")
+        log.debug("ℹ️  Action par défaut: read")
         return 'read'
 
-    def _extract_entities_with_spacy(self, doc) -> Dict:
+    def _extract_entities_with_spacy(self, doc, hits=None) -> Dict:
         """Extrait les entités avec spaCy - version améliorée"""
         entities = {}
         
-        print("🔍 Extraction des entités...")
+        debug = log.isEnabledFor(logging.DEBUG)
         
         # Méthode 1: Extraction avec spaCy
         for ent in doc.ents:
-            print(f"🏷️  Entité spaCy: {ent.text} (label: {ent.label_})")
+            if debug:
+                log.debug("🏷️  Entité spaCy", extra=fields(text=ent.text, label=ent.label_))
             if ent.label_ in ["CARDINAL", "QUANTITY"]:
                 # Associer aux champs basé sur le contexte
                 for i in range(max(0, ent.start-3), min(len(doc), ent.end+3)):
                     token_text = doc[i].text.lower()
-                    for field, keywords in self.mesure_fields.items():
-                        if any(keyword in token_text for keyword in keywords):
-                            try:
-                                entities[field] = float(ent.text)
-                                print(f"✅ {field} = {ent.text}")
-                                break
-                            except ValueError:
-                                continue
+                    field = self.matcher.scan(token_text).first('field')
+                    if field:
+                        try:
+                            entities[field] = float(ent.text)
+                            if debug:
+                                log.debug("✅ Champ extrait", extra=fields(field=field, value=ent.text))
+                        except ValueError:
+                            continue
         
         # Méthode 2: Fallback avec regex si spaCy ne trouve rien
         if not entities:
-            numbers = re.findall(r'\d+\.?\d*', doc.text)
-            print(f"🔢 Nombres trouvés par regex: {numbers}")
-            
-            for field, keywords in self.mesure_fields.items():
-                for keyword in keywords:
-                    if keyword in doc.text and numbers:
-                        entities[field] = float(numbers[0])
-                        print(f"✅ {field} = {numbers[0]} (fallback regex)")
-                        numbers.pop(0)
-                        break
-        
-        print(f"📊 Entités finales: {entities}")
+            return self._extract_entities_with_rules(doc.text, hits)
+        
+        log.debug("📊 Entités finales", extra=fields(entities=entities))
         return entities
 
-    def _detect_filters(self, question: str) -> List[Dict]:
+    def _extract_entities_with_rules(self, text: str, hits=None) -> Dict:
+        """Associe les nombres trouvés par regex aux champs, dans l'ordre"""
+        entities = {}
+        debug = log.isEnabledFor(logging.DEBUG)
+        numbers = re.findall(r'\d+\.?\d*', text)
+        if debug:
+            log.debug("🔢 Nombres trouvés par regex", extra=fields(numbers=list(numbers)))
+        hits = hits or self.matcher.scan(text)
+        
+        for field in hits.labels('field'):
+            if numbers:
+                entities[field] = float(numbers[0])
+                if debug:
+                    log.debug("✅ Champ extrait (fallback regex)", extra=fields(field=field, value=numbers[0]))
+                numbers.pop(0)
+        
+        log.debug("📊 Entités finales", extra=fields(entities=entities))
+        return entities
+
+    def _detect_filters(self, question: str, hits=None) -> List[Dict]:
         """Détecte les filtres dans la question - version améliorée"""
         filters = []
         question_lower = question.lower()
-        
-        print(f"🔍 Analyse des filtres pour: {question_lower}")
+        hits = hits or self.matcher.scan(question_lower)
         
         # Filtres pour IMC avec plages spécifiques
-        if any(word in question_lower for word in ['élevé', 'haut', 'supérieur', 'grand', 'obésité', 'surpoids']):
+        if hits.has('filter', 'imc_eleve'):
             filters.append({'field': 'imc', 'operator': '>', 'value': '25', 'description': 'IMC élevé (>25)'})
-            print("✅ Filtre IMC élevé détecté")
         
-        elif any(word in question_lower for word in ['normal', 'idéal', 'santé']):
+        elif hits.has('filter', 'imc_normal'):
             filters.append({'field': 'imc', 'operator': '>=', 'value': '18.5', 'description': 'IMC normal (18.5-25)'})
             filters.append({'field': 'imc', 'operator': '<=', 'value': '25', 'description': 'IMC normal (18.5-25)'})
-            print("✅ Filtre IMC normal détecté")
         
-        elif any(word in question_lower for word in ['faible', 'bas', 'inférieur', 'petit', 'maigreur']):
+        elif hits.has('filter', 'imc_faible'):
             filters.append({'field': 'imc', 'operator': '<', 'value': '18.5', 'description': 'IMC faible (<18.5)'})
-            print("✅ Filtre IMC faible détecté")
         
         # Filtres pour calories
-        if 'calories' in question_lower:
-            if 'supérieur' in question_lower or 'plus de' in question_lower or '>' in question_lower:
+        if hits.has('filter', 'calories'):
+            if hits.has('filter', 'superieur'):
                 numbers = re.findall(r'\d+', question_lower)
                 if numbers:
                     value = numbers[0]
                     filters.append({'field': 'calories', 'operator': '>', 'value': value, 'description': f'Calories > {value}'})
-                    print(f"✅ Filtre calories > {value} détecté")
             
-            elif 'inférieur' in question_lower or 'moins de' in question_lower or '<' in question_lower:
+            elif hits.has('filter', 'inferieur'):
                 numbers = re.findall(r'\d+', question_lower)
                 if numbers:
                     value = numbers[0]
                     filters.append({'field': 'calories', 'operator': '<', 'value': value, 'description': f'Calories < {value}'})
-                    print(f"✅ Filtre calories < {value} détecté")
             
-            elif 'élevé' in question_lower or 'haut' in question_lower:
+            elif hits.has('filter', 'eleve'):
                 filters.append({'field': 'calories', 'operator': '>', 'value': '2000', 'description': 'Calories élevées (>2000)'})
-                print("✅ Filtre calories élevées détecté")
         
-        print(f"📊 Filtres appliqués: {filters}")
+        log.debug("📊 Filtres appliqués", extra=fields(question=question_lower, filters=filters))
         return filters
 
-    def _detect_sort(self, question: str) -> Dict:
+    def _detect_sort(self, question: str, hits=None) -> Dict:
         """Détecte les demandes de tri"""
-        question_lower = question.lower()
+        hits = hits or self.matcher.scan(question.lower())
         
-        if any(phrase in question_lower for phrase in ['plus haut', 'décroissant', 'du plus grand au plus petit']):
+        if hits.has('sort', 'desc'):
             return {'field': 'imc', 'direction': 'DESC'}
-        elif any(phrase in question_lower for phrase in ['plus bas', 'croissant', 'du plus petit au plus grand']):
+        elif hits.has('sort', 'asc'):
             return {'field': 'imc', 'direction': 'ASC'}
-        elif 'trier' in question_lower and 'calories' in question_lower:
+        elif hits.has('sort', 'trier') and hits.has('filter', 'calories'):
             return {'field': 'calories', 'direction': 'DESC'}
         
         return {}
@@ -214,4 +361,180 @@ class MesuresAIProcessor:
                 "Enregistrer avec l'heure actuelle"
             ]
         
-        return suggestions
\ No newline at end of file
+        return suggestions
+
+
+class ScoresAIProcessor:
+    # L'extraction est faite par regex : la tokenisation suffit
+    required_pipes = ()
+
+    def __init__(self):
+        self.cache = AnalysisCache()
+        self.tiers = TierCounter("scores")
+        self.setup_patterns()
+
+    @property
+    def nlp(self):
+        return models.get(pipes=self.required_pipes)
+    
+    def setup_patterns(self):
+        self.crud_keywords = {
+            'create': ['ajouter', 'ajoute', 'créer', 'nouveau', 'nouvelle', 'insérer'],
+            'read': ['afficher', 'montrer', 'lister', 'voir', 'trouver', 'chercher'],
+            'update': ['modifier', 'changer', 'éditer', 'mettre à jour', 'corriger'],
+            'delete': ['supprimer', 'effacer', 'retirer', 'enlever']
+        }
+        
+        self.score_fields = {
+            'activite': ['activité', 'activite', 'exercice', 'sport', 'physique'],
+            'globale': ['globale', 'global', 'général', 'general', 'total'],
+            'nutrition': ['nutrition', 'alimentation', 'nourriture', 'diète'],
+            'sommeil': ['sommeil', 'dormir', 'repos', 'nuit']
+        }
+        check_lexicon(SCORES_SCHEMA, self.score_fields)
+        
+        self.filter_keywords = {
+            'eleve': ['élevé', 'haut', 'supérieur', 'excellent', 'bon'],
+            'faible': ['faible', 'bas', 'inférieur', 'mauvais'],
+            'superieur': ['>', 'supérieur'],
+            'inferieur': ['<', 'inférieur']
+        }
+        
+        self.matcher = KeywordMatcher(
+            action=self.crud_keywords,
+            field=self.score_fields,
+            filter=self.filter_keywords
+        )
+
+    def process_question(self, question: str) -> Dict:
+        log.debug("🔍 Traitement score", extra=fields(question=question))
+        cached = self.cache.get(question)
+        if cached is not None:
+            self.tiers.hit("cache")
+            cached['original_question'] = question
+            return cached
+        
+        # Toute l'extraction est faite par regex : les règles concluent toujours
+        doc = None
+        if rules_enabled():
+            self.tiers.hit("rules")
+        else:
+            self.tiers.hit("spacy")
+            with stage("parse"):
+                doc = self.nlp(question.lower())
+        with stage("detect"):
+            result = self._analyze(question, doc)
+        self.cache.put(question, result)
+        return result
+
+    def process_questions(self, questions: List[str], batch_size: int = NLP_BATCH_SIZE) -> List[Dict]:
+        """Traite une liste de questions scores en lot avec nlp.pipe (sauf en mode à étages)"""
+        results = [self.cache.get(q) for q in questions]
+        pending = [i for i, cached in enumerate(results) if cached is None]
+        self.tiers.hit("cache", len(questions) - len(pending))
+        
+        if rules_enabled():
+            docs = [None] * len(pending)
+        else:
+            docs = iter_docs(self.nlp, [questions[i].lower() for i in pending], batch_size)
+        for i, doc in zip(pending, docs):
+            self.tiers.hit("spacy" if doc is not None else "rules")
+            question = questions[i]
+            try:
+                if isinstance(doc, Exception):
+                    raise doc
+                results[i] = self._analyze(question, doc)
+                self.cache.put(question, results[i])
+            except Exception as e:
+                log.warning("❌ Erreur sur une question scores du lot", extra=fields(question=question, error=str(e)))
+                results[i] = {'error': str(e)}
+        
+        for question, result in zip(questions, results):
+            result['original_question'] = question
+        return results
+
+    def _analyze(self, question: str, doc=None) -> Dict:
+        hits = self.matcher.scan(question.lower())
+        action = self._detect_crud_action(question, hits)
+        entities = self._extract_entities(doc, question, hits)
+        filters = self._detect_filters(question, hits)
+        
+        result = {
+            'action': action,
+            'entities': entities,
+            'filters': filters,
+            'original_question': question
+        }
+        
+        log.debug("🎯 Résultat analyse scores", extra=fields(**result))
+        return result
+    
+    def _detect_crud_action(self, question: str, hits=None) -> str:
+        hits = hits or self.matcher.scan(question.lower())
+        
+        action = hits.first('action')
+        if action:
+            log.debug("✅ Action scores détectée", extra=fields(action=action))
+            return action
+        
+        return 'read'
+
+    def _extract_entities(self, doc, question: str, hits=None) -> Dict:
+        entities = {}
+        numbers = re.findall(r'\d+', question)
+        hits = hits or self.matcher.scan(question.lower())
+        
+        for field in hits.labels('field'):
+            if numbers:
+                entities[field] = int(numbers[0])
+                log.debug("✅ Champ score extrait", extra=fields(field=field, value=numbers[0]))
+                numbers.pop(0)
+        
+        return entities
+
+    def _detect_filters(self, question: str, hits=None) -> List[Dict]:
+        filters = []
+        question_lower = question.lower()
+        numbers = re.findall(r'\d+', question_lower)
+        hits = hits or self.matcher.scan(question_lower)
+        
+        # Filtres pour scores élevés
+        if hits.has('filter', 'eleve'):
+            filters.append({'field': 'globale', 'operator': '>', 'value': '80', 'description': 'Score excellent (>80)'})
+        
+        # Filtres pour scores faibles
+        elif hits.has('filter', 'faible'):
+            filters.append({'field': 'globale', 'operator': '<', 'value': '60', 'description': 'Score faible (<60)'})
+        
+        # Filtres avec nombres
+        elif numbers:
+            if hits.has('filter', 'superieur'):
+                filters.append({'field': 'globale', 'operator': '>', 'value': numbers[0], 'description': f'Score > {numbers[0]}'})
+            elif hits.has('filter', 'inferieur'):
+                filters.append({'field': 'globale', 'operator': '<', 'value': numbers[0], 'description': f'Score < {numbers[0]}'})
+        
+        return filters
+
+    def generate_natural_response(self, analysis: Dict) -> str:
+        action = analysis['action']
+        entities = analysis['entities']
+        filters = analysis['filters']
+        
+        if action == 'create':
+            if entities:
+                details = [f"{field}: {value}" for field, value in entities.items()]
+                return f"Je vais créer un nouveau score santé avec {', '.join(details)}"
+            return "Je vais ajouter un nouveau score santé"
+        
+        elif action == 'read':
+            if filters:
+                return f"Je recherche les scores santé correspondant aux critères"
+            return "Voici tous vos scores santé"
+        
+        elif action == 'update':
+            return "Je vais modifier le score santé sélectionné"
+        
+        elif action == 'delete':
+            return "Je supprime le score santé comme demandé"
+        
+        return "J'ai compris votre demande concernant les scores santé"
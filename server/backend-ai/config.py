@@ -0,0 +1,9 @@
+# config.py - Configuration du service AI Mesures
+import os
+
+# Traitement en lot (nlp.pipe)
+NLP_BATCH_SIZE = int(os.getenv("NLP_BATCH_SIZE", "64"))
+MAX_BATCH_QUESTIONS = int(os.getenv("MAX_BATCH_QUESTIONS", "1000"))
+
+# Statistiques (/ai/stats) : âge maximal des agrégats avant resynchronisation avec Fuseki
+STATS_REFRESH_SECONDS = float(os.getenv("STATS_REFRESH_SECONDS", "30"))
@@ -1,14 +1,38 @@
 # main.py - VERSION CORRIGÉE
 from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import List, Optional, Dict
-from ai_processor import MesuresAIProcessor
+from contextlib import asynccontextmanager
+from ai_processor import MesuresAIProcessor, ScoresAIProcessor
+from ai_common import fuseki_client, logs, metrics, profiling
+from ai_common.config import SPARQL_PAGE_SIZE, SPARQL_MAX_PAGE_SIZE
+from ai_common.nlp_executor import NLPExecutor, ExecutorSaturated
+from ai_common.logs import fields, get_logger
+from ai_common.metrics import label, stage
+from ai_common.nlp_registry import models
+from ai_common.schema_index import get_schema
+from ai_common.stats_engine import StatsEngine
+from config import NLP_BATCH_SIZE, MAX_BATCH_QUESTIONS, STATS_REFRESH_SECONDS
+from sparql_generator import (MESURES_SCHEMA, SCORES_SCHEMA, compile_mesures_query, compile_query,
+                              compile_scores_query, flatten_bindings)
+import asyncio
+import logging
 import uvicorn
-import spacy  # ⬅️ AJOUTEZ CET IMPORT
-import re     # ⬅️ AJOUTEZ CET IMPORT
 
-app = FastAPI(title="AI Mesures API")
+log = get_logger("backend_ai")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    nlp_executor.start()
+    await fuseki_client.startup()
+    yield
+    await fuseki_client.shutdown()
+    nlp_executor.shutdown()
+
+app = FastAPI(title="AI Mesures API", lifespan=lifespan)
 
 # CORS configuration
 app.add_middleware(
@@ -18,12 +42,16 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+metrics.install(app)
+profiling.install(app)
 
 # Initialisation du processeur AI
 ai_processor = MesuresAIProcessor()
 
 class UserQuestion(BaseModel):
     question: str
+    execute: bool = False         # lecture : exécuter la requête et renvoyer les lignes
+    limit: Optional[int] = None   # nombre maximal de lignes en mode exécution
 
 class AIResponse(BaseModel):
     action: str
@@ -32,201 +60,265 @@ class AIResponse(BaseModel):
     filters: List[Dict] = []
     suggestions: List[str] = []
     success: bool = True
+    error: Optional[str] = None
+    sparql: Optional[str] = None
+    results: Optional[List[Dict]] = None
+
+class BatchQuestions(BaseModel):
+    questions: List[str]
+    batch_size: Optional[int] = None
+
+class BatchAIResponse(BaseModel):
+    results: List[AIResponse]
+    count: int
+    errors: int
+
+# Initialisation
+scores_ai_processor = ScoresAIProcessor()
 
-# Ajoutez cette classe pour les scores santé
-class ScoresAIProcessor:
-    def __init__(self):
-        self.nlp = spacy.load("fr_core_news_sm")
-        self.setup_patterns()
+# Le travail spaCy s'exécute dans un pool, jamais dans la boucle asyncio
+nlp_executor = NLPExecutor({"mesures": ai_processor, "scores": scores_ai_processor})
+
+def saturated(e: ExecutorSaturated) -> HTTPException:
+    log.warning("⏳ File NLP pleine", extra=fields(error=str(e)))
+    return HTTPException(status_code=503, detail="Service AI saturé, réessayez plus tard")
+
+def build_scores_response(analysis: Dict) -> AIResponse:
+    natural_response = scores_ai_processor.generate_natural_response(analysis)
     
-    def setup_patterns(self):
-        self.crud_keywords = {
-            'create': ['ajouter', 'ajoute', 'créer', 'nouveau', 'nouvelle', 'insérer'],
-            'read': ['afficher', 'montrer', 'lister', 'voir', 'trouver', 'chercher'],
-            'update': ['modifier', 'changer', 'éditer', 'mettre à jour', 'corriger'],
-            'delete': ['supprimer', 'effacer', 'retirer', 'enlever']
-        }
-        
-        self.score_fields = {
-            'activite': ['activité', 'activite', 'exercice', 'sport', 'physique'],
-            'globale': ['globale', 'global', 'général', 'general', 'total'],
-            'nutrition': ['nutrition', 'alimentation', 'nourriture', 'diète'],
-            'sommeil': ['sommeil', 'dormir', 'repos', 'nuit']
+    data = {}
+    if analysis['entities']:
+        data = {
+            'scoreActivite': str(analysis['entities'].get('activite', '')),
+            'scoreGlobale': str(analysis['entities'].get('globale', '')),
+            'scoreNutrition': str(analysis['entities'].get('nutrition', '')),
+            'scoreSommeil': str(analysis['entities'].get('sommeil', ''))
         }
+    
+    return AIResponse(
+        action=analysis['action'],
+        natural_response=natural_response,
+        data=data if data else None,
+        filters=analysis.get('filters', []),
+        suggestions=[],
+        success=True
+    )
 
-    def process_question(self, question: str) -> Dict:
-        print(f"🔍 Traitement score: {question}")
-        doc = self.nlp(question.lower())
-        
-        action = self._detect_crud_action(question)
-        entities = self._extract_entities(doc, question)
-        filters = self._detect_filters(question)
-        
-        result = {
-            'action': action,
-            'entities': entities,
-            'filters': filters,
-            'original_question': question
+def build_mesures_response(analysis: Dict) -> AIResponse:
+    # 2. Génération de la réponse naturelle
+    natural_response = ai_processor.generate_natural_response(analysis)
+    
+    # 3. Génération des suggestions
+    suggestions = ai_processor.generate_suggestions(analysis)
+    
+    # 4. Préparation des données pour le frontend
+    data = {}
+    if analysis['entities']:
+        data = {
+            'valeurIMC': str(analysis['entities'].get('imc', '')),
+            'caloriesConsommees': str(analysis['entities'].get('calories', '')),
+            'mesureValue': str(analysis['entities'].get('mesurevalue', ''))
         }
-        
-        print(f"🎯 Résultat analyse scores: {result}")
-        return result
     
-    def _detect_crud_action(self, question: str) -> str:
-        question_lower = question.lower()
-        
-        for action, keywords in self.crud_keywords.items():
-            for keyword in keywords:
-                if keyword in question_lower:
-                    print(f"✅ Action scores détectée: {action}")
-                    return action
-        
-        return 'read'
+    return AIResponse(
+        action=analysis['action'],
+        natural_response=natural_response,
+        data=data if data else None,
+        filters=analysis.get('filters', []),
+        suggestions=suggestions,
+        success=True
+    )
 
-    def _extract_entities(self, doc, question: str) -> Dict:
-        entities = {}
-        numbers = re.findall(r'\d+', question)
-        
-        for field, keywords in self.score_fields.items():
-            for keyword in keywords:
-                if keyword in question.lower() and numbers:
-                    entities[field] = int(numbers[0])
-                    print(f"✅ {field} = {numbers[0]}")
-                    numbers.pop(0)
-                    break
-        
-        return entities
+def serialized(response: AIResponse) -> JSONResponse:
+    """Sérialise ici plutôt que dans FastAPI, pour mesurer l'étape"""
+    with stage("serialize"):
+        return JSONResponse(jsonable_encoder(response))
 
-    def _detect_filters(self, question: str) -> List[Dict]:
-        filters = []
-        question_lower = question.lower()
-        numbers = re.findall(r'\d+', question_lower)
-        
-        # Filtres pour scores élevés
-        if any(word in question_lower for word in ['élevé', 'haut', 'supérieur', 'excellent', 'bon', 'Bon']):
-            filters.append({'field': 'globale', 'operator': '>', 'value': '80', 'description': 'Score excellent (>80)'})
-        
-        # Filtres pour scores faibles
-        elif any(word in question_lower for word in ['faible', 'bas', 'inférieur', 'mauvais']):
-            filters.append({'field': 'globale', 'operator': '<', 'value': '60', 'description': 'Score faible (<60)'})
-        
-        # Filtres avec nombres
-        elif numbers:
-            if '>' in question_lower or 'supérieur' in question_lower:
-                filters.append({'field': 'globale', 'operator': '>', 'value': numbers[0], 'description': f'Score > {numbers[0]}'})
-            elif '<' in question_lower or 'inférieur' in question_lower:
-                filters.append({'field': 'globale', 'operator': '<', 'value': numbers[0], 'description': f'Score < {numbers[0]}'})
-        
-        return filters
+def build_batch_response(analyses: List[Dict], build) -> BatchAIResponse:
+    """Construit les réponses d'un lot ; une erreur n'affecte que sa question"""
+    results = []
+    for analysis in analyses:
+        try:
+            if 'error' in analysis:
+                raise ValueError(analysis['error'])
+            results.append(build(analysis))
+        except Exception as e:
+            results.append(AIResponse(
+                action='unknown',
+                natural_response="Je n'ai pas pu analyser cette question",
+                success=False,
+                error=str(e)
+            ))
+    errors = sum(1 for r in results if not r.success)
+    return BatchAIResponse(results=results, count=len(results), errors=errors)
 
-    def generate_natural_response(self, analysis: Dict) -> str:
-        action = analysis['action']
-        entities = analysis['entities']
-        filters = analysis['filters']
-        
-        if action == 'create':
-            if entities:
-                details = [f"{field}: {value}" for field, value in entities.items()]
-                return f"Je vais créer un nouveau score santé avec {', '.join(details)}"
-            return "Je vais ajouter un nouveau score santé"
-        
-        elif action == 'read':
-            if filters:
-                return f"Je recherche les scores santé correspondant aux critères"
-            return "Voici tous vos scores santé"
-        
-        elif action == 'update':
-            return "Je vais modifier le score santé sélectionné"
-        
-        elif action == 'delete':
-            return "Je supprime le score santé comme demandé"
-        
-        return "J'ai compris votre demande concernant les scores santé"
+def validate_batch(batch: BatchQuestions) -> int:
+    if len(batch.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"Maximum {MAX_BATCH_QUESTIONS} questions par lot")
+    if batch.batch_size is not None and batch.batch_size < 1:
+        raise HTTPException(status_code=400, detail="batch_size doit être positif")
+    return batch.batch_size or NLP_BATCH_SIZE
 
-# Initialisation
-scores_ai_processor = ScoresAIProcessor()
+async def execute_read(user_question: UserQuestion, response: AIResponse, compile_query, analysis: Dict) -> AIResponse:
+    """Mode exécution : filtres et tri sont appliqués par Fuseki, les lignes sont renvoyées directement"""
+    if user_question.limit is not None and user_question.limit < 1:
+        raise HTTPException(status_code=400, detail="limit doit être positif")
+    limit = min(user_question.limit or SPARQL_PAGE_SIZE, SPARQL_MAX_PAGE_SIZE)
+    try:
+        with stage("compile"):
+            query = compile_query(analysis, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    with stage("fuseki"):
+        result = await fuseki_client.get_async_client().select(query)
+    response.sparql = query
+    response.results = flatten_bindings(result)
+    return response
 
 # Ajoutez cette route
 @app.post("/ai/process-scores", response_model=AIResponse)
 async def process_scores_question(user_question: UserQuestion):
     try:
-        print(f"📥 Question scores reçue: {user_question.question}")
-        
-        analysis = scores_ai_processor.process_question(user_question.question)
-        natural_response = scores_ai_processor.generate_natural_response(analysis)
-        
-        data = {}
-        if analysis['entities']:
-            data = {
-                'scoreActivite': str(analysis['entities'].get('activite', '')),
-                'scoreGlobale': str(analysis['entities'].get('globale', '')),
-                'scoreNutrition': str(analysis['entities'].get('nutrition', '')),
-                'scoreSommeil': str(analysis['entities'].get('sommeil', ''))
-            }
+        log.info("📥 Question scores reçue", extra=fields(question=user_question.question))
         
-        response = AIResponse(
-            action=analysis['action'],
-            natural_response=natural_response,
-            data=data if data else None,
-            filters=analysis.get('filters', []),
-            suggestions=[],
-            success=True
-        )
+        label(entity="scores")
+        with stage("nlp"):
+            analysis = await nlp_executor.run("scores", "process_question", user_question.question)
+        label(action=analysis['action'])
+        with stage("response"):
+            response = build_scores_response(analysis)
         
-        return response
+        if user_question.execute and analysis['action'] == 'read':
+            response = await execute_read(user_question, response, compile_scores_query, analysis)
+        return serialized(response)
         
+    except ExecutorSaturated as e:
+        raise saturated(e)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Erreur scores: {str(e)}")
+        log.exception("❌ Erreur scores", extra=fields(question=user_question.question))
         raise HTTPException(status_code=500, detail=str(e))    
 
+@app.post("/ai/process-scores/batch", response_model=BatchAIResponse)
+async def process_scores_batch(batch: BatchQuestions):
+    batch_size = validate_batch(batch)
+    log.info("📥 Lot scores reçu", extra=fields(questions=len(batch.questions)))
+    label(entity="scores")
+    try:
+        with stage("nlp"):
+            analyses = await nlp_executor.run("scores", "process_questions", batch.questions, batch_size)
+    except ExecutorSaturated as e:
+        raise saturated(e)
+    with stage("response"):
+        return build_batch_response(analyses, build_scores_response)
+
 @app.post("/ai/process", response_model=AIResponse)
 async def process_question(user_question: UserQuestion):
     try:
-        print(f"📥 Question reçue: {user_question.question}")
+        log.info("📥 Question reçue", extra=fields(question=user_question.question))
         
         # 1. Traitement de la question naturelle
-        analysis = ai_processor.process_question(user_question.question)
-        print(f"🔍 Analyse: {analysis}")
-        
-        # 2. Génération de la réponse naturelle
-        natural_response = ai_processor.generate_natural_response(analysis)
+        label(entity="mesures")
+        with stage("nlp"):
+            analysis = await nlp_executor.run("mesures", "process_question", user_question.question)
+        label(action=analysis['action'])
+        log.debug("🔍 Analyse", extra=fields(**analysis))
         
-        # 3. Génération des suggestions
-        suggestions = ai_processor.generate_suggestions(analysis)
+        with stage("response"):
+            response = build_mesures_response(analysis)
         
-        # 4. Préparation des données pour le frontend
-        data = {}
-        if analysis['entities']:
-            data = {
-                'valeurIMC': str(analysis['entities'].get('imc', '')),
-                'caloriesConsommees': str(analysis['entities'].get('calories', '')),
-                'mesureValue': str(analysis['entities'].get('mesurevalue', ''))
-            }
-        
-        response = AIResponse(
-            action=analysis['action'],
-            natural_response=natural_response,
-            data=data if data else None,
-            filters=analysis.get('filters', []),
-            suggestions=suggestions,
-            success=True
-        )
+        if user_question.execute and analysis['action'] == 'read':
+            response = await execute_read(user_question, response, compile_mesures_query, analysis)
         
-        print(f"📤 Réponse envoyée: {response}")
-        return response
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("📤 Réponse envoyée", extra=fields(response=repr(response)))
+        return serialized(response)
         
+    except ExecutorSaturated as e:
+        raise saturated(e)
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Erreur: {str(e)}")
+        log.exception("❌ Erreur", extra=fields(question=user_question.question))
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ai/process/batch", response_model=BatchAIResponse)
+async def process_batch(batch: BatchQuestions):
+    batch_size = validate_batch(batch)
+    log.info("📥 Lot reçu", extra=fields(questions=len(batch.questions)))
+    label(entity="mesures")
+    try:
+        with stage("nlp"):
+            analyses = await nlp_executor.run("mesures", "process_questions", batch.questions, batch_size)
+    except ExecutorSaturated as e:
+        raise saturated(e)
+    with stage("response"):
+        return build_batch_response(analyses, build_mesures_response)
+
+# Statistiques : agrégats NumPy gardés en mémoire, resynchronisés avec Fuseki
+# au plus toutes les STATS_REFRESH_SECONDS (seuls les sujets modifiés sont recomptés)
+STATISTICS = {
+    entity: (StatsEngine({field: schema["bounds"][field] for field in schema["fields"]}), schema)
+    for entity, schema in (("mesures", MESURES_SCHEMA), ("scores", SCORES_SCHEMA))
+}
+
+@app.get("/ai/stats/{entity}")
+async def statistics(entity: str, window: int = 7, days: int = 30, refresh: bool = False):
+    """Moyenne, écart-type, percentiles, histogrammes et moyennes glissantes par jour"""
+    if entity not in STATISTICS:
+        raise HTTPException(status_code=404, detail="Entité inconnue : mesures ou scores")
+    if window < 1 or days < 1:
+        raise HTTPException(status_code=400, detail="window et days doivent être positifs")
+    engine, schema = STATISTICS[entity]
+    label(action="stats", entity=entity)
+    
+    sync = None
+    if refresh or engine.stale(STATS_REFRESH_SECONDS):
+        with stage("fuseki"):
+            result = await fuseki_client.get_async_client().select(compile_query(schema, []))
+        variables = [var for var, _ in schema["fields"].values()]
+        with stage("stats_sync"):
+            sync = await asyncio.to_thread(engine.sync_bindings, result, schema["subject"], variables)
+        log.info("📊 Statistiques resynchronisées", extra=fields(entity=entity, **sync))
+    
+    with stage("stats"):
+        summary = engine.summary(window=window, days=days)
+    return {"entity": entity, **summary, "sync": sync}
+
 @app.get("/")
 async def root():
     return {"message": "AI Mesures API is running!"}
 
 @app.get("/ai/health")
 async def health_check():
-    return {"status": "AI API is running", "version": "spaCy"}
+    health = {
+        "status": "AI API is running",
+        "version": "spaCy",
+        "executor": nlp_executor.stats(),
+        "fuseki": fuseki_client.stats(),
+        "logs": logs.stats(),
+        "schema": get_schema().stats()
+    }
+    # En mode "process", modèles, caches et niveaux d'analyse sont comptés dans
+    # les workers : leurs compteurs sont remontés par l'exécuteur ("scope": "worker")
+    if not nlp_executor.counts_locally:
+        health.update(nlp_executor.worker_stats())
+    else:
+        health.update({
+            "nlp": models.stats(),
+            "cache": {
+                "mesures": ai_processor.cache.stats(),
+                "scores": scores_ai_processor.cache.stats()
+            },
+            "tiers": {
+                "mesures": ai_processor.tiers.stats(),
+                "scores": scores_ai_processor.tiers.stats()
+            }
+        })
+    return health
 
 if __name__ == "__main__":
-    print("🚀 Starting AI Mesures API on http://localhost:8002")
+    log.info("🚀 Starting AI Mesures API on http://localhost:8002")
     uvicorn.run("main:app", host="0.0.0.0", port=8002, reload=True)
\ No newline at end of file
@@ -0,0 +1,126 @@
+# sparql_generator.py - Compilation des filtres et tris détectés en requête SPARQL
+#
+# Les processeurs produisent des dicts `filters` / `sort` (ex. imc > 25,
+# DESC imc). Plutôt que de renvoyer toutes les lignes au client pour qu'il
+# filtre lui-même, on les traduit en FILTER / ORDER BY / LIMIT afin que
+# Fuseki ne renvoie que les lignes utiles.
+#
+# Les schémas de lecture (classe, propriétés) sont vérifiés dans l'index de
+# l'ontologie dès l'import, comme les lexiques de champs des processeurs.
+from typing import Dict, Iterable, List, Optional
+
+from ai_common.schema_index import SchemaError, get_schema
+
+PREFIX = "http://www.smarthealth-tracker.com/ontologie#"
+
+OPERATORS = {">", "<", ">=", "<=", "=", "!="}
+DIRECTIONS = {"ASC", "DESC"}
+
+# Lecture des mesures : mêmes propriétés que routes/mesureRoutes.js
+MESURES_SCHEMA = {
+    "class": "Mesure",
+    "subject": "mesure",
+    "fields": {
+        "imc": ("imc", "aValeurIMC"),
+        "calories": ("calories", "aCaloriesConsommées"),
+        "mesurevalue": ("mesureValue", "aMesure"),
+    },
+    "optional": True,
+    # Histogrammes de /ai/stats : (borne basse, borne haute, nombre de classes)
+    "bounds": {"imc": (10, 50, 16), "calories": (0, 5000, 20), "mesurevalue": (0, 20000, 20)},
+}
+
+# Lecture des scores santé : mêmes propriétés que routes/scoreSanteRoutes.js
+SCORES_SCHEMA = {
+    "class": "ScoreSanté",
+    "subject": "score",
+    "fields": {
+        "activite": ("activite", "scoreActivite"),
+        "globale": ("globale", "scoreGlobale"),
+        "nutrition": ("nutrition", "scoreNutrition"),
+        "sommeil": ("sommeil", "scoreSommeil"),
+    },
+    "optional": False,
+    "bounds": {field: (0, 100, 10) for field in ("activite", "globale", "nutrition", "sommeil")},
+}
+
+
+def check_schema(schema: Dict):
+    """Classe et propriétés du schéma présentes dans l'ontologie ; SchemaError sinon"""
+    get_schema().require_properties(schema["class"], [prop for _, prop in schema["fields"].values()])
+
+
+def check_lexicon(schema: Dict, lexicon: Iterable[str]):
+    """Champs d'un lexique de mots-clés tous lisibles par le schéma ; SchemaError sinon"""
+    unknown = [field for field in lexicon if field not in schema["fields"]]
+    if unknown:
+        raise SchemaError(f"Champs absents du schéma sh:{schema['class']} : {', '.join(unknown)}")
+
+
+for _schema in (MESURES_SCHEMA, SCORES_SCHEMA):
+    check_schema(_schema)
+
+
+def _number(value) -> str:
+    """Valeur de filtre sous forme de littéral numérique SPARQL (refuse tout le reste)"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Valeur de filtre non numérique: {value!r}")
+    return repr(int(number)) if number.is_integer() else repr(number)
+
+
+def compile_query(schema: Dict, filters: List[Dict], sort: Optional[Dict] = None,
+                  limit: Optional[int] = None) -> str:
+    """Construit le SELECT avec FILTER, ORDER BY et LIMIT à partir des dicts détectés"""
+    fields = schema["fields"]
+    subject = schema["subject"]
+
+    conditions = []
+    for f in filters:
+        if f["field"] not in fields:
+            raise ValueError(f"Champ de filtre inconnu: {f['field']}")
+        if f["operator"] not in OPERATORS:
+            raise ValueError(f"Opérateur de filtre inconnu: {f['operator']}")
+        var = fields[f["field"]][0]
+        conditions.append(f"?{var} {f['operator']} {_number(f['value'])}")
+
+    order = f"DESC(?{subject})"
+    if sort:
+        if sort.get("field") not in fields or sort.get("direction") not in DIRECTIONS:
+            raise ValueError(f"Tri invalide: {sort}")
+        order = f"{sort['direction']}(?{fields[sort['field']][0]})"
+
+    # Un champ filtré ou trié doit exister : son motif n'est plus optionnel
+    used = {f["field"] for f in filters} | ({sort["field"]} if sort else set())
+    patterns = [f"?{subject} a sh:{schema['class']} ."]
+    for field, (var, prop) in fields.items():
+        triple = f"?{subject} sh:{prop} ?{var} ."
+        if schema["optional"] and field not in used:
+            triple = f"OPTIONAL {{ {triple} }}"
+        patterns.append(triple)
+    if conditions:
+        patterns.append(f"FILTER({' && '.join(conditions)})")
+
+    variables = " ".join(f"?{var}" for var, _ in fields.values())
+    body = "\n  ".join(patterns)
+    query = f"PREFIX sh: <{PREFIX}>\nSELECT ?{subject} {variables}\nWHERE {{\n  {body}\n}}\nORDER BY {order}"
+    if limit:
+        query += f"\nLIMIT {int(limit)}"
+    return query
+
+
+def compile_mesures_query(analysis: Dict, limit: Optional[int] = None) -> str:
+    return compile_query(MESURES_SCHEMA, analysis.get("filters", []), analysis.get("sort"), limit)
+
+
+def compile_scores_query(analysis: Dict, limit: Optional[int] = None) -> str:
+    return compile_query(SCORES_SCHEMA, analysis.get("filters", []), analysis.get("sort"), limit)
+
+
+def flatten_bindings(result: Dict) -> List[Dict]:
+    """Bindings SPARQL JSON -> liste de {variable: valeur}"""
+    return [
+        {var: cell["value"] for var, cell in row.items()}
+        for row in result.get("results", {}).get("bindings", [])
+    ]
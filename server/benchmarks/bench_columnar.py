@@ -0,0 +1,114 @@
+# bench_columnar.py - Mémoire et temps de décodage : bindings JSON contre colonnes typées
+#
+# Génère un résultat SELECT de `--rows` lignes (mesure IRI, imc xsd:decimal,
+# calories xsd:integer, date xsd:dateTime, type chaîne peu variée) au format
+# application/sparql-results+json, puis compare :
+#   - mémoire retenue : dict-of-dicts de json.loads contre ColumnarResult
+#     (les dicts sont libérés après décodage) ;
+#   - temps : json.loads seul contre json.loads + decode_bindings ;
+#   - usage aval : moyenne d'IMC des lignes à plus de 2000 calories, et
+#     conversion en enregistrements (flatten_bindings contre records()).
+#
+# Usage : python benchmarks/bench_columnar.py [--rows 100000] [--repeat 5]
+import argparse
+import datetime
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "backend-ai")]
+from ai_common.sparql_columns import decode_bindings
+from sparql_generator import flatten_bindings
+
+SH = "http://www.smarthealth-tracker.com/ontologie#"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+TYPES = ["Activité physique", "Perte de poids", "Objectif général", "Sommeil"]
+
+
+def payload(rows: int) -> bytes:
+    base = datetime.datetime(2025, 1, 1)
+    bindings = []
+    for i in range(rows):
+        row = {
+            "mesure": {"type": "uri", "value": f"{SH}mesure_{1735689600000 + i * 60000}"},
+            "imc": {"type": "literal", "datatype": XSD + "decimal", "value": f"{18 + (i * 7919) % 170 / 10:.1f}"},
+            "date": {"type": "literal", "datatype": XSD + "dateTime",
+                     "value": (base + datetime.timedelta(minutes=i)).isoformat()},
+            "type": {"type": "literal", "value": TYPES[i % len(TYPES)]},
+        }
+        if i % 20:  # calories absentes d'une ligne sur 20 (OPTIONAL)
+            row["calories"] = {"type": "literal", "datatype": XSD + "integer", "value": str(1200 + (i * 104729) % 2000)}
+        bindings.append(row)
+    result = {"head": {"vars": ["mesure", "imc", "calories", "date", "type"]}, "results": {"bindings": bindings}}
+    return json.dumps(result).encode()
+
+
+def retained(build):
+    """Mémoire encore allouée par l'objet renvoyé par build(), une fois les temporaires libérés"""
+    gc.collect()
+    tracemalloc.start()
+    obj = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, peak
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def dict_mean(result):
+    values = [float(row["imc"]["value"]) for row in result["results"]["bindings"]
+              if "calories" in row and int(row["calories"]["value"]) > 2000]
+    return sum(values) / len(values)
+
+
+def columnar_mean(columns):
+    calories = columns["calories"]
+    selected = calories.mask & (calories.data > 2000)
+    return float(columns["imc"].data[selected].mean())
+
+
+def main(args):
+    raw = payload(args.rows)
+    print(f"{args.rows} lignes, {len(raw) / 1e6:.1f} Mo de JSON")
+
+    result, dict_bytes, dict_peak = retained(lambda: json.loads(raw))
+    del result
+    columns, col_bytes, col_peak = retained(lambda: decode_bindings(json.loads(raw)))
+    print(f"{'mémoire retenue':<34} dicts {dict_bytes / 1e6:>8.1f} Mo   colonnes {col_bytes / 1e6:>8.1f} Mo "
+          f"({dict_bytes / col_bytes:.0f}x moins) ; pic du décodage {col_peak / 1e6:.1f} Mo")
+
+    result = json.loads(raw)
+    load = timed(lambda: json.loads(raw), args.repeat)
+    decode = timed(lambda: decode_bindings(result), args.repeat)
+    print(f"{'décodage':<34} json.loads {load * 1000:>8.1f} ms   + colonnes {decode * 1000:>8.1f} ms")
+
+    assert abs(dict_mean(result) - columnar_mean(columns)) < 1e-9
+    slow = timed(lambda: dict_mean(result), args.repeat)
+    fast = timed(lambda: columnar_mean(columns), args.repeat)
+    print(f"{'moyenne IMC si calories > 2000':<34} dicts {slow * 1000:>8.2f} ms   colonnes {fast * 1000:>8.2f} ms "
+          f"({slow / fast:.0f}x)")
+
+    flat = timed(lambda: flatten_bindings(result), args.repeat)
+    records = timed(lambda: columns.records(), args.repeat)
+    print(f"{'enregistrements':<34} flatten_bindings (chaînes) {flat * 1000:>8.1f} ms   "
+          f"records() (typés) {records * 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    sys.exit(main(parser.parse_args()))
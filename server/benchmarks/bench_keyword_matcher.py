@@ -0,0 +1,102 @@
+# bench_keyword_matcher.py - Micro-benchmark : boucles `keyword in text` vs KeywordMatcher
+#
+# Vérifie d'abord que le matcher donne exactement les mêmes labels que les
+# anciennes boucles sur le corpus, puis compare les temps d'exécution avec les
+# vocabulaires actuels et avec un vocabulaire agrandi (synonymes multipliés).
+#
+# Usage : python benchmarks/bench_keyword_matcher.py [--repeat 2000]
+import argparse
+import os
+import sys
+import timeit
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "backend-ai"), os.path.join(SERVER_DIR, "ObjectifSante-ai")]
+
+from ai_common.keyword_matcher import KeywordMatcher
+from ai_processor import MesuresAIProcessor, ScoresAIProcessor
+from main_ai import ACTION_KEYWORDS
+
+CORPUS = [
+    "afficher mes mesures",
+    "montre mes scores",
+    "ajouter une mesure avec imc 24.5 et 2100 calories",
+    "ajoute un score sommeil 80 et nutrition 65",
+    "afficher les mesures avec calories supérieur à 2000",
+    "trouver les mesures avec un imc élevé",
+    "lister les imc normaux triés du plus grand au plus petit",
+    "trier mes mesures par calories",
+    "supprimer la dernière mesure",
+    "modifier le score global à 90",
+    "mettre à jour mon imc à 22",
+    "je veux voir les scores faibles",
+    "affiche mes objectifs de poids",
+    "mets à jour ma température à 38.5",
+    "montre-moi l'état de santé avec la pression",
+    "crée un objectif de sport pour ce mois",
+    "quel est mon sommeil moyen cette semaine ?",
+    "enregistrer 8000 pas aujourd'hui",
+]
+
+
+def legacy_labels(vocabularies, text):
+    """Anciennes boucles : un test de sous-chaîne par mot-clé"""
+    return {
+        name: [label for label, keywords in vocabulary.items() if any(keyword in text for keyword in keywords)]
+        for name, vocabulary in vocabularies.items()
+    }
+
+
+def matcher_labels(matcher, vocabularies, text):
+    hits = matcher.scan(text)
+    return {name: hits.labels(name) for name in vocabularies}
+
+
+def grown(vocabularies, factor):
+    """Vocabulaire agrandi : chaque mot-clé reçoit `factor` variantes synthétiques"""
+    return {
+        name: {
+            label: list(keywords) + [f"{keyword}{suffix}" for keyword in keywords for suffix in ("x", "ée", "és", "ons", "ez", "ait")[:factor] + tuple(f"_{i}" for i in range(max(0, factor - 6)))]
+            for label, keywords in vocabulary.items()
+        }
+        for name, vocabulary in vocabularies.items()
+    }
+
+
+def bench(title, vocabularies, corpus, repeat):
+    matcher = KeywordMatcher(**vocabularies)
+    for text in corpus:
+        expected = legacy_labels(vocabularies, text)
+        assert matcher_labels(matcher, vocabularies, text) == expected, text
+
+    keywords = sum(len(k) for v in vocabularies.values() for k in v.values())
+    legacy = timeit.timeit(lambda: [legacy_labels(vocabularies, t) for t in corpus], number=repeat)
+    compiled = timeit.timeit(lambda: [matcher_labels(matcher, vocabularies, t) for t in corpus], number=repeat)
+    per_text = 1e6 / (repeat * len(corpus))
+    print(f"{title:<28} {keywords:>5} mots-clés   boucles {legacy * per_text:8.2f} µs   matcher {compiled * per_text:8.2f} µs   x{legacy / compiled:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    mesures = MesuresAIProcessor()
+    scores = ScoresAIProcessor()
+    corpus = [text.lower() for text in CORPUS]
+
+    suites = {
+        "mesures": dict(action=mesures.crud_keywords, field=mesures.mesure_fields,
+                        filter=mesures.filter_keywords, sort=mesures.sort_keywords),
+        "scores": dict(action=scores.crud_keywords, field=scores.score_fields, filter=scores.filter_keywords),
+        "main_ai.detect_action": dict(action=ACTION_KEYWORDS),
+    }
+    print("Résultats identiques aux anciennes boucles vérifiés sur le corpus.\n")
+    for name, vocabularies in suites.items():
+        bench(name, vocabularies, corpus, args.repeat)
+    for factor in (5, 20):
+        bench(f"mesures x{factor + 1} synonymes", grown(suites["mesures"], factor), corpus, max(1, args.repeat // 10))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# bench_nlp_executor.py - Latence de /ai/process selon le nombre de requêtes en vol
+#
+# Démarre le service backend-ai sous uvicorn pour chaque mode d'exécution NLP
+# ("inline" = ancien comportement, parse spaCy dans la boucle asyncio) et
+# mesure p50/p99 de /ai/process ainsi que d'une sonde légère (/ai/health)
+# envoyée pendant la charge. Le cache d'analyses est désactivé pour que chaque
+# requête fasse un vrai parse spaCy.
+#
+# En mode "inline", la p99 croît linéairement avec le nombre de requêtes en vol
+# et la sonde attend derrière les parses. Avec le pool, la file est bornée par
+# NLP_MAX_PENDING : la p99 des requêtes acceptées plafonne, le surplus reçoit
+# un 503 immédiat, et la boucle reste disponible pour la sonde.
+#
+# Usage : python benchmarks/bench_nlp_executor.py [--levels 1,4,16,32] [--max-pending 8]
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+def start_server(mode, port, max_pending, workers):
+    env = dict(
+        os.environ,
+        NLP_EXECUTOR_MODE=mode,
+        NLP_MAX_PENDING=str(max_pending),
+        NLP_WORKERS=str(workers),
+        ANALYSIS_CACHE_SIZE="0",
+    )
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=os.path.join(SERVER_DIR, "backend-ai"), env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+
+async def measure(base_url, levels, rounds):
+    questions = (
+        f"ajouter une mesure avec imc {20 + i % 15}.{i % 10} et {1500 + i} calories aujourd'hui"
+        for i in range(10 ** 6)
+    )
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        for _ in range(600):
+            try:
+                await client.get("/ai/health")
+                break
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+        await client.post("/ai/process", json={"question": "afficher mes mesures"})
+
+        rows = []
+        for level in levels:
+            latencies, probes, rejected = [], [], 0
+            done = asyncio.Event()
+
+            async def worker():
+                nonlocal rejected
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    r = await client.post("/ai/process", json={"question": next(questions)})
+                    if r.status_code == 503:
+                        rejected += 1
+                    else:
+                        latencies.append(time.perf_counter() - start)
+
+            async def probe():
+                while not done.is_set():
+                    start = time.perf_counter()
+                    await client.get("/ai/health")
+                    probes.append(time.perf_counter() - start)
+                    await asyncio.sleep(0.01)
+
+            probe_task = asyncio.create_task(probe())
+            await asyncio.gather(*(worker() for _ in range(level)))
+            done.set()
+            await probe_task
+            rows.append((level, percentile(latencies, 50), percentile(latencies, 99), percentile(probes, 99), rejected))
+        return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", default="1,2,4,8,16,32")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--modes", default="inline,thread,process")
+    parser.add_argument("--max-pending", type=int, default=8)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--port", type=int, default=8102)
+    args = parser.parse_args()
+    levels = [int(level) for level in args.levels.split(",")]
+
+    for mode in args.modes.split(","):
+        server = start_server(mode, args.port, args.max_pending, args.workers)
+        try:
+            rows = asyncio.run(measure(f"http://127.0.0.1:{args.port}", levels, args.rounds))
+        finally:
+            server.terminate()
+            server.wait()
+
+        print(f"\nmode={mode} workers={args.workers} max_pending={args.max_pending}")
+        print(f"{'en vol':>7} {'p50 ms':>9} {'p99 ms':>9} {'sonde p99 ms':>13} {'503':>5}")
+        for level, p50, p99, probe, rejected in rows:
+            print(f"{level:>7} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {probe * 1000:>13.1f} {rejected:>5}")
+
+
+if __name__ == "__main__":
+    main()
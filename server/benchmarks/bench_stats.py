@@ -0,0 +1,120 @@
+# bench_stats.py - Exactitude et coût des statistiques incrémentales (/ai/stats)
+#
+# Construit un jeu de N mesures (une par minute, identifiants horodatés), puis
+# applique des synchronisations successives (nouvelles mesures, modifications,
+# suppressions). Après chacune, les agrégats de StatsEngine sont comparés à un
+# recalcul complet avec NumPy (moyenne, écart-type, percentiles, histogramme,
+# moyenne glissante). Mesure ensuite le coût d'une synchronisation qui apporte
+# `--delta` nouvelles mesures, contre la reconstruction complète des agrégats.
+# Sort en code 1 si un agrégat diffère.
+#
+# Usage : python benchmarks/bench_stats.py [--rows 100000] [--delta 100]
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ai_common.stats_engine import DAY_MS, StatsEngine
+
+BOUNDS = {"imc": (10, 50, 16), "calories": (0, 5000, 20)}
+START_MS = 1_735_689_600_000  # 2025-01-01
+
+
+def dataset(rng, rows, offset=0):
+    # Une mesure par minute environ, identifiants des routes Node (mesure_<ms>)
+    stamps = START_MS + np.arange(offset, offset + rows) * 60_000 + rng.integers(0, 60_000, rows)
+    subjects = [f"mesure_{stamp}" for stamp in stamps]
+    values = np.column_stack([rng.normal(24, 4, rows).round(1), rng.normal(2100, 500, rows).round()])
+    values[rng.random((rows, 2)) < 0.05] = np.nan  # valeurs absentes (OPTIONAL)
+    return subjects, values, stamps
+
+
+def reference(values, stamps, window, percentiles):
+    """Recalcul complet des agrégats, pour comparaison"""
+    expected = {}
+    for f, (name, (low, high, bins)) in enumerate(BOUNDS.items()):
+        column = values[:, f][~np.isnan(values[:, f])]
+        counts, _ = np.histogram(column, bins=bins, range=(low, high))
+        expected[name] = {
+            "count": column.size,
+            "mean": column.mean(),
+            "std": column.std(),
+            "percentiles": np.percentile(column, percentiles),
+            "histogram": counts,
+        }
+    days = stamps // DAY_MS
+    last = days.max()
+    recent = (days > last - window) & ~np.isnan(values[:, 0])
+    expected["rolling_imc_last"] = values[recent, 0].mean()
+    return expected
+
+
+def check(engine, subjects, values, stamps):
+    percentiles = (5, 25, 50, 75, 95)
+    summary = engine.summary(percentiles=percentiles, window=7, days=30)
+    expected = reference(values, stamps, 7, percentiles)
+    ok = summary["subjects"] == len(subjects)
+    for name in BOUNDS:
+        got, want = summary["fields"][name], expected[name]
+        ok &= got["count"] == want["count"]
+        ok &= bool(np.isclose(got["mean"], want["mean"], atol=1e-3))
+        ok &= bool(np.isclose(got["std"], want["std"], atol=1e-3))
+        ok &= bool(np.allclose(list(got["percentiles"].values()), want["percentiles"], atol=1e-3))
+        ok &= got["histogram"]["counts"] == want["histogram"].tolist()
+    ok &= bool(np.isclose(summary["rolling"]["fields"]["imc"][-1], expected["rolling_imc_last"], atol=1e-3))
+    return ok
+
+
+def main(args):
+    rng = np.random.default_rng(7)
+    subjects, values, stamps = dataset(rng, args.rows)
+    engine = StatsEngine(BOUNDS)
+    engine.sync(subjects, values)
+    ok = check(engine, subjects, values, stamps)
+    print(f"{'✅' if ok else '❌'} chargement initial : {args.rows} mesures")
+
+    # Arrivées, modifications et suppressions
+    for step in range(3):
+        new_subjects, new_values, new_stamps = dataset(rng, args.delta, offset=args.rows + step * args.delta)
+        changed = rng.choice(len(subjects), args.delta // 10, replace=False)
+        values = values.copy()
+        values[changed, 0] += 1.5
+        keep = np.ones(len(subjects), dtype=bool)
+        keep[rng.choice(len(subjects), args.delta // 10, replace=False)] = False
+        subjects = [s for s, k in zip(subjects, keep) if k] + new_subjects
+        values = np.vstack([values[keep], new_values])
+        stamps = np.concatenate([stamps[keep], new_stamps])
+        changes = engine.sync(subjects, values)
+        step_ok = check(engine, subjects, values, stamps)
+        ok &= step_ok
+        print(f"{'✅' if step_ok else '❌'} synchronisation {step + 1} : {changes}")
+
+    # Coût : nouvelles mesures seulement (complete=False) contre reconstruction complète
+    new_subjects, new_values, _ = dataset(rng, args.delta, offset=10 * args.rows)
+    start = time.perf_counter()
+    engine.sync(new_subjects, new_values, complete=False)
+    incremental = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.summary()
+    read = time.perf_counter() - start
+    start = time.perf_counter()
+    engine.sync(subjects + new_subjects, np.vstack([values, new_values]))
+    resync = time.perf_counter() - start
+    start = time.perf_counter()
+    StatsEngine(BOUNDS).sync(subjects + new_subjects, np.vstack([values, new_values]))
+    rebuild = time.perf_counter() - start
+    print(f"+{args.delta} mesures sur {len(subjects)} : incrémental {incremental * 1000:.2f} ms, "
+          f"reconstruction {rebuild * 1000:.1f} ms ({rebuild / incremental:.0f}x), lecture du résumé {read * 1000:.2f} ms")
+    print(f"Instantané complet inchangé ({len(subjects) + args.delta} sujets, chemin de /ai/stats) : "
+          f"{resync * 1000:.1f} ms de comparaison")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--delta", type=int, default=100)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,112 @@
+# bench_store_backends.py - Latence des backends de store : embarqué vs HTTP
+#
+# Rejoue les requêtes produites par sparql_etat_sante / sparql_objectif
+# (lecture paginée, création, mise à jour) sur :
+#   - le store embarqué, moteurs oxigraph et rdflib (amorcé par ontology.ttl
+#     + `--seed` entités par classe) ;
+#   - le client HTTP, vers le faux Fuseki local (coût du transport seul, le stub
+#     ne fait aucun travail de requête) ou vers un vrai Fuseki avec --fuseki-url.
+#
+# Usage : python benchmarks/bench_store_backends.py [--seed 500] [--repeat 200] [--engines oxigraph,rdflib] [--fuseki-url URL]
+import argparse
+import asyncio
+import datetime
+import os
+import re
+import sys
+import time
+
+from fuseki_stub import FusekiStub
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.append(SERVER_DIR)
+sys.path.append(os.path.join(SERVER_DIR, "ObjectifSante-ai"))
+from ai_common.embedded_store import AsyncEmbeddedStore, EmbeddedStore
+from ai_common.fuseki_client import AsyncFusekiClient
+from main_ai import PREFIX, sparql_etat_sante, sparql_objectif
+
+QUERIES = [
+    ("read etat_sante", lambda: sparql_etat_sante("read", "affiche mon état", 50)),
+    ("read objectif", lambda: sparql_objectif("read", "affiche mes objectifs", 50)),
+    ("create etat_sante", lambda: sparql_etat_sante("create", "ajoute 72 kg et 1.80 m")),
+    ("create objectif", lambda: sparql_objectif("create", "ajoute un objectif sport")),
+    ("update etat_sante", lambda: sparql_etat_sante("update", "modifie le poids à 70", subjects=LATEST["etat_sante"])),
+    ("update objectif", lambda: sparql_objectif("update", "termine mon objectif", subjects=LATEST["objectif"])),
+]
+# Sujets visés par les mises à jour (le dernier créé par seed_store)
+LATEST = {"etat_sante": [PREFIX + "etatSante_seed"], "objectif": [PREFIX + "objectif_seed"]}
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def seed_store(store: EmbeddedStore, count: int):
+    """`count` états de santé et objectifs avec des sujets et dates distincts"""
+    base = datetime.datetime(2025, 1, 1)
+    for i in range(count):
+        date = (base + datetime.timedelta(hours=i)).isoformat()
+        for entity, query in (("etat_sante", sparql_etat_sante("create", "72 kg 1.80 m")),
+                              ("objectif", sparql_objectif("create", "sport"))):
+            store.update(re.sub(r'"[\d\-]+T[\d:.]+"', f'"{date}"', query))
+            LATEST[entity] = [PREFIX + re.search(r"sh:(\w+) a sh:", query).group(1)]
+
+
+async def bench(client, repeat):
+    rows = {}
+    for name, build in QUERIES:
+        run = client.select if name.startswith("read") else client.update
+        latencies = []
+        for _ in range(repeat):
+            query = build()
+            start = time.perf_counter()
+            await run(query)
+            latencies.append(time.perf_counter() - start)
+        rows[name] = (percentile(latencies, 50), percentile(latencies, 95))
+    return rows
+
+
+async def main(args):
+    results = {}
+    for engine in args.engines.split(","):
+        store = EmbeddedStore(engine=engine)
+        bootstrap_triples = len(store)
+        seed_store(store, args.seed)
+        print(f"Store embarqué {engine} : {bootstrap_triples} triplets d'ontologie + {args.seed} entités/classe "
+              f"({len(store)} triplets)")
+        results[engine] = await bench(AsyncEmbeddedStore(store), args.repeat)
+
+    stub = None
+    if args.fuseki_url:
+        http_label = f"http ({args.fuseki_url})"
+        client = AsyncFusekiClient(endpoint=args.fuseki_url)
+    else:
+        stub = await FusekiStub(rows=50).start()
+        http_label = "http (stub)"
+        client = AsyncFusekiClient(endpoint=stub.url)
+    client.flights = None  # appels séquentiels : rien à regrouper
+    try:
+        results[http_label] = await bench(client, args.repeat)
+    finally:
+        await client.close()
+        if stub:
+            await stub.stop()
+
+    labels = list(results)
+    print(f"{'requête':<20}" + "".join(f"{label + ' p50/p95 ms':>28}" for label in labels))
+    for name, _ in QUERIES:
+        cells = "".join(f"{results[label][name][0] * 1000:>18.2f} / {results[label][name][1] * 1000:>7.2f}"
+                        for label in labels)
+        print(f"{name:<20}{cells}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--engines", default="oxigraph,rdflib")
+    parser.add_argument("--fuseki-url", default=None)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,218 @@
+# bench_suite.py - Suite de benchmarks des chemins chauds NLP et génération SPARQL
+#
+# Couvre :
+#   - MesuresAIProcessor.process_question, ScoresAIProcessor.process_question
+#   - EtatSanteAIProcessor.process / to_sparql
+#   - sparql_etat_sante, sparql_objectif
+#   - /ai/process, /ai/process-scores (backend-ai) et /ai/execute (ObjectifSante-ai)
+#     via un client ASGI en mémoire, Fuseki remplacé par le stub local.
+#
+# Les caches d'analyse et de résultats sont désactivés pour mesurer le vrai
+# travail, et les logs réduits aux avertissements (LOG_LEVEL). Les résultats sont enregistrés en JSON ; --compare relit un fichier
+# précédent et sort en code 1 si un p50 régresse de plus de --threshold.
+#
+# Usage :
+#   python benchmarks/bench_suite.py [--repeat 20] [--only process] [--output results/base.json]
+#   python benchmarks/bench_suite.py --compare results/base.json [--threshold 0.25]
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# Avant tout import applicatif : la configuration est lue à l'import
+os.environ.setdefault("ANALYSIS_CACHE_SIZE", "0")
+os.environ.setdefault("SPARQL_CACHE_ENABLED", "false")
+os.environ.setdefault("WRITE_BEHIND_ENABLED", "false")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+import httpx
+
+from corpus import ETAT_CORPUS, EXECUTE_COMMANDS, MESURES_CORPUS, SCORES_CORPUS
+from fuseki_stub import FusekiStub
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(BENCH_DIR, "..")
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "backend-ai"), os.path.join(SERVER_DIR, "ObjectifSante-ai")]
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "bench_suite.json")
+
+
+def summarize(latencies):
+    latencies = sorted(latencies)
+    n = len(latencies)
+    mean = statistics.fmean(latencies)
+    return {
+        "n": n,
+        "mean_us": round(mean * 1e6, 2),
+        "p50_us": round(latencies[n // 2] * 1e6, 2),
+        "p95_us": round(latencies[min(n - 1, int(0.95 * n))] * 1e6, 2),
+        "ops_per_s": round(1 / mean, 1) if mean else None,
+    }
+
+
+def bench_sync(fn, inputs, repeat, warmup=1):
+    for _ in range(warmup):
+        for item in inputs:
+            fn(item)
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+async def bench_async(fn, inputs, repeat, warmup=1):
+    for _ in range(warmup):
+        for item in inputs:
+            await fn(item)
+    latencies = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            await fn(item)
+            latencies.append(time.perf_counter() - start)
+    return summarize(latencies)
+
+
+def processor_benches(repeat):
+    from ai_processor import MesuresAIProcessor, ScoresAIProcessor
+    from ai_processor_etat_sante import EtatSanteAIProcessor
+
+    mesures, scores, etat = MesuresAIProcessor(), ScoresAIProcessor(), EtatSanteAIProcessor()
+    analyses = [etat.process(command) for command in ETAT_CORPUS]
+    return {
+        "mesures.process_question": bench_sync(mesures.process_question, MESURES_CORPUS, repeat),
+        "scores.process_question": bench_sync(scores.process_question, SCORES_CORPUS, repeat),
+        "etat_sante.process": bench_sync(etat.process, ETAT_CORPUS, repeat),
+        "etat_sante.to_sparql": bench_sync(etat.to_sparql, analyses, repeat * 10),
+    }
+
+
+def generator_benches(repeat):
+    from main_ai import detect_action, sparql_etat_sante, sparql_objectif
+
+    etat = [(detect_action(c), c) for e, c in EXECUTE_COMMANDS if e == "etat_sante"]
+    objectif = [(detect_action(c), c) for e, c in EXECUTE_COMMANDS if e == "objectif"]
+    return {
+        "sparql_etat_sante": bench_sync(lambda args: sparql_etat_sante(*args), etat, repeat * 10),
+        "sparql_objectif": bench_sync(lambda args: sparql_objectif(*args), objectif, repeat * 10),
+    }
+
+
+async def post_ok(client, path, payload):
+    r = await client.post(path, json=payload)
+    if r.status_code != 200:
+        raise RuntimeError(f"{path} -> {r.status_code} {r.text[:200]}")
+
+
+async def endpoint_benches(repeat):
+    import main
+    import main_ai
+
+    results = {}
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as client:
+            results["POST /ai/process"] = await bench_async(
+                lambda q: post_ok(client, "/ai/process", {"question": q}), MESURES_CORPUS, repeat)
+            results["POST /ai/process-scores"] = await bench_async(
+                lambda q: post_ok(client, "/ai/process-scores", {"question": q}), SCORES_CORPUS, repeat)
+    async with main_ai.lifespan(main_ai.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main_ai.app), base_url="http://bench") as client:
+            results["POST /ai/execute"] = await bench_async(
+                lambda c: post_ok(client, "/ai/execute", {"entity": c[0], "command": c[1]}), EXECUTE_COMMANDS, repeat)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline, threshold, min_delta_us):
+    """Liste des régressions de p50 au-delà du seuil relatif (et d'un écart absolu minimal)"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("results", {}).get(name)
+        if previous is None:
+            continue
+        before, after = previous["p50_us"], current["p50_us"]
+        ratio = (after - before) / before if before else 0.0
+        flag = ratio > threshold and after - before > min_delta_us
+        print(f"{'❌' if flag else '✅'} {name:<28} {before:>12.1f} -> {after:>12.1f} µs ({ratio:+.1%})")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+async def main(args):
+    stub = await FusekiStub(latency=args.latency).start()
+    os.environ["FUSEKI_URL"] = stub.url
+    groups = {
+        "process": lambda: processor_benches(args.repeat),
+        "sparql": lambda: generator_benches(args.repeat),
+    }
+    results = {}
+    try:
+        for group, run in groups.items():
+            if not args.only or args.only in group:
+                results.update(run())
+        if not args.only or args.only in "endpoints":
+            results.update(await endpoint_benches(args.repeat))
+    finally:
+        await stub.stop()
+
+    print(f"{'benchmark':<28} {'p50 µs':>12} {'p95 µs':>12} {'ops/s':>10}")
+    for name, row in results.items():
+        print(f"{name:<28} {row['p50_us']:>12.1f} {row['p95_us']:>12.1f} {row['ops_per_s']:>10}")
+
+    report = {
+        "meta": {
+            "date": datetime.datetime.now().isoformat(timespec="seconds"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "repeat": args.repeat,
+            "fuseki_latency": args.latency,
+        },
+        "results": results,
+    }
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Résultats enregistrés dans {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nComparaison avec {args.compare} (git {baseline['meta'].get('git')}), seuil {args.threshold:.0%}")
+        regressions = compare(results, baseline, args.threshold, args.min_delta_us)
+        if regressions:
+            print(f"❌ {len(regressions)} régression(s) : {', '.join(regressions)}")
+            return 1
+        print("✅ Aucune régression")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", default=None, help="process, sparql ou endpoints")
+    parser.add_argument("--latency", type=float, default=0.0, help="latence du faux Fuseki (s)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="fichier JSON de résultats ('' pour ne rien écrire)")
+    parser.add_argument("--compare", default=None, help="fichier JSON de référence")
+    parser.add_argument("--threshold", type=float, default=0.25, help="régression relative tolérée sur p50")
+    parser.add_argument("--min-delta-us", type=float, default=5.0, help="écart absolu ignoré (bruit)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,97 @@
+# bench_targeted_updates.py - Coût des modifications selon la taille du store
+#
+# Compare, sur le store embarqué (oxigraph) amorcé avec N objectifs et N états
+# de santé :
+#   - l'ancienne modification de classe entière (DELETE/INSERT WHERE { ?s a sh:Objectif ... })
+#     et l'ancienne suppression DELETE WHERE { ?s a sh:EtatSante ; ?p ?o } ;
+#   - la modification / suppression liée par VALUES à un identifiant cité ;
+#   - la résolution du plus récent (SELECT ... ORDER BY DESC(?date) LIMIT 1),
+#     faite avant la modification quand la commande ne cite pas d'identifiant.
+# Affiche le p50 par taille et le rapport entre la plus grande et la plus petite.
+#
+# Usage : python benchmarks/bench_targeted_updates.py [--sizes 100,1000,10000] [--repeat 50]
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "ObjectifSante-ai")]
+from ai_common.embedded_store import EmbeddedStore
+from main_ai import PREFIX, subjects_query, sparql_etat_sante, sparql_objectif
+
+# Requêtes générées avant le ciblage par IRI
+LEGACY_UPDATE = f"""
+PREFIX sh: <{PREFIX}>
+PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
+DELETE {{ ?s sh:aEtat ?oldEtat }}
+INSERT {{ ?s sh:aEtat "Terminé"^^xsd:string }}
+WHERE {{ ?s a sh:Objectif ; sh:aEtat ?oldEtat }}
+"""
+LEGACY_DELETE = f"PREFIX sh: <{PREFIX}> DELETE WHERE {{ ?s a sh:EtatSante ; ?p ?o . }}"
+
+
+def seeded_store(size):
+    """Store de `size` objectifs et `size` états de santé, en un seul INSERT DATA"""
+    base = datetime.datetime(2025, 1, 1)
+    triples = []
+    for i in range(size):
+        date = (base + datetime.timedelta(minutes=i)).isoformat()
+        triples.append(f'sh:objectif_{i} a sh:Objectif ; sh:aType "Activité physique"^^xsd:string ; '
+                       f'sh:aEtat "En cours"^^xsd:string ; sh:aDateDebut "{date}"^^xsd:dateTime .')
+        triples.append(f'sh:etatSante_{i} a sh:EtatSante ; sh:aPoids "70"^^xsd:decimal ; '
+                       f'sh:aDate "{date}"^^xsd:dateTime .')
+    store = EmbeddedStore(bootstrap=[], engine="oxigraph")
+    store.update(f"PREFIX sh: <{PREFIX}>\nPREFIX xsd: <http://www.w3.org/2001/XMLSchema#>\n"
+                 "INSERT DATA {\n" + "\n".join(triples) + "\n}")
+    return store
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_size(size, repeat):
+    store = seeded_store(size)
+    rows = {}
+    rows["update classe entière (avant)"] = [timed(lambda: store.update(LEGACY_UPDATE)) for _ in range(repeat)]
+    rows["update par identifiant"] = [
+        timed(lambda: store.update(sparql_objectif("update", f"termine objectif_{i % size}",
+                                                   subjects=[f"{PREFIX}objectif_{i % size}"])))
+        for i in range(repeat)]
+    query = subjects_query("objectif", "update", "termine mon objectif de sport")
+    rows["résolution du plus récent"] = [timed(lambda: store.select(query)) for _ in range(repeat)]
+    rows["delete par identifiant"] = [
+        timed(lambda: store.update(sparql_etat_sante("delete", "", subjects=[f"{PREFIX}etatSante_{i}"])))
+        for i in range(min(repeat, size))]
+    # La suppression de classe vide le store : réamorcé avant chaque mesure (hors chrono)
+    legacy = []
+    for _ in range(3):
+        store = seeded_store(size)
+        legacy.append(timed(lambda: store.update(LEGACY_DELETE)))
+    rows["delete classe entière (avant)"] = legacy
+    return {name: statistics.median(values) for name, values in rows.items()}
+
+
+def main(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    results = {size: bench_size(size, args.repeat) for size in sizes}
+    names = list(results[sizes[0]])
+    print(f"{'p50 ms':<32}" + "".join(f"{f'N={size}':>12}" for size in sizes) + f"{'x':>9}")
+    for name in names:
+        first, last = results[sizes[0]][name], results[sizes[-1]][name]
+        cells = "".join(f"{results[size][name] * 1000:>12.3f}" for size in sizes)
+        print(f"{name:<32}{cells}{last / first if first else 0:>8.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", default="100,1000,10000")
+    parser.add_argument("--repeat", type=int, default=50)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,120 @@
+# check_schema.py - Vérifie les requêtes générées contre l'index du schéma
+#
+#   1. chargement : parsing des fichiers Turtle contre relecture de l'instantané ;
+#   2. toutes les requêtes des générateurs (main_ai, EtatSanteAIProcessor,
+#      compile_query des mesures et des scores) n'utilisent que des termes de
+#      l'index, et les termes qui ne viennent que d'ontology-extensions.ttl sont listés ;
+#   3. erreurs : classe mal orthographiée, propriété hors domaine, terme inconnu
+#      dans une requête, lexique de champs qui ne correspond pas au schéma ;
+#   4. coût d'une validation de requête et d'une recherche de propriété.
+# Sort avec le code 1 au premier contrôle en échec.
+#
+# Usage : python benchmarks/check_schema.py [--repeat 200]
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "ObjectifSante-ai"), os.path.join(SERVER_DIR, "backend-ai")]
+from ai_common import schema_index
+from ai_common.config import SCHEMA_SOURCES
+from ai_common.schema_index import SchemaError, get_schema
+from ai_common.sparql_targets import PREFIX
+from ai_processor_etat_sante import EtatSanteAIProcessor
+from main_ai import TARGETS, sparql_etat_sante, sparql_objectif, subjects_query
+from sparql_generator import MESURES_SCHEMA, SCORES_SCHEMA, check_lexicon, compile_query
+
+COMMANDS = ["ajoute poids 72 taille 1.80", "affiche mes états", "modifie la température à 38.5",
+            "change le poids de tous à 70", "supprime etatSante_01HV0000000000000000000000",
+            "ajoute un objectif de sport", "termine mon objectif de perte de poids"]
+
+
+def report(ok, message):
+    print(f"{'✅' if ok else '❌'} {message}")
+    return ok
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def generated_queries():
+    """Toutes les formes de requêtes produites par les générateurs"""
+    queries = []
+    for command in COMMANDS:
+        for action in ("create", "read", "update", "delete"):
+            queries.append(sparql_etat_sante(action, command, 10, None, [PREFIX + "etatSante_1"]))
+            queries.append(sparql_objectif(action, command, 10, None, [PREFIX + "objectif_1"]))
+        for entity in TARGETS:
+            queries.append(subjects_query(entity, "update", command))
+    processor = EtatSanteAIProcessor()
+    for analysis in ({"action": "create", "entities": {"type": "Allergie", "valeur": 2}},
+                     {"action": "create", "entities": {"type": "Traitement"}},
+                     {"action": "read", "entities": {}},
+                     {"action": "update", "entities": {"valeur": 3}},
+                     {"action": "delete", "entities": {}}):
+        queries.append(processor.to_sparql(analysis, [PREFIX + "etatSante_1"]))
+    for schema in (MESURES_SCHEMA, SCORES_SCHEMA):
+        field = next(iter(schema["fields"]))
+        queries.append(compile_query(schema, [{"field": field, "operator": ">", "value": 1}],
+                                     {"field": field, "direction": "DESC"}, 10))
+    return queries
+
+
+def expect_error(fn, message):
+    try:
+        fn()
+    except SchemaError as e:
+        return report(True, f"{message} : {e}")
+    return report(False, f"{message} : aucune erreur")
+
+
+def main(args):
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = os.path.join(tmp, "schema.bin")
+        parse = timed(lambda: schema_index.load(SCHEMA_SOURCES, None), args.repeat // 10 or 1)
+        first = schema_index.load(SCHEMA_SOURCES, snapshot)
+        again = schema_index.load(SCHEMA_SOURCES, snapshot)
+        cached = timed(lambda: schema_index.load(SCHEMA_SOURCES, snapshot), args.repeat)
+        ok &= report(first.source == "parse" and again.source == "snapshot"
+                     and again.properties == first.properties and again.ancestors == first.ancestors,
+                     f"instantané identique au parsing ; chargement {parse * 1000:.2f} ms (parsing) "
+                     f"contre {cached * 1000:.2f} ms (instantané)")
+        ontology_only = schema_index.load(SCHEMA_SOURCES[:1], None)
+
+    schema = get_schema()
+    queries = generated_queries()
+    unknown = sorted({term for query in queries for term in schema.validate(query)})
+    ok &= report(not unknown, f"{len(queries)} requêtes générées, termes inconnus : {unknown or 'aucun'}")
+    extensions = sorted({term for query in queries for term in ontology_only.validate(query)})
+    print(f"ℹ️  termes fournis par ontology-extensions.ttl seulement : {', '.join(extensions)}")
+
+    ok &= expect_error(lambda: schema.require_class("EtatSant"), "classe mal orthographiée")
+    ok &= expect_error(lambda: schema.require_property("Objectif", "aPoids"), "propriété hors domaine")
+    ok &= expect_error(lambda: check_lexicon(MESURES_SCHEMA, {"imc": [], "tension": []}), "lexique hors schéma")
+    ok &= report(schema.validate("INSERT DATA { sh:etatSante_01HV0000000000000000000000 sh:aPoid 70 }") == ["aPoid"],
+                 "terme inconnu détecté dans une requête")
+
+    query = max(queries, key=len)
+    validate = timed(lambda: schema.validate(query), args.repeat)
+    lookup = timed(lambda: schema.require_property("EtatSante", "aTemperature"), args.repeat)
+    print(f"validation d'une requête ({len(query)} caractères) : {validate * 1e6:.1f} µs ; "
+          f"recherche de propriété : {lookup * 1e6:.2f} µs")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,130 @@
+# compare_tiers.py - Exactitude et gain de l'analyse à étages face au tout-spaCy
+#
+# Analyse le même corpus avec NLP_ANALYSIS_MODE=spacy (référence : parse
+# systématique) puis NLP_ANALYSIS_MODE=tiered (règles d'abord), chaque mode
+# dans son propre processus puisque la configuration est lue à l'import.
+# Affiche le taux d'accord, la répartition par étage et le temps moyen par
+# question ; sort en code 1 si une analyse diffère de la référence.
+#
+# Usage :
+#   python benchmarks/compare_tiers.py [--repeat 20] [--show-diff]
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(BENCH_DIR, "..")
+
+# Formulations plus rares : nombres décimaux, mots composés, ponctuation
+EXTRA_MESURES = [
+    "ajoute imc 23,4 et calories 1900",
+    "nouvelle mesure : 8000 pas",
+    "modifier les calories à 2500 kcal",
+    "afficher l'imc du plus petit au plus grand",
+    "calories > 1800",
+    "mesures avec moins de deux mille calories",
+    "Enregistrer IMC 21.7",
+    "supprimer toutes les mesures d'exercice",
+]
+EXTRA_SCORES = [
+    "score nutrition 70, sommeil 85 et activité 60",
+    "scores globaux < 50",
+    "montre-moi mon score de repos",
+]
+EXTRA_ETAT = [
+    "ajoute une allergie",
+    "affiche mes allergies et traitements",
+    "ajoute la condition 12",
+    "liste l'allergie, la condition et le traitement",
+    "ajoute une allergie-arachide",
+    "change le traitement: 2,5",
+    "supprime allergie/condition",
+    "Crée une condition",
+    "montre-moi le traitement",
+]
+
+
+def corpus():
+    sys.path.insert(0, BENCH_DIR)
+    from bench_suite import ETAT_CORPUS, MESURES_CORPUS, SCORES_CORPUS
+
+    return {
+        "mesures": MESURES_CORPUS + EXTRA_MESURES,
+        "scores": SCORES_CORPUS + EXTRA_SCORES,
+        "etat_sante": ETAT_CORPUS + EXTRA_ETAT,
+    }
+
+
+def run_mode(repeat):
+    """Exécuté dans un sous-processus : analyses, étages et temps pour le mode courant"""
+    sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "backend-ai"), os.path.join(SERVER_DIR, "ObjectifSante-ai")]
+    from ai_processor import MesuresAIProcessor, ScoresAIProcessor
+    from ai_processor_etat_sante import EtatSanteAIProcessor
+
+    processors = {
+        "mesures": (MesuresAIProcessor(), "process_question"),
+        "scores": (ScoresAIProcessor(), "process_question"),
+        "etat_sante": (EtatSanteAIProcessor(), "process"),
+    }
+    report = {}
+    for name, questions in corpus().items():
+        processor, method = processors[name]
+        call = getattr(processor, method)
+        processor.nlp  # chargement du modèle hors mesure
+        analyses = [call(q) for q in questions]
+        tiers = processor.tiers.stats()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for q in questions:
+                call(q)
+        elapsed = time.perf_counter() - start
+        report[name] = {
+            "analyses": analyses,
+            "tiers": {tier: tiers[tier] for tier in ("rules", "spacy")},
+            "us_per_question": round(elapsed / (repeat * len(questions)) * 1e6, 1),
+        }
+    return report
+
+
+def spawn(mode, repeat):
+    env = {**os.environ, "NLP_ANALYSIS_MODE": mode, "ANALYSIS_CACHE_SIZE": "0", "LOG_LEVEL": "WARNING"}
+    out = subprocess.run([sys.executable, __file__, "--worker", "--repeat", str(repeat)],
+                         env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def main(args):
+    reference, tiered = spawn("spacy", args.repeat), spawn("tiered", args.repeat)
+    mismatches = 0
+    print(f"{'processeur':<12} {'accord':>10} {'règles':>8} {'spaCy':>8} {'µs spaCy':>10} {'µs tiered':>10} {'gain':>7}")
+    for name, expected in reference.items():
+        got = tiered[name]
+        diff = [(a, b) for a, b in zip(expected["analyses"], got["analyses"]) if a != b]
+        mismatches += len(diff)
+        total = len(expected["analyses"])
+        before, after = expected["us_per_question"], got["us_per_question"]
+        print(f"{name:<12} {total - len(diff):>4}/{total:<5} {got['tiers']['rules']:>8} {got['tiers']['spacy']:>8} "
+              f"{before:>10.1f} {after:>10.1f} {before / after if after else 0:>6.1f}x")
+        if args.show_diff:
+            for a, b in diff:
+                print(f"   ≠ spaCy  : {a}\n     tiered : {b}")
+    if mismatches:
+        print(f"❌ {mismatches} analyse(s) différente(s) de la référence spaCy")
+        return 1
+    print("✅ Analyses identiques à la référence spaCy")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--show-diff", action="store_true")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.worker:
+        print(json.dumps(run_mode(args.repeat), ensure_ascii=False))
+        sys.exit(0)
+    sys.exit(main(args))
@@ -0,0 +1,45 @@
+# corpus.py - Questions et commandes réalistes partagées par les benchmarks
+#
+# Telles que tapées dans le tableau de bord : bench_suite.py les rejoue une à
+# une, load_test.py les tire au hasard sous charge.
+MESURES_CORPUS = [
+    "afficher mes mesures",
+    "montre-moi toutes mes mesures de la semaine",
+    "ajouter une mesure avec imc 24.5 et 2100 calories",
+    "enregistre une nouvelle mesure : imc 22,8 et 1850 calories consommées",
+    "afficher les mesures avec calories supérieur à 2000",
+    "trouver les mesures avec un imc élevé",
+    "lister les imc normaux triés du plus grand au plus petit",
+    "trier mes mesures par calories",
+    "supprimer la dernière mesure",
+    "mettre à jour mon imc à 22",
+    "quelles sont mes mesures avec moins de 1500 calories ?",
+    "je veux voir mes mesures récentes avec un imc bas",
+]
+SCORES_CORPUS = [
+    "montre mes scores",
+    "ajoute un score sommeil 80 et nutrition 65",
+    "modifier le score global à 90",
+    "je veux voir les scores faibles",
+    "afficher les scores d'activité supérieurs à 70",
+    "supprime mon dernier score de nutrition",
+    "liste mes scores de sommeil du plus haut au plus bas",
+    "quel est mon score global cette semaine ?",
+]
+ETAT_CORPUS = [
+    "ajoute une allergie au pollen",
+    "affiche mon état de santé",
+    "modifie la condition 2",
+    "supprime le traitement 3",
+    "crée un nouvel état avec une allergie",
+    "montre mes traitements en cours",
+]
+EXECUTE_COMMANDS = [
+    ("etat_sante", "affiche mon état de santé"),
+    ("objectif", "montre mes objectifs"),
+    ("etat_sante", "ajoute un état de santé avec 72 kg et 1.80 m"),
+    ("objectif", "ajoute un objectif de sport"),
+    ("etat_sante", "modifie le poids à 70"),
+    ("objectif", "termine mon objectif de poids"),
+]
+
@@ -0,0 +1,122 @@
+# fuseki_stub.py - Remplaçant local de Fuseki pour les benchmarks et tests de charge
+#
+# Serveur aiohttp qui expose /<dataset>/query et /<dataset>/update avec une
+# latence réglable (fixe + tirage uniforme dans [0, jitter]) et un taux
+# d'erreurs 503 injectées. Les SELECT renvoient `rows` lignes au format
+# application/sparql-results+json avec les variables du SELECT reçu.
+#
+# Usage autonome : python benchmarks/fuseki_stub.py --port 3031 --latency 0.02 [--jitter 0.01] [--error-rate 0.01]
+import argparse
+import asyncio
+import datetime
+import json
+import random
+import re
+
+from aiohttp import web
+
+SELECT_VARS = re.compile(r"SELECT\s+(?:DISTINCT\s+)?((?:\?\w+\s*)+)", re.IGNORECASE)
+LIMIT = re.compile(r"LIMIT\s+(\d+)", re.IGNORECASE)
+
+
+def fake_binding(var: str, i: int) -> dict:
+    """Valeur plausible selon le nom de la variable"""
+    if var in ("etat", "objectif", "mesure", "score", "s"):
+        return {"type": "uri", "value": f"http://www.smarthealth-tracker.com/ontologie#{var}_{i}"}
+    if "date" in var.lower():
+        value = (datetime.datetime(2025, 1, 1) + datetime.timedelta(minutes=i)).isoformat()
+        return {"type": "literal", "datatype": "http://www.w3.org/2001/XMLSchema#dateTime", "value": value}
+    if var in ("type", "description", "pression"):
+        return {"type": "literal", "value": f"{var} {i % 7}"}
+    return {"type": "literal", "datatype": "http://www.w3.org/2001/XMLSchema#decimal", "value": str(20 + i % 50)}
+
+
+class FusekiStub:
+    """Faux Fuseki démarrable dans la boucle asyncio courante"""
+
+    def __init__(self, latency: float = 0.0, rows: int = 20, dataset: str = "SmartHealth",
+                 jitter: float = 0.0, error_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rows = rows
+        self.dataset = dataset
+        self.selects = 0
+        self.updates = 0
+        self.errors = 0
+        self.updates_received = []
+        self._runner = None
+        self.port = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/{self.dataset}"
+
+    async def _wait(self) -> bool:
+        """Latence simulée ; faux si la requête doit échouer (erreur injectée)"""
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and random.random() < self.error_rate:
+            self.errors += 1
+            return False
+        return True
+
+    async def _query(self, request: web.Request) -> web.StreamResponse:
+        self.selects += 1
+        form = await request.post()
+        query = form.get("query") or request.query.get("query", "")
+        if not await self._wait():
+            return web.Response(status=503, text="Injected error")
+        match = SELECT_VARS.search(query)
+        names = [v.lstrip("?") for v in match.group(1).split()] if match else ["s"]
+        limit = LIMIT.search(query)
+        count = min(self.rows, int(limit.group(1))) if limit else self.rows
+        body = {
+            "head": {"vars": names},
+            "results": {"bindings": [{name: fake_binding(name, i) for name in names} for i in range(count)]},
+        }
+        return web.Response(body=json.dumps(body), content_type="application/sparql-results+json")
+
+    async def _update(self, request: web.Request) -> web.Response:
+        self.updates += 1
+        self.updates_received.append(await request.text())
+        del self.updates_received[:-100]
+        if not await self._wait():
+            return web.Response(status=503, text="Injected error")
+        return web.Response(text="Update succeeded")
+
+    async def start(self, port: int = 0) -> "FusekiStub":
+        app = web.Application()
+        app.router.add_post(f"/{self.dataset}/query", self._query)
+        app.router.add_get(f"/{self.dataset}/query", self._query)
+        app.router.add_post(f"/{self.dataset}/update", self._update)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def serve(port: int, latency: float, rows: int, jitter: float = 0.0, error_rate: float = 0.0):
+    stub = await FusekiStub(latency=latency, rows=rows, jitter=jitter, error_rate=error_rate).start(port)
+    print(f"🧪 Fuseki stub sur {stub.url} (latence {latency * 1000:.0f} ms + jusqu'à {jitter * 1000:.0f} ms, "
+          f"erreurs {error_rate:.1%})")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=3031)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--rows", type=int, default=20)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    asyncio.run(serve(args.port, args.latency, args.rows, args.jitter, args.error_rate))
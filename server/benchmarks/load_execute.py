@@ -0,0 +1,94 @@
+# load_execute.py - Débit de /ai/execute selon le nombre de clients concurrents
+#
+# Démarre un faux Fuseki local (latence réglable) puis le service
+# ObjectifSante-ai sous uvicorn, et mesure le débit et la latence de
+# /ai/execute pour des niveaux de concurrence croissants. Avec un pipeline
+# entièrement async, le débit doit croître avec le nombre de clients tant que
+# le temps est dominé par l'attente de Fuseki.
+#
+# Usage : python benchmarks/load_execute.py [--levels 1,4,16,64] [--latency 0.05] [--duration 5]
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from fuseki_stub import FusekiStub
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+COMMANDS = [
+    ("etat_sante", "affiche mon état de santé"),
+    ("objectif", "montre mes objectifs"),
+    ("etat_sante", "ajoute un état de santé avec 72 kg et 1.80 m"),
+    ("objectif", "ajoute un objectif de sport"),
+    ("etat_sante", "modifie le poids à 70"),
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+async def run_level(client, level, duration):
+    latencies, errors = [], 0
+    commands = itertools.cycle(COMMANDS)
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            entity, command = next(commands)
+            start = time.perf_counter()
+            r = await client.post("/ai/execute", json={"entity": entity, "command": command})
+            latencies.append(time.perf_counter() - start)
+            errors += r.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(level)))
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99), errors
+
+
+async def main(args):
+    stub = await FusekiStub(latency=args.latency).start()
+    env = dict(os.environ, FUSEKI_URL=stub.url)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main_ai:app", "--port", str(args.port), "--log-level", "warning"],
+        cwd=os.path.join(SERVER_DIR, "ObjectifSante-ai"), env=env,
+    )
+    try:
+        limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{args.port}", limits=limits, timeout=60) as client:
+            for _ in range(300):
+                try:
+                    await client.get("/")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+            print(f"Fuseki simulé : {args.latency * 1000:.0f} ms par requête")
+            print(f"{'clients':>8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+            for level in (int(level) for level in args.levels.split(",")):
+                rps, p50, p99, errors = await run_level(client, level, args.duration)
+                print(f"{level:>8} {rps:>9.1f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {errors:>8}")
+    finally:
+        server.terminate()
+        server.wait()
+        await stub.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", default="1,2,4,8,16,32")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--port", type=int, default=8101)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,398 @@
+# load_test.py - Générateur de charge asyncio pour /ai/process, /ai/process-scores et /ai/execute
+#
+# Démarre le faux Fuseki (fuseki_stub.py) dans un thread de ce processus, avec
+# sa propre boucle pour que la génération de charge ne retarde pas ses
+# réponses, puis les services nécessaires au mélange sous uvicorn
+# (--workers N), pointés sur lui. --mesures-url / --objectif-url visent à la
+# place des services déjà lancés.
+#
+# Deux modes :
+#   - boucle ouverte (--rate > 0) : arrivées de Poisson à `rate` req/s, au plus
+#     `concurrency` requêtes en vol. La latence part de l'instant d'arrivée
+#     prévu : l'attente d'une place compte (pas d'omission coordonnée), le
+#     temps de service seul est rapporté à part ;
+#   - boucle fermée (--rate 0) : `concurrency` clients enchaînent les requêtes.
+# Le mélange pondère les endpoints (--mix process=2,process-scores=1,execute=3) ;
+# questions et commandes sont tirées de corpus.py. Les requêtes arrivées pendant
+# --warmup ne sont pas comptées.
+#
+# Rapport JSON (--output) : configuration, débit, latences p50/p95/p99 et taux
+# d'erreurs par endpoint et au total, requêtes reçues par le faux Fuseki. Un
+# fichier par configuration (--label, --workers, --env CLE=valeur) permet de
+# comparer nombres de workers et réglages.
+#
+# Usage :
+#   python benchmarks/load_test.py [--rate 50] [--concurrency 64] [--duration 30] [--workers 2]
+#       [--mix process=1,process-scores=1,execute=1] [--fuseki-latency 0.02] [--fuseki-jitter 0.01]
+#       [--env NLP_EXECUTOR_MODE=process] [--label process-2w] [--output results/load_test.json]
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+from corpus import EXECUTE_COMMANDS, MESURES_CORPUS, SCORES_CORPUS
+from fuseki_stub import FusekiStub
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.join(BENCH_DIR, "..")
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, "results", "load_test.json")
+
+# Service -> (répertoire, application ASGI)
+SERVICES = {
+    "mesures": ("backend-ai", "main:app"),
+    "objectif": ("ObjectifSante-ai", "main_ai:app"),
+}
+# Endpoint -> (service, chemin)
+ENDPOINTS = {
+    "process": ("mesures", "/ai/process"),
+    "process-scores": ("mesures", "/ai/process-scores"),
+    "execute": ("objectif", "/ai/execute"),
+}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def payload(endpoint: str, rng: random.Random, execute_reads: bool) -> Dict:
+    if endpoint == "execute":
+        entity, command = rng.choice(EXECUTE_COMMANDS)
+        return {"entity": entity, "command": command}
+    corpus = MESURES_CORPUS if endpoint == "process" else SCORES_CORPUS
+    return {"question": rng.choice(corpus), "execute": execute_reads}
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Endpoint inconnu dans --mix : {name} ({', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise SystemExit("--mix : au moins un poids doit être positif")
+    return mix
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Rang le plus proche sur des valeurs déjà triées"""
+    return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+
+def latency_block(values: List[float]) -> Optional[Dict]:
+    if not values:
+        return None
+    values = sorted(values)
+    return {
+        "p50": round(percentile(values, 50) * 1000, 2),
+        "p95": round(percentile(values, 95) * 1000, 2),
+        "p99": round(percentile(values, 99) * 1000, 2),
+        "mean": round(statistics.fmean(values) * 1000, 2),
+        "max": round(values[-1] * 1000, 2),
+    }
+
+
+class Sample:
+    __slots__ = ("endpoint", "scheduled", "started", "finished", "status")
+
+    def __init__(self, endpoint: str, scheduled: float):
+        self.endpoint = endpoint
+        self.scheduled = scheduled
+        self.started = scheduled
+        self.finished = scheduled
+        self.status = "pending"
+
+
+# ----------------------------------------------------------------------
+# Faux Fuseki dans un thread
+# ----------------------------------------------------------------------
+class StubThread:
+    """FusekiStub servi par sa propre boucle asyncio, dans un thread démon"""
+
+    def __init__(self, **options):
+        self.stub = FusekiStub(**options)
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fuseki-stub", daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self.stub.start())
+        self._ready.set()
+        self._loop.run_forever()
+
+    def start(self) -> FusekiStub:
+        self._thread.start()
+        self._ready.wait()
+        return self.stub
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.stub.stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+# ----------------------------------------------------------------------
+# Services sous uvicorn
+# ----------------------------------------------------------------------
+def launch(service: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    directory, app = SERVICES[service]
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=os.path.join(SERVER_DIR, directory), env=env,
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, url: str, process: Optional[subprocess.Popen], timeout: float):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"❌ Le service {url} s'est arrêté (code {process.returncode})")
+        try:
+            if (await client.get(url + "/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit(f"❌ Service {url} injoignable après {timeout:.0f} s")
+
+
+# ----------------------------------------------------------------------
+# Génération de charge
+# ----------------------------------------------------------------------
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, urls: Dict[str, str], mix: Dict[str, float], args):
+        self.client = client
+        self.urls = urls
+        self.names = list(mix)
+        self.weights = list(mix.values())
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.samples: List[Sample] = []
+        self.backlog = 0
+        self.max_backlog = 0
+
+    async def send(self, endpoint: str, scheduled: float, slots: asyncio.Semaphore):
+        sample = Sample(endpoint, scheduled)
+        self.samples.append(sample)
+        service, path = ENDPOINTS[endpoint]
+        body = payload(endpoint, self.rng, self.args.execute_reads)
+        # File d'attente côté client : requêtes arrivées sans place libre
+        waiting = slots.locked()
+        if waiting:
+            self.backlog += 1
+            self.max_backlog = max(self.max_backlog, self.backlog)
+        async with slots:
+            if waiting:
+                self.backlog -= 1
+            sample.started = time.perf_counter()
+            try:
+                response = await self.client.post(self.urls[service] + path, json=body)
+                sample.status = str(response.status_code)
+            except httpx.TimeoutException:
+                sample.status = "timeout"
+            except httpx.HTTPError as e:
+                sample.status = type(e).__name__
+            sample.finished = time.perf_counter()
+
+    async def open_loop(self, end: float):
+        """Arrivées de Poisson, indépendantes des réponses"""
+        slots = asyncio.Semaphore(self.args.concurrency)
+        tasks = set()
+        arrival = time.perf_counter()
+        while True:
+            arrival += self.rng.expovariate(self.args.rate)
+            if arrival >= end:
+                break
+            await asyncio.sleep(max(0.0, arrival - time.perf_counter()))
+            endpoint = self.rng.choices(self.names, self.weights)[0]
+            task = asyncio.create_task(self.send(endpoint, arrival, slots))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        await asyncio.gather(*tasks)
+
+    async def closed_loop(self, end: float):
+        """`concurrency` clients qui enchaînent leurs requêtes"""
+        slots = asyncio.Semaphore(self.args.concurrency)
+
+        async def client():
+            while time.perf_counter() < end:
+                endpoint = self.rng.choices(self.names, self.weights)[0]
+                await self.send(endpoint, time.perf_counter(), slots)
+
+        await asyncio.gather(*(client() for _ in range(self.args.concurrency)))
+
+    async def run(self) -> Tuple[float, float]:
+        """Lance la charge ; renvoie la fenêtre mesurée (fin du préchauffage, fin des arrivées)"""
+        start = time.perf_counter()
+        end = start + self.args.warmup + self.args.duration
+        await (self.open_loop(end) if self.args.rate > 0 else self.closed_loop(end))
+        return start + self.args.warmup, end
+
+
+# ----------------------------------------------------------------------
+# Rapport
+# ----------------------------------------------------------------------
+def summarize(samples: List[Sample], window: Tuple[float, float]) -> Dict:
+    """Latences et erreurs des requêtes arrivées dans la fenêtre ; débit = réponses
+    réussies reçues pendant la fenêtre (la file vidée après coup ne le gonfle pas)"""
+    start, end = window
+    duration = end - start
+    arrived = [s for s in samples if start <= s.scheduled < end]
+    ok = [s for s in arrived if s.status == "200"]
+    statuses = Counter(s.status for s in arrived if s.status != "200")
+    completed = sum(1 for s in samples if s.status == "200" and start <= s.finished < end)
+    return {
+        "requests": len(arrived),
+        "ok": len(ok),
+        "errors": sum(statuses.values()),
+        "error_rate": round(sum(statuses.values()) / len(arrived), 4) if arrived else 0.0,
+        "error_statuses": dict(statuses),
+        "throughput_rps": round(completed / duration, 2),
+        "offered_rps": round(len(arrived) / duration, 2),
+        "latency_ms": latency_block([s.finished - s.scheduled for s in ok]),
+        "service_ms": latency_block([s.finished - s.started for s in ok]),
+    }
+
+
+def report(args, mix, samples: List[Sample], window: Tuple[float, float], generator: LoadGenerator,
+           stub: Optional[FusekiStub]) -> Dict:
+    return {
+        "label": args.label,
+        "date": datetime.datetime.now().isoformat(timespec="seconds"),
+        "git": git_revision(),
+        "platform": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            "mode": "open" if args.rate > 0 else "closed",
+            "rate": args.rate,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "warmup_s": args.warmup,
+            "mix": mix,
+            "workers": args.workers,
+            "execute_reads": args.execute_reads,
+            "env": dict(args.env),
+            "fuseki": None if stub is None else {
+                "latency_s": args.fuseki_latency, "jitter_s": args.fuseki_jitter,
+                "error_rate": args.fuseki_error_rate, "rows": args.fuseki_rows,
+            },
+            "seed": args.seed,
+        },
+        "total": summarize(samples, window),
+        "endpoints": {name: summarize([s for s in samples if s.endpoint == name], window) for name in mix},
+        "client": {"max_backlog": generator.max_backlog},
+        "fuseki": None if stub is None else {"selects": stub.selects, "updates": stub.updates, "errors": stub.errors},
+    }
+
+
+def print_report(result: Dict):
+    print(f"{'endpoint':<16} {'req':>7} {'ok/s':>8} {'erreurs':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, row in [*result["endpoints"].items(), ("total", result["total"])]:
+        latency = row["latency_ms"] or {"p50": 0, "p95": 0, "p99": 0}
+        print(f"{name:<16} {row['requests']:>7} {row['throughput_rps']:>8.1f} {row['error_rate']:>8.1%} "
+              f"{latency['p50']:>9.1f} {latency['p95']:>9.1f} {latency['p99']:>9.1f}")
+    print(f"file d'attente client max : {result['client']['max_backlog']} ; Fuseki : {result['fuseki']}")
+
+
+async def main(args):
+    mix = parse_mix(args.mix)
+    needed = {ENDPOINTS[name][0] for name, weight in mix.items() if weight > 0}
+    external = {"mesures": args.mesures_url, "objectif": args.objectif_url}
+    stub_thread = None
+    if any(not external[service] for service in needed):
+        stub_thread = StubThread(latency=args.fuseki_latency, jitter=args.fuseki_jitter,
+                                 error_rate=args.fuseki_error_rate, rows=args.fuseki_rows)
+    stub = stub_thread.start() if stub_thread else None
+
+    env = dict(os.environ, STORE_BACKEND="http", LOG_LEVEL=os.environ.get("LOG_LEVEL", "WARNING"))
+    if stub is not None:
+        env["FUSEKI_URL"] = stub.url
+    env.update(args.env)
+
+    processes, urls = {}, {}
+    for i, service in enumerate(sorted(needed)):
+        if external[service]:
+            urls[service] = external[service].rstrip("/")
+        else:
+            port = args.port + i
+            processes[service] = launch(service, port, args.workers, env)
+            urls[service] = f"http://127.0.0.1:{port}"
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    try:
+        async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+            for service, url in urls.items():
+                await wait_ready(client, url, processes.get(service), args.startup_timeout)
+            mode = f"{args.rate:g} req/s (Poisson)" if args.rate > 0 else "boucle fermée"
+            print(f"🚦 {mode}, {args.concurrency} en vol max, {args.duration:g} s (+{args.warmup:g} s de préchauffage), "
+                  f"{args.workers} worker(s) ; mélange {mix}")
+            generator = LoadGenerator(client, urls, mix, args)
+            window = await generator.run()
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.wait()
+        if stub_thread:
+            stub_thread.stop()
+
+    result = report(args, mix, generator.samples, window, generator, stub)
+    print_report(result)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2, ensure_ascii=False)
+        print(f"💾 Rapport enregistré dans {args.output}")
+    return 0
+
+
+def env_pair(text: str):
+    key, sep, value = text.partition("=")
+    if not sep or not key:
+        raise argparse.ArgumentTypeError(f"CLE=valeur attendu : {text!r}")
+    return key, value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rate", type=float, default=20, help="arrivées par seconde (0 = boucle fermée)")
+    parser.add_argument("--concurrency", type=int, default=32, help="requêtes en vol au plus")
+    parser.add_argument("--duration", type=float, default=20, help="durée mesurée (s)")
+    parser.add_argument("--warmup", type=float, default=3, help="préchauffage non compté (s)")
+    parser.add_argument("--mix", default="process=1,process-scores=1,execute=1")
+    parser.add_argument("--execute-reads", action="store_true",
+                        help="/ai/process* exécutent les lectures sur Fuseki (execute=true)")
+    parser.add_argument("--workers", type=int, default=1, help="workers uvicorn par service")
+    parser.add_argument("--env", type=env_pair, action="append", default=[],
+                        help="variable d'environnement des services, CLE=valeur (répétable)")
+    parser.add_argument("--fuseki-latency", type=float, default=0.02)
+    parser.add_argument("--fuseki-jitter", type=float, default=0.0)
+    parser.add_argument("--fuseki-error-rate", type=float, default=0.0)
+    parser.add_argument("--fuseki-rows", type=int, default=20)
+    parser.add_argument("--mesures-url", default=None, help="backend-ai déjà lancé (sinon démarré ici)")
+    parser.add_argument("--objectif-url", default=None, help="ObjectifSante-ai déjà lancé (sinon démarré ici)")
+    parser.add_argument("--port", type=int, default=8111, help="premier port des services démarrés")
+    parser.add_argument("--timeout", type=float, default=30, help="délai maximal d'une requête (s)")
+    parser.add_argument("--startup-timeout", type=float, default=120)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--label", default=None)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="rapport JSON ('' pour ne rien écrire)")
+    sys.exit(asyncio.run(main(parser.parse_args())))
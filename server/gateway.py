@@ -0,0 +1,184 @@
+# gateway.py - Passerelle ASGI : backend-ai et ObjectifSante-ai dans un seul processus
+#
+# Les deux applications FastAPI gardent leurs routes, leurs middlewares (CORS,
+# métriques, profilage) et leur lifespan : la passerelle envoie chaque requête à
+# l'application qui déclare la route, et démarre/arrête les deux lifespans.
+# Les ressources de processus ne sont donc créées qu'une fois par worker :
+# modèles spaCy (nlp_registry), pools Fuseki (fuseki_client, fermés au dernier
+# shutdown), index du schéma, cache des SELECT et registre des métriques.
+#
+# Routes déclarées par les deux applications ("/", /metrics, /ai/profiles, /docs) :
+# GATEWAY_PORTS associe ses ports aux services dans l'ordre (défaut : 8002
+# backend-ai, 8001 ObjectifSante-ai, leurs anciens ports) ; la requête va au service
+# du port qui l'a reçue, à backend-ai sur tout autre port.
+#
+# Usage : python gateway.py [--workers 4] [--port 8002 --port 8001]
+#         uvicorn gateway:app --workers 4 --port 8002
+import argparse
+import asyncio
+import os
+import socket
+import sys
+from contextlib import AsyncExitStack
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "backend-ai"), os.path.join(SERVER_DIR, "ObjectifSante-ai")]
+
+import uvicorn
+from fastapi import FastAPI
+from starlette.responses import JSONResponse
+from starlette.routing import Match
+
+from ai_common import fuseki_client
+from ai_common.config import (GATEWAY_HOST, GATEWAY_PORTS, GATEWAY_PRELOAD_MODELS, GATEWAY_WORKERS,
+                              NLP_EXECUTOR_MODE)
+from ai_common.logs import fields, get_logger
+from ai_common.nlp_registry import models
+from ai_common.schema_index import get_schema
+import main as backend_ai
+import main_ai as objectif_sante_ai
+
+log = get_logger("gateway")
+
+
+class Service(NamedTuple):
+    name: str
+    app: FastAPI
+    port: Optional[int]  # port où ce service a priorité sur les routes communes
+
+
+class Gateway:
+    """Application ASGI qui répartit les requêtes entre plusieurs applications FastAPI"""
+
+    def __init__(self, apps: List[Tuple[str, FastAPI]], ports: List[int] = GATEWAY_PORTS,
+                 workers: int = GATEWAY_WORKERS):
+        self.apps = apps
+        self.workers = workers
+        self.assign(ports)
+
+    def assign(self, ports: List[int]):
+        """Associe les ports aux applications dans l'ordre"""
+        self.services = [Service(name, app, ports[i] if i < len(ports) else None)
+                         for i, (name, app) in enumerate(self.apps)]
+        # Ordre de recherche des routes selon le port de la requête
+        self.by_port = {
+            service.port: [service] + [other for other in self.services if other is not service]
+            for service in self.services
+            if service.port is not None
+        }
+
+    def resolve(self, scope) -> Service:
+        """Application de la requête : première route complète, sinon première route
+        dont seule la méthode diffère (405), sinon la première application (404)"""
+        server = scope.get("server") or (None, None)
+        ordered = self.by_port.get(server[1], self.services)
+        partial = None
+        for service in ordered:
+            for route in service.app.router.routes:
+                match, _ = route.matches(scope)
+                if match is Match.FULL:
+                    return service
+                if match is Match.PARTIAL and partial is None:
+                    partial = service
+        return partial or ordered[0]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self.lifespan(receive, send)
+        elif scope["type"] == "http" and scope["path"] == "/ai/gateway":
+            await JSONResponse(self.stats())(scope, receive, send)
+        else:
+            await self.resolve(scope).app(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        """Protocole lifespan ASGI : lifespans des applications dans l'ordre, arrêt en ordre inverse"""
+        await receive()
+        stack = AsyncExitStack()
+        try:
+            if GATEWAY_PRELOAD_MODELS:
+                await asyncio.to_thread(preload_models)
+            for service in self.services:
+                await stack.enter_async_context(service.app.router.lifespan_context(service.app))
+        except Exception as e:
+            log.exception("❌ Démarrage de la passerelle impossible")
+            await stack.aclose()
+            await send({"type": "lifespan.startup.failed", "message": repr(e)})
+            return
+        log.info("🚀 Passerelle démarrée",
+                 extra=fields(services=[service.name for service in self.services], pid=os.getpid()))
+        await send({"type": "lifespan.startup.complete"})
+
+        await receive()
+        try:
+            await stack.aclose()
+        except Exception as e:
+            log.exception("❌ Arrêt de la passerelle incomplet")
+            await send({"type": "lifespan.shutdown.failed", "message": repr(e)})
+            return
+        await send({"type": "lifespan.shutdown.complete"})
+
+    def stats(self) -> Dict:
+        cache = objectif_sante_ai.result_cache
+        return {
+            "pid": os.getpid(),
+            "workers": self.workers,
+            "services": {
+                service.name: {"port": service.port, "routes": len(service.app.router.routes)}
+                for service in self.services
+            },
+            "shared": {
+                "nlp": models.stats(),
+                "fuseki": fuseki_client.stats(),
+                "schema": get_schema().stats(),
+                "sparql_cache": cache.stats() if cache else {"enabled": False},
+            },
+        }
+
+
+def preload_models():
+    """Charge une fois les pipelines déclarés par les processeurs (partagés par les deux services).
+    En mode "process", chaque worker NLP charge les siens : rien à faire ici."""
+    if NLP_EXECUTOR_MODE == "process":
+        return
+    for processor in (backend_ai.ai_processor, backend_ai.scores_ai_processor):
+        models.get(pipes=processor.required_pipes)
+
+
+app = Gateway([("backend-ai", backend_ai.app), ("objectif-sante-ai", objectif_sante_ai.app)])
+
+
+def bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve(host: str, ports: List[int], workers: int):
+    """Lance la passerelle sur tous les ports ; avec plusieurs workers, chacun est un
+    processus uvicorn qui partage les sockets et charge ses propres ressources"""
+    from uvicorn.supervisors import Multiprocess
+
+    sockets = [bind(host, port) for port in ports]
+    log.info("🚀 Starting AI gateway",
+             extra=fields(urls=[f"http://{host}:{port}" for port in ports], workers=workers))
+    if workers > 1:
+        # Relus par les workers, qui importent gateway:app
+        os.environ["GATEWAY_PORTS"] = ",".join(map(str, ports))
+        os.environ["GATEWAY_WORKERS"] = str(workers)
+        config = uvicorn.Config("gateway:app", host=host, port=ports[0], workers=workers)
+        Multiprocess(config, target=uvicorn.Server(config).run, sockets=sockets).run()
+    else:
+        app.assign(ports)
+        uvicorn.Server(uvicorn.Config(app, host=host, port=ports[0])).run(sockets=sockets)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=GATEWAY_HOST)
+    parser.add_argument("--port", type=int, action="append", help=f"répétable (défaut : {GATEWAY_PORTS})")
+    parser.add_argument("--workers", type=int, default=GATEWAY_WORKERS)
+    args = parser.parse_args()
+    serve(args.host, args.port or GATEWAY_PORTS, args.workers)
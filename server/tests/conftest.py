@@ -0,0 +1,11 @@
+# conftest.py - Chemins d'import des services AI pour les tests
+import os
+import sys
+
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Graphe en mémoire amorcé par ontology.ttl : les tests n'appellent jamais un vrai Fuseki
+os.environ.setdefault("STORE_BACKEND", "embedded")
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [SERVER_DIR, os.path.join(SERVER_DIR, "backend-ai"), os.path.join(SERVER_DIR, "ObjectifSante-ai"),
+                os.path.join(SERVER_DIR, "benchmarks")]
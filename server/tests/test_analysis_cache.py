@@ -0,0 +1,27 @@
+# test_analysis_cache.py - Le cache ne doit jamais changer la réponse d'une question
+import pytest
+
+from ai_common.analysis_cache import AnalysisCache
+from ai_processor import MesuresAIProcessor
+
+
+@pytest.mark.parametrize("first, second", [
+    ("afficher imc eleve", "afficher IMC élevé"),
+    ("calories plus  de 2000", "calories plus de 2000"),
+])
+def test_cached_answer_matches_fresh_analysis(first, second):
+    fresh = MesuresAIProcessor().process_question(second)
+
+    processor = MesuresAIProcessor()
+    processor.process_question(first)
+    cached = processor.process_question(second)
+
+    assert cached["filters"] == fresh["filters"]
+    assert cached["filters"]
+
+
+def test_case_only_variants_share_an_entry():
+    cache = AnalysisCache(maxsize=8)
+    cache.put("Afficher IMC élevé", {"filters": []})
+    assert cache.get("afficher imc élevé") == {"filters": []}
+    assert cache.get("afficher imc eleve") is None
@@ -0,0 +1,77 @@
+# test_batch.py - Routes /ai/process/batch et /ai/process-scores/batch
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+QUESTIONS = ["affiche mes calories", "calories plus de 2000", "poids supérieur à 70",
+             "supprime ma dernière mesure", "affiche mon imc"]
+SCORES = ["affiche mes scores", "score sommeil supérieur à 80", "ajoute un score global de 75"]
+FAILING = "affiche mes calories du lot en erreur"
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def single(client, question):
+    response = client.post("/ai/process", json={"question": question})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_batch_results_follow_question_order(client):
+    response = client.post("/ai/process/batch", json={"questions": QUESTIONS, "batch_size": 2})
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["count"], body["errors"]) == (len(QUESTIONS), 0)
+    for question, result in zip(QUESTIONS, body["results"]):
+        expected = single(client, question)
+        assert (result["action"], result["natural_response"], result["data"]) == \
+               (expected["action"], expected["natural_response"], expected["data"])
+
+
+def test_scores_batch_results_follow_question_order(client):
+    body = client.post("/ai/process-scores/batch", json={"questions": SCORES}).json()
+    assert body["count"] == len(SCORES) and body["errors"] == 0
+    for question, result in zip(SCORES, body["results"]):
+        expected = client.post("/ai/process-scores", json={"question": question}).json()
+        assert (result["action"], result["natural_response"]) == (expected["action"], expected["natural_response"])
+
+
+def test_failing_question_leaves_the_others_intact(client, monkeypatch):
+    analyze = main.ai_processor._analyze
+
+    def fragile(question, doc=None):
+        if question == FAILING:
+            raise RuntimeError("analyse impossible")
+        return analyze(question, doc)
+
+    monkeypatch.setattr(main.ai_processor, "_analyze", fragile)
+    questions = QUESTIONS[:2] + [FAILING] + QUESTIONS[2:]
+    body = client.post("/ai/process/batch", json={"questions": questions}).json()
+
+    assert (body["count"], body["errors"]) == (len(questions), 1)
+    failed = body["results"][2]
+    assert not failed["success"] and failed["error"] == "analyse impossible"
+    others = body["results"][:2] + body["results"][3:]
+    assert all(result["success"] for result in others)
+    assert [result["natural_response"] for result in others] == \
+           [single(client, question)["natural_response"] for question in QUESTIONS]
+
+
+@pytest.mark.parametrize("path", ["/ai/process/batch", "/ai/process-scores/batch"])
+def test_batch_over_limit_is_rejected(client, path, monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_QUESTIONS", 3)
+    response = client.post(path, json={"questions": ["affiche mes calories"] * 4})
+    assert response.status_code == 413
+    assert client.post(path, json={"questions": ["affiche mes calories"] * 3}).status_code == 200
+
+
+@pytest.mark.parametrize("path", ["/ai/process/batch", "/ai/process-scores/batch"])
+@pytest.mark.parametrize("batch_size", [0, -5])
+def test_batch_size_must_be_positive(client, path, batch_size):
+    response = client.post(path, json={"questions": ["affiche mes calories"], "batch_size": batch_size})
+    assert response.status_code == 400
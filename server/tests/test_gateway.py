@@ -0,0 +1,33 @@
+# test_gateway.py - Passerelle : routes des deux services, lifespans et ports
+from fastapi.testclient import TestClient
+
+import gateway
+import main
+import main_ai
+from ai_common import fuseki_client
+
+
+def test_routes_of_both_apps_and_both_lifespans():
+    with TestClient(gateway.app) as client:
+        # Lifespan de backend-ai (pool NLP) et d'ObjectifSante-ai (pool Fuseki, compté deux fois)
+        assert main.nlp_executor._pool is not None
+        assert fuseki_client._users == 2
+
+        assert client.post("/ai/process", json={"question": "affiche mes calories"}).status_code == 200
+        execute = client.post("/ai/execute", json={"entity": "objectif", "command": "affiche mes objectifs"})
+        assert execute.status_code == 200 and execute.json()["analysis"]["entity"] == "objectif"
+
+        assert client.get("/ai/unknown").status_code == 404
+        assert client.get("/ai/execute").status_code == 405
+        assert set(client.get("/ai/gateway").json()["services"]) == {"backend-ai", "objectif-sante-ai"}
+
+    assert main.nlp_executor._pool is None
+    assert fuseki_client._users == 0
+
+
+def test_shared_routes_follow_the_port():
+    app = gateway.Gateway([("backend-ai", main.app), ("objectif-sante-ai", main_ai.app)], ports=[8002, 8001])
+    assert TestClient(app, base_url="http://test:8002").get("/").json() == {"message": "AI Mesures API is running!"}
+    assert TestClient(app, base_url="http://test:8001").get("/").json() == {"status": "running"}
+    # Port inconnu : le premier service
+    assert TestClient(app, base_url="http://test:9000").get("/").json() == {"message": "AI Mesures API is running!"}
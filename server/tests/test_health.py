@@ -0,0 +1,34 @@
+# test_health.py - /ai/health selon le mode de l'exécuteur NLP
+from fastapi.testclient import TestClient
+
+import main
+from ai_common.nlp_executor import NLPExecutor
+
+
+def test_thread_mode_reports_nlp_counters():
+    with TestClient(main.app) as client:
+        client.post("/ai/process", json={"question": "affiche mes calories"})
+        health = client.get("/ai/health").json()
+    assert health["executor"]["mode"] == "thread"
+    tiers = health["tiers"]["mesures"]
+    assert tiers["cache"] + tiers["rules"] + tiers["spacy"] >= 1
+    assert "nlp" in health and "cache" in health
+
+
+def test_process_mode_reports_worker_counters(monkeypatch):
+    executor = NLPExecutor({"mesures": main.ai_processor, "scores": main.scores_ai_processor},
+                           mode="process", max_workers=2)
+    monkeypatch.setattr(main, "nlp_executor", executor)
+    questions = ["affiche mes calories", "calories plus de 2000", "affiche mes calories", "poids supérieur à 70"]
+    with TestClient(main.app) as client:
+        for question in questions:
+            assert client.post("/ai/process", json={"question": question}).status_code == 200
+        health = client.get("/ai/health").json()
+
+    assert health["executor"]["mode"] == "process"
+    assert health["nlp"]["scope"] == "worker" and health["nlp"]["workers"]
+    tiers = health["tiers"]["mesures"]
+    assert health["tiers"]["scope"] == "worker"
+    assert tiers["cache"] + tiers["rules"] + tiers["spacy"] == len(questions)
+    cache = health["cache"]["mesures"]
+    assert cache["hits"] + cache["misses"] == len(questions)
@@ -0,0 +1,91 @@
+# test_ids.py - Sujets ULID : uniques entre threads et processus, croissants, un par création
+import asyncio
+import multiprocessing
+import re
+import threading
+import time
+
+import httpx
+import pytest
+
+import main_ai
+from ai_common.fuseki_client import get_client
+from ai_common.ids import new_id, timestamp_ms, ulid
+from ai_processor_etat_sante import EtatSanteAIProcessor
+
+PREFIX = "http://www.smarthealth-tracker.com/ontologie#"
+SUBJECT = re.compile(r"sh:((?:objectif|etatSante)_[0-9A-Z]{26})\b")
+
+
+def generate(count):
+    return [ulid.new() for _ in range(count)]
+
+
+def test_threads_get_distinct_increasing_ids():
+    threads, count = 8, 5000
+    results = [None] * threads
+    barrier = threading.Barrier(threads)
+
+    def worker(i):
+        barrier.wait()
+        results[i] = generate(count)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+    ids = [i for chunk in results for i in chunk]
+    assert len(set(ids)) == len(ids)
+    assert all(a < b for chunk in results for a, b in zip(chunk, chunk[1:]))
+    now = time.time() * 1000
+    assert all(abs(timestamp_ms(i) - now) < 60_000 for i in (ids[0], ids[-1]))
+
+
+@pytest.mark.parametrize("method", [m for m in ("fork", "spawn") if m in multiprocessing.get_all_start_methods()])
+def test_processes_get_distinct_ids(method):
+    ulid.new()  # état du parent non vide : les enfants forkés doivent le réinitialiser
+    with multiprocessing.get_context(method).Pool(4) as pool:
+        ids = [i for chunk in pool.map(generate, [5000] * 4) for i in chunk]
+    assert len(set(ids)) == len(ids)
+
+
+def test_new_id_is_a_prefixed_ulid():
+    assert re.fullmatch(r"objectif_[0-9A-HJKMNP-TV-Z]{26}", new_id("objectif"))
+
+
+def test_concurrent_creates_give_one_subject_each():
+    creates = 100
+    commands = [("objectif", "ajoute un objectif de sport"),
+                ("etat_sante", "ajoute un état de santé avec 72 kg et 1.80 m")]
+
+    async def post_all():
+        async with main_ai.lifespan(main_ai.app):
+            transport = httpx.ASGITransport(app=main_ai.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(
+                    client.post("/ai/execute", json={"entity": commands[i % 2][0], "command": commands[i % 2][1]})
+                    for i in range(creates)))
+
+    responses = asyncio.run(post_all())
+    assert all(response.status_code == 200 for response in responses)
+    subjects = {SUBJECT.search(response.json()["sparql"]).group(1) for response in responses}
+    assert len(subjects) == creates
+
+    values = " ".join(f"<{PREFIX}{subject}>" for subject in subjects)
+    rows = get_client().select(f"""
+        PREFIX sh: <{PREFIX}>
+        SELECT ?s (COUNT(?date) AS ?n) WHERE {{
+          VALUES ?s {{ {values} }}
+          {{ ?s a sh:Objectif ; sh:aDateDebut ?date }} UNION {{ ?s a sh:EtatSante ; sh:aDate ?date }}
+        }} GROUP BY ?s""")["results"]["bindings"]
+    assert len(rows) == creates
+    assert all(int(row["n"]["value"]) == 1 for row in rows)
+
+
+def test_processor_creates_distinct_subjects():
+    processor = EtatSanteAIProcessor()
+    analysis = {"action": "create", "entities": {"type": "Allergie", "valeur": 1}}
+    subjects = {processor.to_sparql(analysis).split("INSERT DATA {")[1].split()[0] for _ in range(1000)}
+    assert len(subjects) == 1000
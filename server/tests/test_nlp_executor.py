@@ -0,0 +1,58 @@
+# test_nlp_executor.py - Une analyse lente ne bloque pas la boucle, et la file est bornée
+import asyncio
+import time
+
+import httpx
+
+import main
+from ai_common.nlp_executor import NLPExecutor
+
+DELAY = 0.5
+MAX_PENDING = 4
+
+
+class SlowProcessor:
+    """Processeur réel précédé d'une attente bloquante (parse spaCy coûteux)"""
+
+    def __init__(self, processor):
+        self.processor = processor
+
+    def process_question(self, question):
+        time.sleep(DELAY)
+        return self.processor.process_question(question)
+
+
+async def timed(request):
+    start = time.perf_counter()
+    response = await request
+    return response, time.perf_counter() - start
+
+
+def test_slow_analyses_do_not_block_other_requests(monkeypatch):
+    executor = NLPExecutor({"mesures": SlowProcessor(main.ai_processor), "scores": main.scores_ai_processor},
+                           mode="thread", max_workers=2, max_pending=MAX_PENDING)
+    monkeypatch.setattr(main, "nlp_executor", executor)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            question = {"question": "affiche mes calories"}
+            busy = [asyncio.create_task(timed(client.post("/ai/process", json=question)))
+                    for _ in range(MAX_PENDING)]
+            while executor.stats()["pending"] < MAX_PENDING:
+                await asyncio.sleep(0.01)
+
+            cheap = [await timed(client.get(path)) for path in ("/", "/ai/health")]
+            rejected = await client.post("/ai/process", json=question)
+            return await asyncio.gather(*busy), cheap, rejected
+
+    busy, cheap, rejected = asyncio.run(scenario())
+
+    # 4 analyses de 0,5 s sur 2 threads : ~1 s au total, sans bloquer la boucle
+    assert all(response.status_code == 200 for response, _ in busy)
+    assert max(elapsed for _, elapsed in busy) < MAX_PENDING * DELAY
+    for response, elapsed in cheap:
+        assert response.status_code == 200
+        assert elapsed < DELAY / 2
+    assert rejected.status_code == 503
+    assert executor.stats()["rejected"] == 1
@@ -0,0 +1,73 @@
+# test_pagination.py - Pagination par curseur de /ai/execute sur des dates mélangées
+import pytest
+from fastapi.testclient import TestClient
+
+import main_ai
+from ai_common import fuseki_client
+
+# Dates des routes Node (toISOString, "Z"), des anciennes créations de l'AI (sans
+# fuseau) et des nouvelles (datetime aware, "+00:00")
+DATES = ["2024-03-01T10:00:00.000Z", "2024-03-01T11:00:00", "2024-03-01T12:00:00+00:00",
+         "2024-03-01T13:00:00.500Z", "2024-03-01T13:00:00", "2024-03-01T14:00:00+02:00"]
+
+
+@pytest.fixture(scope="module")
+def client():
+    objectifs = " ".join(
+        f'sh:objectifPage_{i} a sh:Objectif ; sh:aType "Sport" ; sh:aDescription "page" ; '
+        f'sh:aEtat "En cours" ; sh:aDateDebut "{date}"^^xsd:dateTime ; sh:aDateFin "{date}"^^xsd:dateTime .'
+        for i, date in enumerate(DATES)
+    )
+    fuseki_client.get_client().update(f"{main_ai.HEADER}INSERT DATA {{ {objectifs} }}")
+    if main_ai.result_cache:
+        main_ai.result_cache.clear()
+    with TestClient(main_ai.app) as client:
+        yield client
+
+
+def read_all(client, page_size):
+    rows, cursor = [], None
+    while True:
+        response = client.post("/ai/execute", json={"entity": "objectif", "command": "affiche mes objectifs",
+                                                    "page_size": page_size, "cursor": cursor})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        rows += [row["objectif"]["value"] for row in body["result"]["results"]["bindings"]]
+        cursor = body["page"]["next_cursor"]
+        if cursor is None:
+            return rows
+
+
+def test_pages_cover_every_row_once(client):
+    everything = read_all(client, 1000)
+    assert sum("objectifPage_" in row for row in everything) == len(DATES)
+    for page_size in (1, 2, 4):
+        assert read_all(client, page_size) == everything
+
+
+def test_mixed_timezones_sort_as_utc(client):
+    rows = [row.rsplit("_", 1)[1] for row in read_all(client, 1000) if "objectifPage_" in row]
+    # 13:00:00.500Z > 13:00:00 (UTC) > 12:00+00:00 = 14:00+02:00 (départagés par le sujet)
+    assert rows == ["3", "4", "5", "2", "1", "0"]
+
+
+def test_created_dates_carry_a_timezone():
+    query = main_ai.sparql_objectif("create", "ajoute un objectif de sport")
+    assert '+00:00"^^xsd:dateTime' in query
+
+
+def test_read_without_page_size_returns_every_row(client):
+    count = main_ai.SPARQL_PAGE_SIZE + 10
+    objectifs = " ".join(
+        f'sh:objectifBulk_{i} a sh:Objectif ; sh:aType "Sport" ; sh:aDescription "lot" ; sh:aEtat "En cours" ; '
+        f'sh:aDateDebut "2024-04-01T10:00:00.000Z"^^xsd:dateTime ; sh:aDateFin "2024-04-02T10:00:00.000Z"^^xsd:dateTime .'
+        for i in range(count)
+    )
+    fuseki_client.get_client().update(f"{main_ai.HEADER}INSERT DATA {{ {objectifs} }}")
+
+    # Comme AIBOX.jsx : ni page_size ni curseur
+    body = client.post("/ai/execute", json={"entity": "objectif", "command": "affiche mes objectifs"}).json()
+    rows = [row["objectif"]["value"] for row in body["result"]["results"]["bindings"]]
+    assert sum("objectifBulk_" in row for row in rows) == count
+    assert "page" not in body
+    assert "LIMIT" not in body["sparql"]
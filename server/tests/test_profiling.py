@@ -0,0 +1,38 @@
+# test_profiling.py - Profilage à la demande : jeton dans l'en-tête seulement
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from ai_common import profiling
+
+TOKEN = "jeton-de-test"
+QUESTION = {"question": "affiche les calories plus de 2000 du 12 mars"}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", TOKEN)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def test_header_profiles_the_request(client):
+    response = client.post("/ai/process", json=QUESTION, headers={"X-AI-Profile": TOKEN})
+    assert response.status_code == 200
+    profile_id = response.headers["x-ai-profile-id"]
+
+    report = client.get(f"/ai/profiles/{profile_id}", headers={"X-AI-Profile": TOKEN})
+    assert report.status_code == 200
+    assert "Échantillons (tous threads)" in report.text
+    for format in ("collapsed", "pstats"):
+        assert client.get(f"/ai/profiles/{profile_id}?format={format}",
+                          headers={"X-AI-Profile": TOKEN}).status_code == 200
+
+
+def test_token_in_query_string_is_ignored(client):
+    response = client.post(f"/ai/process?profile={TOKEN}", json=QUESTION)
+    assert response.status_code == 200
+    assert "x-ai-profile-id" not in response.headers
+
+    profile_id = client.post("/ai/process", json=QUESTION, headers={"X-AI-Profile": TOKEN}).headers["x-ai-profile-id"]
+    assert client.get(f"/ai/profiles/{profile_id}?profile={TOKEN}").status_code == 404
@@ -0,0 +1,48 @@
+# test_result_cache.py - Écritures faites hors du service (routes Node) et cache des SELECT
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import main_ai
+from ai_common import fuseki_client
+from ai_common.result_cache import ResultCache
+
+QUERY = main_ai.HEADER + "SELECT ?o WHERE { ?o a sh:Objectif ; sh:aType ?t }"
+
+
+def external_insert(name: str):
+    """Comme objectifRoutes.js : écrit directement dans le store, sans passer par run_update"""
+    fuseki_client.get_client().update(
+        f'{main_ai.HEADER}INSERT DATA {{ sh:{name} a sh:Objectif ; sh:aType "Sport" ; sh:aDescription "externe" ; '
+        f'sh:aEtat "En cours" ; sh:aDateDebut "2030-01-01T00:00:00.000Z"^^xsd:dateTime ; '
+        f'sh:aDateFin "2030-01-02T00:00:00.000Z"^^xsd:dateTime . }}')
+
+
+def subjects(result):
+    return {row["o"]["value"].rsplit("#", 1)[1] for row in result["results"]["bindings"]}
+
+
+def test_execute_sees_external_writes_by_default():
+    assert main_ai.result_cache is None
+    command = {"entity": "objectif", "command": "affiche mes objectifs", "page_size": 1000}
+    with TestClient(main_ai.app) as client:
+        client.post("/ai/execute", json=command)
+        external_insert("objectifExterne_1")
+        rows = client.post("/ai/execute", json=command).json()["result"]["results"]["bindings"]
+    assert any(row["objectif"]["value"].endswith("objectifExterne_1") for row in rows)
+
+
+def test_enabled_cache_staleness_is_bounded_by_ttl():
+    cache = ResultCache(ttl=0.2)
+    select = fuseki_client.get_async_client().select
+
+    async def scenario():
+        await cache.select(QUERY, select)
+        external_insert("objectifExterne_2")
+        stale = await cache.select(QUERY, select)
+        await asyncio.sleep(0.25)
+        return stale, await cache.select(QUERY, select)
+
+    stale, fresh = asyncio.run(scenario())
+    assert "objectifExterne_2" not in subjects(stale)
+    assert "objectifExterne_2" in subjects(fresh)
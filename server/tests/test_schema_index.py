@@ -0,0 +1,30 @@
+# test_schema_index.py - Instantané de l'index du schéma
+import os
+
+from ai_common import schema_index
+from ai_common.config import SCHEMA_SOURCES
+
+
+def test_snapshot_is_reused_when_private(tmp_path):
+    snapshot = str(tmp_path / "cache" / "schema.bin")
+    first = schema_index.load(SCHEMA_SOURCES, snapshot)
+    again = schema_index.load(SCHEMA_SOURCES, snapshot)
+    assert (first.source, again.source) == ("parse", "snapshot")
+    assert again.properties == first.properties
+    assert os.stat(os.path.dirname(snapshot)).st_mode & 0o777 == 0o700
+
+
+def test_snapshot_writable_by_others_is_ignored(tmp_path):
+    snapshot = str(tmp_path / "schema.bin")
+    schema_index.load(SCHEMA_SOURCES, snapshot)
+    os.chmod(snapshot, 0o666)
+    assert schema_index.load(SCHEMA_SOURCES, snapshot).source == "parse"
+
+
+def test_shared_directory_gets_no_snapshot(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    os.chmod(shared, 0o1777)
+    snapshot = str(shared / "schema.bin")
+    assert schema_index.load(SCHEMA_SOURCES, snapshot).source == "parse"
+    assert not os.path.exists(snapshot)
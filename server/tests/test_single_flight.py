@@ -0,0 +1,63 @@
+# test_single_flight.py - N lectures identiques simultanées ne font qu'un appel Fuseki
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from ai_common.fuseki_client import AsyncFusekiClient, FusekiClient
+from fuseki_stub import FusekiStub
+
+N = 20
+QUERY = """
+PREFIX sh: <http://www.smarthealth-tracker.com/ontologie#>
+SELECT ?objectif ?type ?dateDebut WHERE {
+  ?objectif a sh:Objectif ; sh:aType ?type ; sh:aDateDebut ?dateDebut .
+}
+"""
+
+
+async def with_stub(check):
+    # Latence suffisante pour que les N appels se chevauchent
+    stub = await FusekiStub(latency=0.2).start()
+    try:
+        return await check(stub)
+    finally:
+        await stub.stop()
+
+
+@pytest.fixture
+def flights_enabled():
+    if AsyncFusekiClient().flights is None:
+        pytest.skip("FUSEKI_SINGLE_FLIGHT désactivé")
+
+
+def test_async_selects_are_coalesced(flights_enabled):
+    async def check(stub):
+        client = AsyncFusekiClient(endpoint=stub.url)
+        # Même requête, mise en forme différente : la clé est normalisée
+        queries = [QUERY if i % 2 else "  ".join(QUERY.split()) for i in range(N)]
+        try:
+            results = await asyncio.gather(*(client.select(q) for q in queries))
+        finally:
+            await client.close()
+        return stub.selects, results
+
+    upstream, results = asyncio.run(with_stub(check))
+    assert upstream == 1
+    assert all(result == results[0] for result in results)
+
+
+def test_sync_selects_from_threads_are_coalesced(flights_enabled):
+    async def check(stub):
+        client = FusekiClient(endpoint=stub.url, pool_size=N)
+        try:
+            with ThreadPoolExecutor(max_workers=N) as pool:
+                results = await asyncio.gather(*(asyncio.wrap_future(pool.submit(client.select, QUERY))
+                                                 for _ in range(N)))
+        finally:
+            client.close()
+        return stub.selects, results
+
+    upstream, results = asyncio.run(with_stub(check))
+    assert upstream == 1
+    assert all(result == results[0] for result in results)
@@ -0,0 +1,92 @@
+# test_sparql_columns.py - Colonnes typées : entiers exacts, dates illisibles, liaisons mixtes et absentes
+import datetime
+
+import numpy as np
+
+from ai_common.sparql_columns import decode_bindings
+
+XSD = "http://www.w3.org/2001/XMLSchema#"
+
+
+def literal(value, datatype=None):
+    cell = {"type": "literal", "value": value}
+    if datatype:
+        cell["datatype"] = XSD + datatype
+    return cell
+
+
+def result(variables, rows):
+    bindings = [{name: cell for name, cell in zip(variables, row) if cell is not None} for row in rows]
+    return {"head": {"vars": variables}, "results": {"bindings": bindings}}
+
+
+def test_integers_stay_exact_in_int64():
+    big = 2 ** 53 + 1  # float64 l'arrondirait à 2**53
+    columns = decode_bindings(result(["n", "m"], [
+        (literal(str(big), "integer"), literal("9223372036854775807", "long")),
+        (literal("-42", "integer"), literal("-9223372036854775808", "long")),
+    ]))
+    n, m = columns["n"], columns["m"]
+    assert (n.kind, n.data.dtype, m.kind, m.data.dtype) == ("integer", np.int64, "integer", np.int64)
+    assert n.values() == [big, -42]
+    assert m.values() == [2 ** 63 - 1, -2 ** 63]
+    assert type(n.value(0)) is int
+
+
+def test_integer_beyond_int64_keeps_exact_string():
+    columns = decode_bindings(result(["n"], [(literal(str(2 ** 64), "integer"),), (literal("1", "integer"),)]))
+    assert columns["n"].kind == "string"
+    assert columns["n"].values() == [str(2 ** 64), "1"]
+
+
+def test_missing_and_unreadable_integers_are_masked():
+    columns = decode_bindings(result(["n"], [
+        (literal("7", "int"),), (None,), (literal("sept", "int"),), (literal(" +8 ", "int"),),
+    ]))
+    n = columns["n"]
+    assert n.kind == "integer" and n.data.dtype == np.int64
+    assert n.mask.tolist() == [True, False, False, True]
+    assert n.values() == [7, None, None, 8]
+
+
+def test_unreadable_datetimes_are_masked():
+    columns = decode_bindings(result(["d"], [
+        (literal("2025-03-01T10:00:00+02:00", "dateTime"),),
+        (literal("01/03/2025", "dateTime"),),
+        (None,),
+        (literal("2025-03-01T10:00:00Z", "dateTime"),),
+        (literal("hier", "dateTime"),),
+    ]))
+    d = columns["d"]
+    assert d.kind == "datetime"
+    assert d.mask.tolist() == [True, False, False, True, False]
+    assert d.values() == [datetime.datetime(2025, 3, 1, 8), None, None, datetime.datetime(2025, 3, 1, 10), None]
+
+
+def test_unreadable_datetime_without_timezones_is_masked():
+    columns = decode_bindings(result(["d"], [
+        (literal("2025-03-01T10:00:00", "dateTime"),), (literal("2025-13-45", "date"),),
+    ]))
+    assert columns["d"].values() == [datetime.datetime(2025, 3, 1, 10), None]
+
+
+def test_mixed_and_missing_bindings():
+    columns = decode_bindings(result(["s", "x", "mix", "flag"], [
+        ({"type": "uri", "value": "urn:a"}, literal("1", "integer"), literal("1", "integer"), literal("true", "boolean")),
+        ({"type": "uri", "value": "urn:b"}, literal("2.5", "decimal"), literal("deux"), None),
+        ({"type": "uri", "value": "urn:a"}, None, None, literal("false", "boolean")),
+    ]))
+    # Entiers et décimaux mélangés -> float64, absent = NaN
+    x = columns["x"]
+    assert x.kind == "float" and x.mask.tolist() == [True, True, False]
+    assert x.values() == [1.0, 2.5, None] and np.isnan(x.data[2])
+    # Entier et chaîne mélangés -> chaînes
+    assert columns["mix"].kind == "string" and columns["mix"].values() == ["1", "deux", None]
+    assert columns["flag"].values() == [True, None, False]
+    assert columns["s"].categories == ["urn:a", "urn:b"]
+    assert columns.records()[1] == {"s": "urn:b", "x": 2.5, "mix": "deux", "flag": None}
+
+
+def test_variable_absent_from_every_row():
+    columns = decode_bindings(result(["s", "n"], [({"type": "uri", "value": "urn:a"}, None)]))
+    assert columns["n"].values() == [None]
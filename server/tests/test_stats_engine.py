@@ -0,0 +1,105 @@
+# test_stats_engine.py - Agrégats incrémentaux comparés au recalcul complet NumPy
+import numpy as np
+import pytest
+
+from ai_common.stats_engine import DAY_MS, StatsEngine
+
+BOUNDS = {"imc": (15, 35, 10), "calories": (1000, 3000, 8)}
+PERCENTILES = (0, 5, 25, 50, 75, 95, 100)
+START_MS = 1_735_689_600_000  # 2025-01-01
+
+
+def measures(rng, stamps):
+    """Valeurs arrondies (doublons), hors bornes d'histogramme et absentes (NaN)"""
+    values = np.column_stack([rng.normal(25, 6, stamps.size).round(), rng.normal(2000, 700, stamps.size).round(-2)])
+    values[rng.random(values.shape) < 0.1] = np.nan
+    return values
+
+
+def assert_matches(engine, state):
+    """Compare summary() à np.percentile / np.histogram sur l'état attendu"""
+    summary = engine.summary(percentiles=PERCENTILES, window=1, days=10_000)
+    assert summary["subjects"] == len(state)
+    rows = np.array(list(state.values())).reshape(len(state), len(BOUNDS))
+    for f, (name, (low, high, bins)) in enumerate(BOUNDS.items()):
+        got = summary["fields"][name]
+        column = rows[:, f][~np.isnan(rows[:, f])]
+        assert got["count"] == column.size
+        counts, edges = np.histogram(column, bins=bins, range=(low, high))
+        assert got["histogram"]["edges"] == pytest.approx(edges.tolist())
+        assert got["histogram"]["counts"] == counts.tolist()
+        assert got["histogram"]["below"] == int((column < low).sum())
+        assert got["histogram"]["above"] == int((column > high).sum())
+        if not column.size:
+            continue
+        assert got["mean"] == pytest.approx(column.mean(), abs=1e-3)
+        assert got["std"] == pytest.approx(column.std(), abs=1e-3)
+        assert (got["min"], got["max"]) == (column.min(), column.max())
+        assert list(got["percentiles"].values()) == pytest.approx(np.percentile(column, PERCENTILES), abs=1e-3)
+
+    # Fenêtre d'un jour : moyenne de chaque jour ayant des mesures
+    rolling = summary["rolling"]
+    days = np.array([int(subject.rsplit("_", 1)[1]) // DAY_MS for subject in state])
+    for f, name in enumerate(BOUNDS):
+        means = dict(zip(rolling["dates"], rolling["fields"][name]))
+        for day in np.unique(days):
+            column = rows[days == day, f]
+            column = column[~np.isnan(column)]
+            date = str(np.datetime64(int(day) * DAY_MS, "ms").astype("datetime64[D]"))
+            if column.size:
+                assert means[date] == pytest.approx(column.mean(), abs=1e-3)
+            else:
+                assert means.get(date) is None
+
+
+def test_summary_matches_numpy_after_mixed_syncs():
+    rng = np.random.default_rng(2024)
+    engine = StatsEngine(BOUNDS)
+    state = {}
+    next_stamp = START_MS
+    for _ in range(25):
+        kept = [s for s in state if rng.random() > 0.15]  # retraits
+        removed = len(state) - len(kept)
+        changed = {s for s in kept if rng.random() < 0.2}  # modifications
+        stamps = next_stamp + np.sort(rng.integers(0, 3 * DAY_MS, rng.integers(0, 40)))  # ajouts
+        next_stamp = int(stamps[-1]) + 1 if stamps.size else next_stamp + DAY_MS
+
+        new_values = measures(rng, np.arange(len(changed) + stamps.size))
+        updates = dict(zip(sorted(changed), new_values[:len(changed)]))
+        modified = sum(not np.array_equal(state[s], row, equal_nan=True) for s, row in updates.items())
+        state = {s: updates.get(s, state[s]) for s in kept}
+        state.update(zip((f"mesure_{stamp}" for stamp in stamps), new_values[len(changed):]))
+
+        subjects = list(state)
+        rng.shuffle(subjects)
+        report = engine.sync(subjects, np.array([state[s] for s in subjects]).reshape(len(subjects), len(BOUNDS)))
+        assert report == {"added": stamps.size, "changed": modified, "removed": removed}
+        assert_matches(engine, state)
+
+
+def test_sync_bindings_matches_numpy():
+    engine = StatsEngine(BOUNDS)
+
+    def binding(subject, imc, calories):
+        row = {"s": {"type": "uri", "value": subject}}
+        if imc is not None:
+            row["imc"] = {"type": "literal", "datatype": "http://www.w3.org/2001/XMLSchema#decimal", "value": str(imc)}
+        if calories is not None:
+            row["calories"] = {"type": "literal", "datatype": "http://www.w3.org/2001/XMLSchema#integer",
+                               "value": str(calories)}
+        return row
+
+    rows = [(f"mesure_{START_MS + i * DAY_MS // 3}", imc, cal)
+            for i, (imc, cal) in enumerate([(22.5, 1800), (40.0, None), (None, 2600), (22.5, 3500), (14.0, 900)])]
+    result = {"head": {"vars": ["s", "imc", "calories"]},
+              "results": {"bindings": [binding(*row) for row in rows]}}
+    assert engine.sync_bindings(result, "s", ["imc", "calories"]) == {"added": 5, "changed": 0, "removed": 0}
+    state = {s: np.array([np.nan if v is None else v for v in (imc, cal)], dtype=float) for s, imc, cal in rows}
+    assert_matches(engine, state)
+
+    # Second instantané : un retrait, une modification
+    rows = [rows[0], (rows[1][0], 30.0, 2000)] + rows[3:]
+    result["results"]["bindings"] = [binding(*row) for row in rows]
+    assert engine.sync_bindings(result, "s", ["imc", "calories"]) == {"added": 0, "changed": 1, "removed": 1}
+    state = {s: np.array([np.nan if v is None else v for v in (imc, cal)], dtype=float) for s, imc, cal in rows}
+    assert_matches(engine, state)
@@ -0,0 +1,85 @@
+# test_targeted_updates.py - UPDATE/DELETE de l'AI limités aux sujets résolus
+import pytest
+from fastapi.testclient import TestClient
+
+import main_ai
+from ai_common import fuseki_client
+
+PREFIX = "http://www.smarthealth-tracker.com/ontologie#"
+# Dates lointaines : CibleC reste l'état le plus récent du store partagé par les tests
+ETATS = {"etatSante_CibleA": ("60", "2098-01-01"), "etatSante_CibleB": ("61", "2098-06-01"),
+         "etatSante_CibleC": ("62", "2099-01-01")}
+OBJECTIFS = {"objectif_CibleSportAncien": ("Activité physique", "2098-01-01"), "objectif_CibleSportRecent": ("Activité physique", "2099-01-01"),
+             "objectif_CiblePoids": ("Perte de poids", "2099-06-01")}
+
+
+@pytest.fixture(scope="module")
+def client():
+    etats = " ".join(
+        f'sh:{name} a sh:EtatSante ; sh:aPoids "{poids}"^^xsd:decimal ; sh:aTaille "1.75"^^xsd:decimal ; '
+        f'sh:aPression "120/80" ; sh:aTemperature "37"^^xsd:decimal ; sh:aDate "{date}T10:00:00Z"^^xsd:dateTime .'
+        for name, (poids, date) in ETATS.items())
+    objectifs = " ".join(
+        f'sh:{name} a sh:Objectif ; sh:aType "{kind}" ; sh:aDescription "cible" ; sh:aEtat "En cours" ; '
+        f'sh:aDateDebut "{date}T10:00:00Z"^^xsd:dateTime ; sh:aDateFin "{date}T12:00:00Z"^^xsd:dateTime .'
+        for name, (kind, date) in OBJECTIFS.items())
+    fuseki_client.get_client().update(f"{main_ai.HEADER}INSERT DATA {{ {etats} {objectifs} }}")
+    with TestClient(main_ai.app) as client:
+        yield client
+
+
+def snapshot(names):
+    """Propriétés de chaque sujet : {nom: {propriété: valeur}}"""
+    values = " ".join(f"<{PREFIX}{name}>" for name in names)
+    rows = fuseki_client.get_client().select(
+        f"SELECT ?s ?p ?o WHERE {{ VALUES ?s {{ {values} }} ?s ?p ?o }}")["results"]["bindings"]
+    state = {name: {} for name in names}
+    for row in rows:
+        state[row["s"]["value"][len(PREFIX):]][row["p"]["value"].rsplit("#", 1)[-1]] = row["o"]["value"]
+    return state
+
+
+def execute(client, entity, command):
+    response = client.post("/ai/execute", json={"entity": entity, "command": command})
+    assert response.status_code == 200, response.text
+    assert response.json()["result"]["success"]
+    return response.json()
+
+
+def changed(before, after):
+    return {name for name in before if before[name] != after[name]}
+
+
+def test_update_of_a_cited_subject_leaves_the_others(client):
+    before = snapshot(ETATS)
+    body = execute(client, "etat_sante", "modifie le poids de etatSante_CibleB à 80")
+    after = snapshot(ETATS)
+    assert body["subjects"] == [PREFIX + "etatSante_CibleB"]
+    assert changed(before, after) == {"etatSante_CibleB"}
+    assert float(after["etatSante_CibleB"]["aPoids"]) == 80
+    assert after["etatSante_CibleB"]["aTaille"] == before["etatSante_CibleB"]["aTaille"]
+
+
+def test_update_without_subject_targets_the_most_recent_only(client):
+    before = snapshot(ETATS)
+    execute(client, "etat_sante", "modifie la température à 39")
+    after = snapshot(ETATS)
+    assert changed(before, after) == {"etatSante_CibleC"}
+    assert float(after["etatSante_CibleC"]["aTemperature"]) == 39
+
+
+def test_delete_of_a_cited_subject_leaves_the_others(client):
+    before = snapshot(ETATS)
+    execute(client, "etat_sante", "supprime etatSante_CibleA")
+    after = snapshot(ETATS)
+    assert after["etatSante_CibleA"] == {}
+    assert after["etatSante_CibleB"] == before["etatSante_CibleB"]
+    assert after["etatSante_CibleC"] == before["etatSante_CibleC"]
+
+
+def test_delete_by_type_removes_the_most_recent_match_only(client):
+    execute(client, "objectif", "supprime mon objectif de sport")
+    after = snapshot(OBJECTIFS)
+    assert after["objectif_CibleSportRecent"] == {}
+    assert after["objectif_CibleSportAncien"]["aType"] == "Activité physique"
+    assert after["objectif_CiblePoids"]["aType"] == "Perte de poids"
@@ -0,0 +1,144 @@
+# test_write_buffer.py - Regroupement des INSERT DATA, durabilité et reprise sur échec
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main_ai
+from ai_common.write_buffer import WriteBehindBuffer
+
+HEADER = "PREFIX sh: <http://www.smarthealth-tracker.com/ontologie#>\n"
+
+
+def insert(i: int) -> str:
+    return f'{HEADER}INSERT DATA {{ sh:objectif_{i} sh:aType "Sport" . }}'
+
+
+class Store:
+    """Destination des lots ; `failures` envois échouent avant de réussir"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.queries = []
+
+    async def send(self, query: str):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("Fuseki indisponible")
+        self.queries.append(query)
+        return {"success": True}
+
+    def written(self):
+        return sorted(int(part.split()[0]) for query in self.queries for part in query.split("sh:objectif_")[1:])
+
+
+def test_batch_is_sent_when_full():
+    store = Store()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(store.send, max_batch=3, interval=60, durability="immediate")
+        for i in range(3):
+            assert await buffer.submit(insert(i)) == {"success": True, "queued": True}
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert len(store.queries) == 1 and store.written() == [0, 1, 2]
+    assert buffer.status()["pending"] == 0
+
+
+def test_batch_is_sent_on_interval():
+    store = Store()
+
+    async def scenario():
+        buffer = WriteBehindBuffer(store.send, max_batch=100, interval=0.05, durability="immediate")
+        await buffer.start()
+        await buffer.submit(insert(1))
+        await buffer.submit(insert(2))
+        assert store.queries == []
+        await asyncio.sleep(0.15)
+        await buffer.stop()
+
+    asyncio.run(scenario())
+    assert len(store.queries) == 1 and store.written() == [1, 2]
+
+
+def test_flush_durability_waits_for_the_write_and_reports_errors():
+    store = Store(failures=1)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(store.send, max_batch=2, interval=60, durability="flush")
+        with pytest.raises(ConnectionError):
+            await asyncio.gather(buffer.submit(insert(1)), buffer.submit(insert(2)))
+        results = await asyncio.gather(buffer.submit(insert(3)), buffer.submit(insert(4)))
+        return buffer, results
+
+    buffer, results = asyncio.run(scenario())
+    assert results == [{"success": True, "batched": 2}] * 2
+    # Le client a reçu l'erreur : rien n'est remis en file
+    assert store.written() == [3, 4]
+    assert buffer.status()["requeued"] == 0 and buffer.status()["dead_letters"] == 0
+
+
+def test_immediate_durability_retries_failed_batches():
+    store = Store(failures=2)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(store.send, max_batch=100, interval=60, durability="immediate", max_attempts=5)
+        await buffer.submit(insert(1))
+        await buffer.submit(insert(2))
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await buffer.flush()
+            assert buffer.status()["pending"] == 2
+        await buffer.submit(insert(3))
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert store.written() == [1, 2, 3]
+    status = buffer.status()
+    assert status["failed_flushes"] == 2 and status["requeued"] == 4
+    assert status["pending"] == 0 and status["dead_letters"] == 0
+
+
+def test_immediate_durability_keeps_statements_after_max_attempts():
+    store = Store(failures=3)
+
+    async def scenario():
+        buffer = WriteBehindBuffer(store.send, max_batch=100, interval=60, durability="immediate", max_attempts=2)
+        await buffer.submit(insert(1))
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                await buffer.flush()
+        assert buffer.status()["pending"] == 0
+        assert buffer.status()["dead_letters"] == 1
+
+        assert buffer.retry_dead_letters() == 1
+        with pytest.raises(ConnectionError):
+            await buffer.flush()
+        await buffer.flush()
+        return buffer
+
+    buffer = asyncio.run(scenario())
+    assert store.written() == [1]
+    assert buffer.status()["dead_letters"] == 0
+
+
+def test_status_endpoint_reports_failures_and_dead_letters(monkeypatch):
+    store = Store(failures=10)
+    buffer = WriteBehindBuffer(store.send, max_batch=100, interval=60, durability="immediate", max_attempts=1)
+    monkeypatch.setattr(main_ai, "write_buffer", buffer)
+    client = TestClient(main_ai.app)
+    asyncio.run(buffer.submit(insert(7)))
+
+    assert client.post("/ai/write-buffer/flush").status_code == 502
+    status = client.get("/ai/write-buffer").json()
+    assert status["enabled"] and status["failed_flushes"] == 1
+    assert status["last_error"] == "Fuseki indisponible"
+    assert status["failures"][0]["statements"] == 1
+    assert status["dead_letters"] == 1 and "objectif_7" in status["dead_letter_batches"][0]["query"]
+
+    cleared = client.delete("/ai/write-buffer/dead-letters").json()
+    assert cleared["cleared"] == 1 and cleared["dead_letters"] == 0